@@ -0,0 +1,668 @@
+"""
+Local stand-ins for the SurveyMonkey v3, Drive v3 and Sheets v4 endpoints the distributor calls,
+plus the OAuth token endpoint, all on one HTTP server. Used by run_benchmarks.py; can also be run
+on its own:
+
+    python bench/fake_services.py --port 8080
+
+Behaviour is tuned per run through /_admin (see FakeServicesClient): per-request latency,
+429 injection on SurveyMonkey calls, refused recipients/bulk requests, and page sizes for every
+paginated listing.
+"""
+import argparse
+import email.parser
+import json
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+DEFAULT_OPTIONS = {
+    "latency_ms": 0,  # added to every SurveyMonkey/Drive/Sheets response
+    "latency_jitter_ms": 0,  # plus uniform(0, jitter)
+    "rate_limit_every": 0,  # answer every Nth SurveyMonkey request with a 429 (0 = never)
+    "retry_after_seconds": 0.05,
+    "bulk_reject_emails": [],  # recipients/bulk requests containing any of these are refused whole...
+    "bulk_reject_status": 400,  # ...with this status
+    "sm_page_size": 50,  # SurveyMonkey per_page default
+    "sm_max_page_size": 1000,
+    "drive_page_size": 100,  # Drive files.list / changes.list pageSize default
+}
+
+_A1_RANGE = re.compile(r"^(?:'?(?P<tab>.*?)'?!)?(?P<c1>[A-Z]+)(?P<r1>\d*)(?::(?P<c2>[A-Z]+)(?P<r2>\d*))?$")
+_PARENT_QUERY = re.compile(r"'([^']+)' in parents")
+_ROUTE_PARAM = re.compile(r"\(\?P<(\w+)>[^)]*\)")
+
+
+class FakeState:
+    """
+    Everything the fake services know about: surveys, collectors, messages, recipients,
+    Drive files, sheet cell values, and per-endpoint call counts.
+    """
+
+    def __init__(self, options=None):
+        self.lock = threading.Lock()
+        self.options = dict(DEFAULT_OPTIONS, **(options or {}))
+        self.next_id = 100000
+        self.surveys = {}
+        self.collectors = {}
+        self.messages = {}
+        self.recipients = defaultdict(dict)  # collector_id -> recipient_id -> recipient
+        self.contacts = {}  # contact_id -> contact
+        self.files = {}
+        self.sheet_values = {}  # sheet_id -> rows (row 1 first)
+        self.changes = []  # file ids, in modification order
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.calls = defaultdict(int)  # (service, endpoint) -> count
+        self.rate_limited = 0
+        self.surveymonkey_requests = 0
+
+    def new_id(self):
+        self.next_id += 1
+        return str(self.next_id)
+
+    def stats(self):
+        calls = defaultdict(dict)
+        for (service, endpoint), count in sorted(self.calls.items()):
+            calls[service][endpoint] = count
+        return {
+            "calls": calls,
+            "totals": {service: sum(endpoints.values()) for service, endpoints in calls.items()},
+            "rate_limited": self.rate_limited,
+        }
+
+    def snapshot(self):
+        collectors = []
+        for collector in self.collectors.values():
+            collectors.append({
+                "id": collector["id"],
+                "name": collector["name"],
+                "survey_title": self.surveys[collector["survey_id"]]["title"],
+                "recipients": sorted(r["email"] for r in self.recipients[collector["id"]].values()),
+                "messages": [
+                    {"type": m["type"], "status": m["status"], "scheduled_date": m.get("scheduled_date")}
+                    for m in self.messages.values() if m["collector_id"] == collector["id"]
+                ],
+            })
+        return {
+            "surveys": [s["title"] for s in self.surveys.values()],
+            "collectors": collectors,
+            "files": {file_id: file["parents"] for file_id, file in self.files.items()},
+        }
+
+
+class FakeServicesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: FakeState = None  # set on the subclass made by make_server()
+
+    # (method, path regex, service, handler name)
+    ROUTES = [
+        ("POST", r"/token", "oauth", "oauth_token"),
+        ("GET", r"/v3/surveys", "surveymonkey", "list_surveys"),
+        ("POST", r"/v3/surveys", "surveymonkey", "create_survey"),
+        ("GET", r"/v3/surveys/(?P<survey_id>\d+)", "surveymonkey", "get_survey"),
+        ("PATCH", r"/v3/surveys/(?P<survey_id>\d+)", "surveymonkey", "update_survey"),
+        ("DELETE", r"/v3/surveys/(?P<survey_id>\d+)", "surveymonkey", "delete_survey"),
+        ("GET", r"/v3/surveys/(?P<survey_id>\d+)/collectors", "surveymonkey", "list_collectors"),
+        ("POST", r"/v3/surveys/(?P<survey_id>\d+)/collectors", "surveymonkey", "create_collector"),
+        ("DELETE", r"/v3/collectors/(?P<collector_id>\d+)", "surveymonkey", "delete_collector"),
+        ("GET", r"/v3/collectors/(?P<collector_id>\d+)", "surveymonkey", "get_collector"),
+        ("PATCH", r"/v3/collectors/(?P<collector_id>\d+)", "surveymonkey", "update_collector"),
+        ("GET", r"/v3/collectors/(?P<collector_id>\d+)/messages", "surveymonkey", "list_messages"),
+        ("POST", r"/v3/collectors/(?P<collector_id>\d+)/messages", "surveymonkey", "create_message"),
+        ("GET", r"/v3/collectors/(?P<collector_id>\d+)/messages/(?P<message_id>\d+)", "surveymonkey", "get_message"),
+        ("POST", r"/v3/collectors/(?P<collector_id>\d+)/messages/(?P<message_id>\d+)/send",
+         "surveymonkey", "send_message"),
+        ("POST", r"/v3/collectors/(?P<collector_id>\d+)/messages/(?P<message_id>\d+)/recipients/bulk",
+         "surveymonkey", "bulk_add_recipients"),
+        ("GET", r"/v3/collectors/(?P<collector_id>\d+)/recipients", "surveymonkey", "list_recipients"),
+        ("POST", r"/v3/contacts/bulk", "surveymonkey", "bulk_create_contacts"),
+        ("POST", r"/v3/contact_lists/(?P<contact_list_id>\d+)/contacts/bulk", "surveymonkey", "bulk_create_contacts"),
+        ("PATCH", r"/v3/contacts/(?P<contact_id>\d+)", "surveymonkey", "update_contact"),
+        ("DELETE", r"/v3/collectors/(?P<collector_id>\d+)/recipients/(?P<recipient_id>\d+)",
+         "surveymonkey", "delete_recipient"),
+        ("GET", r"/drive/v3/files", "drive", "drive_list_files"),
+        ("GET", r"/drive/v3/files/(?P<file_id>[^/]+)", "drive", "drive_get_file"),
+        ("PATCH", r"/drive/v3/files/(?P<file_id>[^/]+)", "drive", "drive_update_file"),
+        ("GET", r"/drive/v3/changes/startPageToken", "drive", "drive_start_page_token"),
+        ("GET", r"/drive/v3/changes", "drive", "drive_list_changes"),
+        ("POST", r"/batch/drive/v3", "drive", "drive_batch"),
+        ("GET", r"/v4/spreadsheets/(?P<sheet_id>[^/]+)/values:batchGet", "sheets", "sheets_batch_get"),
+        ("POST", r"/_admin/reset", "admin", "admin_reset"),
+        ("POST", r"/_admin/options", "admin", "admin_options"),
+        ("POST", r"/_admin/sheets", "admin", "admin_sheets"),
+        ("GET", r"/_admin/stats", "admin", "admin_stats"),
+        ("POST", r"/_admin/stats/reset", "admin", "admin_reset_stats"),
+        ("GET", r"/_admin/snapshot", "admin", "admin_snapshot"),
+    ]
+    # Calls are counted under the route pattern, e.g. "GET /v3/collectors/{collector_id}/messages"
+    COMPILED_ROUTES = [
+        (m, re.compile(p + "$"), service, name, m + " " + _ROUTE_PARAM.sub(r"{\1}", p))
+        for m, p, service, name in ROUTES
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    # ------------------------
+    # Plumbing
+    # ------------------------
+    def _dispatch(self, method):
+        parsed = urlparse(self.path)
+        self.query = parse_qs(parsed.query)
+        self.body = self._read_body()
+        for route_method, pattern, service, name, label in self.COMPILED_ROUTES:
+            match = pattern.match(parsed.path)
+            if route_method != method or not match:
+                continue
+            if service in ("surveymonkey", "drive", "sheets"):
+                self._simulate_latency()
+            if service == "surveymonkey" and self._should_rate_limit():
+                return self._send(429, {"error": {"message": "Too many requests"}}, {
+                    "Retry-After": str(self.state.options["retry_after_seconds"]),
+                })
+            with self.state.lock:
+                if service != "admin":
+                    self.state.calls[(service, label)] += 1
+                status, payload, *headers = getattr(self, name)(**match.groupdict())
+            return self._send(status, payload, *headers)
+        self._send(404, {"error": {"message": f"No fake for {method} {parsed.path}"}})
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if not raw:
+            return {}
+        if "multipart/" in (self.headers.get("Content-Type") or ""):
+            return raw
+        if "application/x-www-form-urlencoded" in (self.headers.get("Content-Type") or ""):
+            return {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+        return json.loads(raw)
+
+    def _send(self, status, payload, headers=None):
+        headers = dict(headers or {})
+        if isinstance(payload, bytes):
+            body = payload
+        else:
+            body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", headers.pop("Content-Type", "application/json"))
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_latency(self):
+        options = self.state.options
+        delay = options["latency_ms"] + random.uniform(0, options["latency_jitter_ms"])
+        if delay:
+            time.sleep(delay / 1000.0)
+
+    def _should_rate_limit(self):
+        every = self.state.options["rate_limit_every"]
+        with self.state.lock:
+            self.state.surveymonkey_requests += 1
+            if every and self.state.surveymonkey_requests % every == 0:
+                self.state.rate_limited += 1
+                return True
+        return False
+
+    def _arg(self, name, default=None):
+        values = self.query.get(name)
+        return values[0] if values else default
+
+    def _sm_page(self, items):
+        """
+        SurveyMonkey-style page of items, with links.next carrying the original query forward.
+        """
+        options = self.state.options
+        per_page = min(int(self._arg("per_page", options["sm_page_size"])), options["sm_max_page_size"])
+        page = int(self._arg("page", 1))
+        start = (page - 1) * per_page
+        payload = {"data": items[start:start + per_page], "per_page": per_page, "page": page, "total": len(items)}
+        links = {"self": self._page_link(page, per_page)}
+        if start + per_page < len(items):
+            links["next"] = self._page_link(page + 1, per_page)
+        payload["links"] = links
+        return payload
+
+    def _page_link(self, page, per_page):
+        query = {k: v for k, v in self.query.items() if k not in ("page", "per_page")}
+        query["page"], query["per_page"] = [str(page)], [str(per_page)]
+        return f"http://{self.headers['Host']}{urlparse(self.path).path}?{urlencode(query, doseq=True)}"
+
+    def _drive_page(self, items, key, **extra):
+        page_size = int(self._arg("pageSize", self.state.options["drive_page_size"]))
+        start = int(self._arg("pageToken", 0))
+        payload = {key: items[start:start + page_size], **extra}
+        if start + page_size < len(items):
+            payload["nextPageToken"] = str(start + page_size)
+        return payload
+
+    # ------------------------
+    # OAuth
+    # ------------------------
+    def oauth_token(self):
+        return 200, {"access_token": "fake-access-token", "expires_in": 3600, "token_type": "Bearer"}
+
+    # ------------------------
+    # SurveyMonkey
+    # ------------------------
+    def list_surveys(self):
+        title, folder_id = self._arg("title"), self._arg("folder_id")
+        surveys = [
+            s for s in self.state.surveys.values()
+            if (title is None or s["title"] == title) and (folder_id is None or s["folder_id"] == folder_id)
+        ]
+        return 200, self._sm_page([{"id": s["id"], "title": s["title"]} for s in surveys])
+
+    def create_survey(self):
+        survey_id = self.state.new_id()
+        self.state.surveys[survey_id] = {
+            "id": survey_id,
+            "title": self.body.get("title", "New Survey"),
+            "folder_id": self.body.get("folder_id"),
+            "from_survey_id": self.body.get("from_survey_id"),
+            "date_modified": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        return 201, self.state.surveys[survey_id]
+
+    def get_survey(self, survey_id):
+        survey = self.state.surveys.get(survey_id)
+        if not survey:
+            return 404, {"error": {"message": "survey not found"}}
+        return 200, survey
+
+    def update_survey(self, survey_id):
+        survey = self.state.surveys.get(survey_id)
+        if not survey:
+            return 404, {"error": {"message": "survey not found"}}
+        survey["title"] = self.body.get("title", survey["title"])
+        return 200, survey
+
+    def delete_survey(self, survey_id):
+        if self.state.surveys.pop(survey_id, None) is None:
+            return 404, {"error": {"message": "survey not found"}}
+        for collector_id in [c for c, collector in self.state.collectors.items() if collector["survey_id"] == survey_id]:
+            self.delete_collector(collector_id)
+        return 204, None
+
+    def list_collectors(self, survey_id):
+        if survey_id not in self.state.surveys:
+            return 404, {"error": {"message": "survey not found"}}
+        name = self._arg("name")
+        collectors = [
+            {"id": c["id"], "name": c["name"], "href": f"/v3/collectors/{c['id']}"}
+            for c in self.state.collectors.values()
+            if c["survey_id"] == survey_id and (name is None or c["name"] == name)
+        ]
+        return 200, self._sm_page(collectors)
+
+    def create_collector(self, survey_id):
+        if survey_id not in self.state.surveys:
+            return 404, {"error": {"message": "survey not found"}}
+        collector_id = self.state.new_id()
+        self.state.collectors[collector_id] = {
+            "id": collector_id,
+            "survey_id": survey_id,
+            "name": self.body.get("name"),
+            "type": self.body.get("type"),
+            "close_date": self.body.get("close_date"),
+            "url": f"https://www.surveymonkey.com/r/{collector_id}",
+        }
+        return 201, self.state.collectors[collector_id]
+
+    def get_collector(self, collector_id):
+        collector = self.state.collectors.get(collector_id)
+        if not collector:
+            return 404, {"error": {"message": "collector not found"}}
+        return 200, collector
+
+    def update_collector(self, collector_id):
+        collector = self.state.collectors.get(collector_id)
+        if not collector:
+            return 404, {"error": {"message": "collector not found"}}
+        collector["close_date"] = self.body.get("close_date", collector["close_date"])
+        return 200, collector
+
+    def delete_collector(self, collector_id):
+        if self.state.collectors.pop(collector_id, None) is None:
+            return 404, {"error": {"message": "collector not found"}}
+        self.state.recipients.pop(collector_id, None)
+        for message_id in [m for m, msg in self.state.messages.items() if msg["collector_id"] == collector_id]:
+            del self.state.messages[message_id]
+        return 204, None
+
+    def list_messages(self, collector_id):
+        if collector_id not in self.state.collectors:
+            return 404, {"error": {"message": "collector not found"}}
+        messages = [
+            {"id": m["id"], "type": m["type"], "status": m["status"]}
+            for m in self.state.messages.values() if m["collector_id"] == collector_id
+        ]
+        return 200, self._sm_page(messages)
+
+    def create_message(self, collector_id):
+        if collector_id not in self.state.collectors:
+            return 404, {"error": {"message": "collector not found"}}
+        message_id = self.state.new_id()
+        self.state.messages[message_id] = {
+            "id": message_id,
+            "collector_id": collector_id,
+            "type": self.body.get("type"),
+            "subject": self.body.get("subject"),
+            "status": "not_sent",
+        }
+        return 201, self.state.messages[message_id]
+
+    def get_message(self, collector_id, message_id):
+        message = self.state.messages.get(message_id)
+        if not message or message["collector_id"] != collector_id:
+            return 404, {"error": {"message": "message not found"}}
+        return 200, message
+
+    def send_message(self, collector_id, message_id):
+        message = self.state.messages.get(message_id)
+        if not message or message["collector_id"] != collector_id:
+            return 404, {"error": {"message": "message not found"}}
+        message["status"] = "scheduled"
+        message["scheduled_date"] = self.body.get("scheduled_date")
+        return 200, {"id": message_id, "is_scheduled": True, "scheduled_date": message["scheduled_date"]}
+
+    def bulk_add_recipients(self, collector_id, message_id):
+        if collector_id not in self.state.collectors or message_id not in self.state.messages:
+            return 404, {"error": {"message": "collector or message not found"}}
+        contacts = list(self.body.get("contacts", []))
+        if set(self.state.options["bulk_reject_emails"]) & {c.get("email") for c in contacts}:
+            return self.state.options["bulk_reject_status"], {"error": {"message": "Request rejected"}}
+        recipients = self.state.recipients[collector_id]
+        by_email = {r["email"]: r for r in recipients.values()}
+        succeeded, existing, invalids = [], [], []
+        for contact_id in self.body.get("contact_ids", []):
+            if contact_id not in self.state.contacts:
+                invalids.append({"id": contact_id})
+            else:
+                contacts.append({"email": self.state.contacts[contact_id]["email"]})
+        for contact in contacts:
+            email = contact.get("email", "")
+            if "@" not in email:
+                invalids.append(contact)
+            elif email in by_email:
+                existing.append({"id": by_email[email]["id"], "email": email})
+            else:
+                recipient_id = self.state.new_id()
+                by_email[email] = recipients[recipient_id] = {
+                    "id": recipient_id,
+                    "email": email,
+                    "mail_status": "not_sent",
+                    "survey_response_status": "not_responded",
+                }
+                succeeded.append({"id": recipient_id, "email": email})
+        return 200, {"succeeded": succeeded, "existing": existing, "invalids": invalids}
+
+    def list_recipients(self, collector_id):
+        if collector_id not in self.state.collectors:
+            return 404, {"error": {"message": "collector not found"}}
+        include = set(filter(None, (self._arg("include") or "").split(",")))
+        recipients = [
+            {"id": r["id"], "email": r["email"], **{field: r[field] for field in include if field in r}}
+            for r in self.state.recipients[collector_id].values()
+        ]
+        return 200, self._sm_page(recipients)
+
+    def bulk_create_contacts(self, contact_list_id=None):
+        by_email = {c["email"].lower(): c for c in self.state.contacts.values()}
+        succeeded, existing, invalids = [], [], []
+        for contact in self.body.get("contacts", []):
+            email = contact.get("email", "")
+            if "@" not in email:
+                invalids.append(contact)
+            elif email.lower() in by_email:
+                existing.append({"id": by_email[email.lower()]["id"], "email": email})
+            else:
+                contact_id = self.state.new_id()
+                by_email[email.lower()] = self.state.contacts[contact_id] = dict(contact, id=contact_id)
+                succeeded.append({"id": contact_id, "email": email})
+        return 200, {"succeeded": succeeded, "existing": existing, "invalids": invalids}
+
+    def update_contact(self, contact_id):
+        contact = self.state.contacts.get(contact_id)
+        if contact is None:
+            return 404, {"error": {"message": "contact not found"}}
+        contact.update({k: v for k, v in self.body.items() if k in ("first_name", "last_name")})
+        return 200, contact
+
+    def delete_recipient(self, collector_id, recipient_id):
+        if self.state.recipients[collector_id].pop(recipient_id, None) is None:
+            return 404, {"error": {"message": "recipient not found"}}
+        return 204, None
+
+    # ------------------------
+    # Drive
+    # ------------------------
+    def drive_list_files(self):
+        match = _PARENT_QUERY.search(self._arg("q", ""))
+        files = [
+            {"id": f["id"], "name": f["name"], "parents": f["parents"]}
+            for f in self.state.files.values() if not match or match.group(1) in f["parents"]
+        ]
+        return 200, self._drive_page(files, "files")
+
+    def drive_get_file(self, file_id):
+        file = self.state.files.get(file_id)
+        if not file:
+            return 404, {"error": {"code": 404, "message": f"File not found: {file_id}."}}
+        return 200, {"id": file["id"], "name": file["name"], "parents": file["parents"]}
+
+    def drive_update_file(self, file_id):
+        file = self.state.files.get(file_id)
+        if not file:
+            return 404, {"error": {"code": 404, "message": f"File not found: {file_id}."}}
+        removed = set(filter(None, self._arg("removeParents", "").split(",")))
+        added = [p for p in self._arg("addParents", "").split(",") if p]
+        file["parents"] = [p for p in file["parents"] if p not in removed] + added
+        self.state.changes.append(file_id)
+        return 200, {"id": file["id"], "parents": file["parents"]}
+
+    def drive_batch(self):
+        """
+        Drive batch request: a multipart/mixed body of files.update calls, answered part by part.
+        Counted as one call, like the single HTTP request it is.
+        """
+        message = email.parser.BytesParser().parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + self.body
+        )
+        boundary = "batch_fake_response"
+        parts = []
+        outer_query = self.query
+        try:
+            for part in message.get_payload():
+                request_line = part.get_payload().lstrip().split("\n", 1)[0]
+                method, target = request_line.split()[:2]
+                parsed = urlparse(target)
+                match = re.match(r"/drive/v3/files/([^/]+)$", parsed.path)
+                self.query = parse_qs(parsed.query)
+                if method == "PATCH" and match:
+                    status, payload = self.drive_update_file(match.group(1))
+                else:
+                    status, payload = 404, {"error": {"message": f"No fake for {method} {parsed.path} in a batch"}}
+                content_id = (part["Content-ID"] or "").strip("<>")
+                parts.append(
+                    f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                    f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\n\r\n{json.dumps(payload)}\r\n"
+                )
+        finally:
+            self.query = outer_query
+        body = "".join(parts) + f"--{boundary}--\r\n"
+        return 200, body.encode(), {"Content-Type": f"multipart/mixed; boundary={boundary}"}
+
+    def drive_start_page_token(self):
+        return 200, {"startPageToken": str(len(self.state.changes))}
+
+    def drive_list_changes(self):
+        start = int(self._arg("pageToken", 0))
+        changes = [
+            {"fileId": file_id, "removed": file_id not in self.state.files, "file": self.state.files.get(file_id)}
+            for file_id in self.state.changes[start:]
+        ]
+        page_size = int(self._arg("pageSize", self.state.options["drive_page_size"]))
+        payload = {"changes": changes[:page_size]}
+        if len(changes) > page_size:
+            payload["nextPageToken"] = str(start + page_size)
+        else:
+            payload["newStartPageToken"] = str(len(self.state.changes))
+        return 200, payload
+
+    # ------------------------
+    # Sheets
+    # ------------------------
+    def sheets_batch_get(self, sheet_id):
+        rows = self.state.sheet_values.get(sheet_id)
+        if rows is None:
+            return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+        value_ranges = []
+        for a1 in self.query.get("ranges", []):
+            value_range = {"range": a1, "majorDimension": "ROWS"}
+            values = _slice_a1(rows, a1)
+            if values:
+                value_range["values"] = values
+            value_ranges.append(value_range)
+        return 200, {"spreadsheetId": sheet_id, "valueRanges": value_ranges}
+
+    # ------------------------
+    # Admin
+    # ------------------------
+    def admin_reset(self):
+        self.state.__init__(self.body.get("options"))
+        return 200, {"options": self.state.options}
+
+    def admin_options(self):
+        self.state.options.update(self.body)
+        return 200, {"options": self.state.options}
+
+    def admin_sheets(self):
+        """
+        Create or replace roster sheets and put them (back) in folder_id.
+        """
+        folder_id = self.body["folder_id"]
+        for sheet in self.body["sheets"]:
+            self.state.files[sheet["id"]] = {"id": sheet["id"], "name": sheet["name"], "parents": [folder_id]}
+            self.state.sheet_values[sheet["id"]] = sheet["rows"]
+            self.state.changes.append(sheet["id"])
+        return 200, {"sheets": len(self.body["sheets"])}
+
+    def admin_stats(self):
+        return 200, self.state.stats()
+
+    def admin_reset_stats(self):
+        self.state.reset_stats()
+        return 200, {}
+
+    def admin_snapshot(self):
+        return 200, self.state.snapshot()
+
+
+def _slice_a1(rows, a1):
+    match = _A1_RANGE.match(a1)
+    if not match:
+        return []
+    first_col = _column_index(match["c1"])
+    last_col = _column_index(match["c2"]) if match["c2"] else first_col
+    first_row = int(match["r1"] or 1)
+    last_row = int(match["r2"]) if match["r2"] else len(rows)
+    values = []
+    for row in rows[first_row - 1:last_row]:
+        cells = list(row[first_col:last_col + 1])
+        # The API leaves out trailing empty cells, and trailing empty rows altogether.
+        while cells and cells[-1] == "":
+            cells.pop()
+        values.append(cells)
+    while values and not values[-1]:
+        values.pop()
+    return values
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+def make_server(port=0, options=None):
+    handler = type("BoundFakeServicesHandler", (FakeServicesHandler,), {"state": FakeState(options)})
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+class FakeServicesClient:
+    """
+    Drives a running fake over its /_admin endpoints.
+    """
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+
+    def _call(self, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(
+            f"{self.url}{path}", data=data, method=method, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request) as resp:
+            return json.loads(resp.read() or b"{}")
+
+    def reset(self, options=None):
+        return self._call("POST", "/_admin/reset", {"options": options or {}})
+
+    def set_options(self, **options):
+        return self._call("POST", "/_admin/options", options)
+
+    def put_sheets(self, folder_id, sheets):
+        """
+        sheets: [{"id", "name", "rows"}], rows being the sheet's cells from row 1.
+        """
+        return self._call("POST", "/_admin/sheets", {"folder_id": folder_id, "sheets": sheets})
+
+    def stats(self):
+        return self._call("GET", "/_admin/stats")
+
+    def reset_stats(self):
+        return self._call("POST", "/_admin/stats/reset", {})
+
+    def snapshot(self):
+        return self._call("GET", "/_admin/snapshot")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake SurveyMonkey, Drive and Sheets APIs locally.")
+    parser.add_argument("--port", type=int, default=8080, help="0 picks a free port")
+    args = parser.parse_args()
+    server = make_server(args.port)
+    print(f"listening on http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
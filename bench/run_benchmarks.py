@@ -0,0 +1,323 @@
+"""
+End-to-end benchmarks: runs the real CollectorScheduler (or AsyncCollectorScheduler) against the
+fake SurveyMonkey/Drive/Sheets server in fake_services.py and reports, per scenario, wall time,
+API calls by service and endpoint, 429s served, and peak Python memory.
+
+    python bench/run_benchmarks.py                      # every scenario, compared with baselines.json
+    python bench/run_benchmarks.py resync churn         # just these
+    python bench/run_benchmarks.py first_run --sheets 100 --recipients 500
+    python bench/run_benchmarks.py --save-baseline      # accept the current numbers
+
+Exits non-zero when a scenario makes more API calls than its baseline, is slower or uses more
+memory than the baseline by more than the tolerance, or leaves SurveyMonkey/Drive in the wrong state.
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+
+import config  # noqa: E402
+from fake_services import FakeServicesClient  # noqa: E402
+from scenarios import SCENARIOS, build_rosters  # noqa: E402
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baselines.json")
+# Allowed slowdown / memory growth against the baseline before a scenario counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# Absolute slack so tiny scenarios don't fail on scheduler noise
+WALL_SECONDS_SLACK = 0.5
+
+
+@contextlib.contextmanager
+def fake_services_process():
+    """
+    Start fake_services.py in its own process, so its work doesn't show up in our timings or memory.
+    """
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "fake_services.py"), "--port", "0"],
+        stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        url = proc.stdout.readline().strip().rsplit(" ", 1)[-1]
+        yield FakeServicesClient(url)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def point_clients_at(url, workdir):
+    """
+    Send every client to the fake server and give it credentials it will accept.
+    Must run before collector_scheduler is imported (it imports its settings by name).
+    """
+    config.SURVEYMONKEY_API_BASE_URL = f"{url}/v3"
+    config.DRIVE_API_ENDPOINT = f"{url}/"
+    config.SHEETS_API_ENDPOINT = f"{url}/"
+    # Quotas are the real service's business; pacing here would only measure the config.
+    config.SURVEYMONKEY_REQUESTS_PER_MINUTE = 10 ** 9
+    config.SURVEYMONKEY_REQUESTS_PER_DAY = 10 ** 9
+    # Never send a real token anywhere, even to localhost.
+    config_local = types.ModuleType("config_local")
+    config_local.SURVEYMONKEY_API_TOKEN = "bench-token"
+    sys.modules["config_local"] = config_local
+
+    credentials_path = os.path.join(workdir, "google_credentials.json")
+    with open(credentials_path, "w") as f:
+        json.dump({
+            "type": "service_account",
+            "project_id": "bench",
+            "private_key_id": "bench",
+            "private_key": generate_private_key_pem(),
+            "client_email": "bench@bench.iam.gserviceaccount.com",
+            "client_id": "0",
+            "token_uri": f"{url}/token",
+        }, f)
+    return credentials_path
+
+
+def generate_private_key_pem():
+    # google-auth signs the token request, so the key has to be real; it never leaves this machine.
+    try:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        return key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+    except ImportError:
+        import rsa
+        _, private_key = rsa.newkeys(2048)
+        return private_key.save_pkcs1().decode()
+
+
+def make_scheduler(scenario):
+    if scenario.use_async:
+        from async_collector_scheduler import AsyncCollectorScheduler
+        return AsyncCollectorScheduler()
+    from collector_scheduler import CollectorScheduler
+    return CollectorScheduler(max_workers=scenario.workers)
+
+
+def run_scenario(scenario, fake, credentials_path, verbose=False):
+    workdir = tempfile.mkdtemp(prefix=f"bench-{scenario.name}-")
+    previous_cwd = os.getcwd()
+    # The scheduler keeps its ID index and quota state next to where it runs.
+    os.chdir(workdir)
+    shutil.copy(credentials_path, "google_credentials.json")
+    log = open("run.log", "w")
+    try:
+        fake.reset(scenario.fake_options())
+        rosters = build_rosters(scenario)
+        fake.put_sheets(config.UNPROCESSED_FOLDER_ID, [r.to_sheet() for r in rosters])
+
+        removed = {}
+        if scenario.needs_setup_run:
+            with _output_to(log, verbose):
+                make_scheduler(scenario).run()
+            for roster in rosters:
+                removed[roster.collector_name] = roster.churn(scenario.churn) if scenario.churn else set()
+            # The same sheets come back, some with a different roster.
+            fake.put_sheets(config.UNPROCESSED_FOLDER_ID, [r.to_sheet() for r in rosters])
+            fake.reset_stats()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        with _output_to(log, verbose):
+            scheduler = make_scheduler(scenario)
+            startup_seconds = time.perf_counter() - started
+            scheduler.run()
+        wall_seconds = time.perf_counter() - started
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stats = fake.stats()
+        problems = check_final_state(fake.snapshot(), rosters, removed)
+        return {
+            "scenario": scenario.name,
+            "description": scenario.describe(),
+            "wall_seconds": round(wall_seconds, 3),
+            "startup_seconds": round(startup_seconds, 3),
+            "peak_memory_kb": round(peak_bytes / 1024),
+            "surveymonkey_calls": stats["totals"].get("surveymonkey", 0),
+            "google_calls": stats["totals"].get("drive", 0) + stats["totals"].get("sheets", 0),
+            "rate_limited": stats["rate_limited"],
+            "calls": stats["calls"],
+            "problems": problems,
+            "log": os.path.join(workdir, "run.log"),
+        }
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        log.close()
+        os.chdir(previous_cwd)
+
+
+@contextlib.contextmanager
+def _output_to(log, verbose):
+    if verbose:
+        yield
+        return
+    with contextlib.redirect_stdout(log):
+        yield
+
+
+def check_final_state(snapshot, rosters, removed):
+    """
+    A fast run that does the wrong thing is not a result. Returns a list of problems.
+    """
+    problems = []
+    collectors = {c["name"]: c for c in snapshot["collectors"]}
+    for roster in rosters:
+        if snapshot["files"].get(roster.sheet_id) != [config.PROCESSED_FOLDER_ID]:
+            problems.append(f"{roster.sheet_name} was not moved to the processed folder")
+        collector = collectors.get(roster.collector_name)
+        if not collector:
+            problems.append(f"no collector '{roster.collector_name}'")
+            continue
+        recipients = set(collector["recipients"])
+        missing = set(roster.emails) - recipients
+        if missing:
+            problems.append(f"'{roster.collector_name}' is missing {len(missing)} recipient(s)")
+        left_over = removed.get(roster.collector_name, set()) & recipients
+        if left_over:
+            problems.append(f"'{roster.collector_name}' still has {len(left_over)} removed recipient(s)")
+        unscheduled = [m["type"] for m in collector["messages"] if m["status"] != "scheduled"]
+        if unscheduled:
+            problems.append(f"'{roster.collector_name}' has unscheduled message(s): {unscheduled}")
+    if len(collectors) != len(snapshot["collectors"]):
+        problems.append("duplicate collector names")
+    return problems
+
+
+def compare_with_baseline(result, baseline, tolerance):
+    """
+    Returns a list of regressions (empty when the result is as good as the baseline).
+    """
+    regressions = []
+    for key in ("surveymonkey_calls", "google_calls"):
+        if result[key] > baseline[key]:
+            regressions.append(f"{key} {baseline[key]} -> {result[key]}")
+    wall_limit = baseline["wall_seconds"] * (1 + tolerance) + WALL_SECONDS_SLACK
+    if result["wall_seconds"] > wall_limit:
+        regressions.append(f"wall_seconds {baseline['wall_seconds']} -> {result['wall_seconds']} "
+                           f"(limit {wall_limit:.2f})")
+    memory_limit = baseline["peak_memory_kb"] * (1 + tolerance)
+    if result["peak_memory_kb"] > memory_limit:
+        regressions.append(f"peak_memory_kb {baseline['peak_memory_kb']} -> {result['peak_memory_kb']} "
+                           f"(limit {memory_limit:.0f})")
+    return regressions
+
+
+def load_baselines():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+
+def save_baselines(baselines):
+    with open(BASELINE_PATH, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def print_result(result, baseline, regressions):
+    print(f"\n=== {result['scenario']} ({result['description']})")
+    print(f"  wall {result['wall_seconds']:.2f}s (startup {result['startup_seconds']:.2f}s), "
+          f"peak memory {result['peak_memory_kb']} KiB")
+    print(f"  SurveyMonkey calls {result['surveymonkey_calls']}, Google calls {result['google_calls']}, "
+          f"429s served {result['rate_limited']}")
+    for service, endpoints in result["calls"].items():
+        for endpoint, count in endpoints.items():
+            print(f"    {service:<13} {endpoint:<70} {count}")
+    if baseline:
+        print(f"  baseline: wall {baseline['wall_seconds']:.2f}s, SurveyMonkey calls "
+              f"{baseline['surveymonkey_calls']}, Google calls {baseline['google_calls']}, "
+              f"peak memory {baseline['peak_memory_kb']} KiB")
+    else:
+        print("  no baseline yet (run with --save-baseline to record one)")
+    for problem in result["problems"]:
+        print(f"  WRONG RESULT: {problem}")
+    for regression in regressions:
+        print(f"  REGRESSION: {regression}")
+    if result["problems"] or regressions:
+        print(f"  log: {result['log']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the distributor against local fake services.")
+    parser.add_argument("scenarios", nargs="*", help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--sheets", type=int, help="override the number of sheets in every scenario")
+    parser.add_argument("--recipients", type=int, help="override the recipients per sheet in every scenario")
+    parser.add_argument("--save-baseline", action="store_true", help="record these results as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown / memory growth before failing (default: %(default)s)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the scheduler's own output")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenario(s): {', '.join(unknown)}")
+    scenarios = [SCENARIOS[name] for name in args.scenarios or SCENARIOS]
+    resized = bool(args.sheets or args.recipients)
+    if resized:
+        scenarios = [s.with_size(args.sheets, args.recipients) for s in scenarios]
+
+    baselines = load_baselines()
+    results = []
+    failed = False
+    compared = 0
+    setup_dir = tempfile.mkdtemp(prefix="bench-")
+    with fake_services_process() as fake:
+        credentials_path = point_clients_at(fake.url, setup_dir)
+        for scenario in scenarios:
+            result = run_scenario(scenario, fake, credentials_path, verbose=args.verbose)
+            # Baselines only mean something for the sizes they were recorded at.
+            baseline = None if resized else baselines.get(scenario.name)
+            regressions = compare_with_baseline(result, baseline, args.tolerance) if baseline else []
+            compared += bool(baseline)
+            print_result(result, baseline, regressions)
+            failed = failed or bool(result["problems"] or regressions)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        if resized:
+            sys.exit("Not saving baselines for resized scenarios.")
+        if any(result["problems"] for result in results):
+            sys.exit("Not saving baselines from runs with wrong results.")
+        for result in results:
+            baselines[result["scenario"]] = {
+                key: result[key]
+                for key in ("wall_seconds", "peak_memory_kb", "surveymonkey_calls", "google_calls")
+            }
+        save_baselines(baselines)
+        print(f"\nBaselines saved to {BASELINE_PATH}.")
+        return
+    if failed:
+        print("\nBENCHMARK FAILED: see WRONG RESULT / REGRESSION lines above.")
+        sys.exit(1)
+    if compared < len(results):
+        print(f"\n{len(results) - compared} scenario(s) have no baseline; nothing compared for them.")
+        if not compared:
+            return
+    print(f"\nAll {compared} scenario(s) with a baseline are within it.")
+
+
+if __name__ == "__main__":
+    main()
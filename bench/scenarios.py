@@ -0,0 +1,112 @@
+"""
+Benchmark scenarios for run_benchmarks.py, and the synthetic rosters they feed the fake services.
+"""
+import random
+from datetime import datetime, timedelta
+
+FIRST_RUN = "first_run"  # nothing exists in SurveyMonkey yet
+RESYNC = "resync"  # every sheet was processed before and comes back unchanged
+CHURN = "churn"  # every sheet was processed before and comes back with part of its roster replaced
+
+
+class Scenario:
+    def __init__(self, name, sheets, recipients, kind=FIRST_RUN, churn=0.0, workers=1, use_async=False,
+                 latency_ms=20, rate_limit_every=0, sm_page_size=50, drive_page_size=100):
+        self.name = name
+        self.sheets = sheets
+        self.recipients = recipients
+        self.kind = kind
+        self.churn = churn  # share of each roster replaced between the setup run and the measured run
+        self.workers = workers
+        self.use_async = use_async
+        self.latency_ms = latency_ms
+        self.rate_limit_every = rate_limit_every
+        self.sm_page_size = sm_page_size
+        self.drive_page_size = drive_page_size
+
+    @property
+    def needs_setup_run(self):
+        return self.kind in (RESYNC, CHURN)
+
+    def fake_options(self):
+        return {
+            "latency_ms": self.latency_ms,
+            "rate_limit_every": self.rate_limit_every,
+            "sm_page_size": self.sm_page_size,
+            "drive_page_size": self.drive_page_size,
+        }
+
+    def with_size(self, sheets=None, recipients=None):
+        scenario = Scenario(**vars(self))
+        scenario.sheets = sheets or self.sheets
+        scenario.recipients = recipients or self.recipients
+        return scenario
+
+    def describe(self):
+        mode = "async" if self.use_async else f"{self.workers} worker(s)"
+        extras = f", {self.churn:.0%} churn" if self.kind == CHURN else ""
+        extras += f", 429 every {self.rate_limit_every}" if self.rate_limit_every else ""
+        return f"{self.kind}: {self.sheets} sheets x {self.recipients} recipients, {mode}, " \
+               f"{self.latency_ms}ms latency{extras}"
+
+
+SCENARIOS = {s.name: s for s in [
+    Scenario("first_run", sheets=10, recipients=50),
+    Scenario("first_run_large", sheets=40, recipients=200, workers=4),
+    Scenario("first_run_async", sheets=40, recipients=200, use_async=True),
+    Scenario("resync", sheets=10, recipients=50, kind=RESYNC),
+    Scenario("resync_large", sheets=40, recipients=200, kind=RESYNC, workers=4),
+    Scenario("churn", sheets=10, recipients=200, kind=CHURN, churn=0.3),
+    Scenario("churn_heavy", sheets=10, recipients=200, kind=CHURN, churn=0.9),
+    Scenario("rate_limited", sheets=10, recipients=50, rate_limit_every=7),
+]}
+
+
+class SyntheticRoster:
+    """
+    One roster sheet: event metadata in A2:C2, musicians from row 3 with their email in column F.
+    """
+
+    def __init__(self, index, recipients, rng):
+        self.sheet_id = f"bench-sheet-{index:04d}"
+        self.sheet_name = f"Bench roster {index:04d}"
+        self.event_title = f"SUB {index}" if index % 5 else f"Opera {index}"
+        self.conductor_name = f"Conductor {index:04d}"
+        self.event_date = (datetime.now() + timedelta(days=30 + index % 60)).strftime("%Y-%m-%d 19:30")
+        self.rng = rng
+        self.emails = [self._new_email() for _ in range(recipients)]
+
+    def _new_email(self):
+        return f"musician{self.rng.getrandbits(40):010x}@example.org"
+
+    @property
+    def collector_name(self):
+        return f"Email Invitation for {self.conductor_name} ({self.event_title})"
+
+    def churn(self, share):
+        """
+        Replace share of the roster with new musicians. Returns the emails that left.
+        """
+        leaving = set(self.rng.sample(self.emails, int(len(self.emails) * share)))
+        self.emails = [e for e in self.emails if e not in leaving]
+        self.emails += [self._new_email() for _ in leaving]
+        return leaving
+
+    def to_sheet(self):
+        rows = [
+            ["Event Title", "Conductor", "Last Concert", "First Name", "Last Name", "Email"],
+            [self.event_title, self.conductor_name, self.event_date],
+        ]
+        rows += [["", "", "", *_name_for(email), email] for email in self.emails]
+        return {"id": self.sheet_id, "name": self.sheet_name, "rows": rows}
+
+
+def _name_for(email):
+    # Keyed by the musician, not their row, so a churned roster doesn't rename everyone below the change.
+    handle = email.split("@")[0]
+    return f"First-{handle}", f"Last-{handle}"
+
+
+def build_rosters(scenario, seed=0):
+    rng = random.Random(seed)
+    return [SyntheticRoster(i, scenario.recipients, rng) for i in range(1, scenario.sheets + 1)]
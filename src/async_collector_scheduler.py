@@ -0,0 +1,58 @@
+import asyncio
+from async_google_drive_client import AsyncGoogleDriveClient
+from async_surveymonkey_api_client import AsyncSurveyMonkeyApiClient, new_session
+from collector_scheduler import CollectorScheduler
+from metrics import METRICS
+from config import ASYNC_SHEET_CONCURRENCY, ASYNC_CONNECTION_LIMIT
+
+
+class AsyncCollectorScheduler(CollectorScheduler):
+    """
+    CollectorScheduler on an event loop of its own, with up to ASYNC_SHEET_CONCURRENCY sheets in flight
+    and every SurveyMonkey and Drive listing call sharing one aiohttp connection pool. The sheet
+    processing itself is CollectorScheduler's. run() stays synchronous so runner.py can call it as usual.
+    Roster reads and the Drive batch move still go through gspread and googleapiclient, on worker threads.
+    """
+
+    def __init__(self, max_workers=None, time_budget=None):
+        super().__init__(max_workers=max_workers or ASYNC_SHEET_CONCURRENCY, time_budget=time_budget)
+        self.async_drive_client = None
+
+    def run(self):
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        async with new_session(ASYNC_CONNECTION_LIMIT) as session:
+            self.async_drive_client = AsyncGoogleDriveClient(session, creds=self.google_sheets_client.creds)
+
+            # Get all unprocessed sheets, from every program's folder at once
+            listings = await asyncio.gather(*(
+                self.async_drive_client.list_sheets_in_folder(program.unprocessed_folder_id)
+                for program in self.programs
+            ))
+            sheets = [
+                (program, sheet_id, sheet_name)
+                for program, program_sheets in zip(self.programs, listings)
+                for sheet_id, sheet_name in program_sheets
+            ]
+            if not sheets:
+                print("No unprocessed sheets. (: ")
+                return
+
+            from config_local import SURVEYMONKEY_API_TOKEN
+            self._async_client = AsyncSurveyMonkeyApiClient(SURVEYMONKEY_API_TOKEN, session, quota=self.quota)
+            try:
+                await self.process_sheets_async(sheets)
+                await self.refill_clone_pool_async()
+            finally:
+                # The session closes with this block; later calls go through surveymonkey_client.
+                self._async_client = None
+        self.quota.save()
+        METRICS.export()
+        print("No sheets left to process. (: ")
+
+    def known_parents(self, sheet_id):
+        # This run listed the folders through the async Drive client.
+        if self.async_drive_client and sheet_id in self.async_drive_client.sheet_parents:
+            return self.async_drive_client.sheet_parents[sheet_id]
+        return super().known_parents(sheet_id)
@@ -0,0 +1,62 @@
+import asyncio
+import aiohttp
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+import config
+from metrics import METRICS
+
+
+class AsyncGoogleDriveClient:
+    """
+    asyncio counterpart of the Drive listing in GoogleSheetsApiClient, talking to the Drive v3 REST API
+    over a shared aiohttp.ClientSession. Moves go through GoogleSheetsApiClient's batched
+    move_sheets_to_folders, using the parents recorded here.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, creds_file="google_credentials.json", creds=None):
+        self.session = session
+        # Pass the GoogleSheetsApiClient's credentials to avoid reading the service-account file again.
+        self.creds = creds or Credentials.from_service_account_file(creds_file, scopes=config.SCOPES)
+        root = (config.DRIVE_API_ENDPOINT or "https://www.googleapis.com/").rstrip("/")
+        self.base_url = f"{root}/drive/v3"
+        self._token_lock = asyncio.Lock()
+        self.sheet_parents = {}  # sheet_id -> parent folder IDs, as of the last listing
+
+    async def _auth_headers(self):
+        async with self._token_lock:
+            if not self.creds.valid:
+                # google-auth only refreshes synchronously; keep it off the event loop.
+                await asyncio.to_thread(self.creds.refresh, Request())
+        return {"Authorization": f"Bearer {self.creds.token}"}
+
+    async def _request(self, method, path, endpoint, **kwargs):
+        headers = await self._auth_headers()
+        with METRICS.time_call("drive", endpoint):
+            async with self.session.request(method, f"{self.base_url}{path}", headers=headers, **kwargs) as resp:
+                resp.raise_for_status()
+                return await resp.json()
+
+    async def list_sheets_in_folder(self, folder_id):
+        """
+        List all Google Sheets in a Drive folder.
+        Returns list of tuples: (sheet_id, sheet_name)
+        """
+        query = f"'{folder_id}' in parents and mimeType='application/vnd.google-apps.spreadsheet' and trashed=false"
+        sheets = []
+        page_token = None
+        while True:
+            # Drive page tokens are opaque, so pages can only be walked in order; make them as large as allowed.
+            params = {
+                "q": query, "spaces": "drive", "pageSize": config.DRIVE_MAX_PAGE_SIZE,
+                "fields": "nextPageToken, files(id, name, parents)",
+            }
+            if page_token:
+                params["pageToken"] = page_token
+            response = await self._request("GET", "/files", "files.list", params=params)
+            for file in response.get("files", []):
+                sheets.append((file["id"], file["name"]))
+                self.sheet_parents[file["id"]] = file.get("parents", [folder_id])
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+        return sheets
@@ -0,0 +1,443 @@
+import asyncio
+import json
+import time
+from datetime import timezone
+import aiohttp
+import requests
+import config
+from metrics import METRICS, endpoint_name
+from surveymonkey_api_client import (
+    IDEMPOTENT_METHODS, BulkRecipientResult, RecipientUploadError, SurveyMonkeyClientBase, SurveyMonkeyNotFoundError
+)
+
+
+def new_session(connection_limit):
+    """
+    An aiohttp session with at most connection_limit connections. Call it on the loop that will use it.
+    """
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=connection_limit))
+
+
+class AsyncResponse:
+    """
+    The parts of an aiohttp response the client needs after the connection has been released.
+    The body is decoded only when json() is called, like requests, so an HTML error page from a
+    proxy (502, 503) reaches the retry logic instead of failing to parse.
+    """
+
+    def __init__(self, method, url, status_code, headers, body):
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+
+class AsyncSurveyMonkeyApiClient(SurveyMonkeyClientBase):
+    """
+    The SurveyMonkey client; every API method is a coroutine. SurveyMonkeyApiClient wraps it for
+    synchronous callers. Pass in a shared aiohttp.ClientSession so SurveyMonkey and Drive calls use one
+    connection pool.
+    """
+
+    def __init__(self, api_token, session: aiohttp.ClientSession, timeout=None, max_retries=None, quota=None):
+        super().__init__(api_token, timeout, max_retries, quota)
+        self.session = session
+        connect_timeout, read_timeout = self.timeout
+        self.client_timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+
+    # ------------------------
+    # HTTP
+    # ------------------------
+    async def _request(self, method, url, **kwargs):
+        """
+        Send a request through the pooled session.
+        429s are retried for every method (SurveyMonkey rejects them before doing any work);
+        5xx responses and connection errors are only retried for idempotent methods.
+        Returns the final AsyncResponse; callers still decide whether to _raise_for_status().
+        """
+        method = method.upper()
+        attempt = 0
+        endpoint = endpoint_name(method, url)
+        METRICS.mark_request_start()
+        while True:
+            self._count_call()
+            wait = self._quota_wait()
+            if wait:
+                await asyncio.sleep(wait)
+            started = time.perf_counter()
+            try:
+                async with self.session.request(
+                    method, url, headers=self.headers, timeout=self.client_timeout, **kwargs
+                ) as raw:
+                    body = await raw.read()
+                    resp = AsyncResponse(method, str(raw.url), raw.status, raw.headers, body)
+                self._record_quota_headers(resp.headers)
+                if METRICS.enabled:
+                    METRICS.observe_request(
+                        "surveymonkey", endpoint, resp.status_code, time.perf_counter() - started,
+                        bytes_sent=len(json.dumps(kwargs["json"])) if "json" in kwargs else 0,
+                        bytes_received=len(body),
+                    )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                METRICS.observe_request("surveymonkey", endpoint, "error", time.perf_counter() - started)
+                if method not in IDEMPOTENT_METHODS or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                print(f"SM API: {method} {url} failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+            else:
+                if not self._is_retryable(method, resp.status_code) or attempt >= self.max_retries:
+                    return resp
+                delay = self._retry_delay(resp, attempt)
+                if delay is None:
+                    # Daily quota is gone; waiting it out inside one run is pointless.
+                    print("SM API: daily request quota exhausted, not retrying.")
+                    return resp
+                print(f"SM API: {method} {url} returned {resp.status_code}, retrying in {delay:.1f}s")
+            METRICS.observe_retry("surveymonkey", endpoint)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _raise_for_status(self, resp):
+        if resp.status_code == 404:
+            raise SurveyMonkeyNotFoundError(f"404 Not Found: {resp.method} {resp.url}")
+        if resp.status_code >= 400:
+            raise requests.HTTPError(f"{resp.status_code} Error: {resp.method} {resp.url}")
+
+    async def _get_page(self, url, params):
+        resp = await self._request("GET", url, params=params)
+        self._raise_for_status(resp)
+        return resp.json()
+
+    async def _iter_pages(self, url, params=None):
+        """
+        Yield every item of a list endpoint, in order, requesting the largest page size.
+        Once the first page reports the total, the other pages are fetched concurrently
+        (PAGINATION_WORKERS at a time) and each is yielded as soon as it and the pages before it
+        have arrived. Raises if any page fails, since callers treat the listing as complete.
+        """
+        per_page = config.SURVEYMONKEY_MAX_PAGE_SIZE
+        first_page = await self._get_page(url, self._page_params(params, 1, per_page))
+        for item in first_page.get("data", []):
+            yield item
+        pages = self._remaining_pages(first_page)
+        if pages is None:
+            # links.next already carries the query string
+            next_url = first_page.get("links", {}).get("next")
+            while next_url:
+                data = await self._get_page(next_url, None)
+                for item in data.get("data", []):
+                    yield item
+                next_url = data.get("links", {}).get("next")
+            return
+        # The API may cap per_page below what we asked for; page numbers follow what it used.
+        per_page = first_page["per_page"]
+        limit = asyncio.Semaphore(config.PAGINATION_WORKERS)
+
+        async def fetch(page):
+            async with limit:
+                return await self._get_page(url, self._page_params(params, page, per_page))
+
+        tasks = [asyncio.ensure_future(fetch(page)) for page in pages]
+        try:
+            for task in tasks:
+                for item in (await task).get("data", []):
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _get_all_pages(self, url, params=None):
+        return [item async for item in self._iter_pages(url, params)]
+
+    # ------------------------
+    # Survey
+    # ------------------------
+    async def get_survey_id_by_name(self, survey_name):
+        resp = await self._request("GET", f"{self.base_url}/surveys", params={"title": survey_name})
+        if resp.status_code != 200:
+            print(f"Warning: failed to fetch surveys (status {resp.status_code})")
+            return None, None
+        data = resp.json().get("data", [])
+        if not data:
+            return None, None
+        survey = data[0]
+        return survey["id"], survey["title"]
+
+    async def list_surveys(self, folder_id=None):
+        """
+        Every survey (in folder_id, if given), at the largest page size.
+        Returns a list of dicts with 'id' and 'title'. Raises if any page fails, since callers
+        treat the listing as complete.
+        """
+        params = {"folder_id": folder_id} if folder_id else None
+        return await self._get_all_pages(f"{self.base_url}/surveys", params)
+
+    async def clone_survey(self, survey_id, new_title):
+        """
+        Clone a template survey by ID and name the new copy new_title.
+        Returns the new survey_id.
+        """
+        payload = {"title": new_title, "folder_id": config.SURVEYMONKEY_FOLDER_ID, "from_survey_id": survey_id}
+        resp = await self._request("POST", f"{self.base_url}/surveys", json=payload)
+        self._raise_for_status(resp)
+        return resp.json()["id"]
+
+    async def get_survey(self, survey_id):
+        """
+        Survey details (title, date_modified, ...).
+        """
+        resp = await self._request("GET", f"{self.base_url}/surveys/{survey_id}")
+        self._raise_for_status(resp)
+        return resp.json()
+
+    async def rename_survey(self, survey_id, new_title):
+        resp = await self._request("PATCH", f"{self.base_url}/surveys/{survey_id}", json={"title": new_title})
+        self._raise_for_status(resp)
+
+    async def delete_survey(self, survey_id):
+        resp = await self._request("DELETE", f"{self.base_url}/surveys/{survey_id}")
+        self._raise_for_status(resp)
+
+    # ------------------------
+    # Collector
+    # ------------------------
+    async def create_collector(self, survey_id, collector_name, close_dt):
+        payload = {"type": "email", "name": collector_name, "close_date": close_dt, "anonymous_type": "fully_anonymous"}
+        print(f"Creating collector '{collector_name}' (closes {close_dt}).")
+        resp = await self._request("POST", f"{self.base_url}/surveys/{survey_id}/collectors", json=payload)
+        self._raise_for_status(resp)
+        collector = resp.json()
+        return collector["id"], collector.get("url")
+
+    async def delete_collector(self, collector_id):
+        resp = await self._request("DELETE", f"{self.base_url}/collectors/{collector_id}")
+        self._raise_for_status(resp)
+
+    async def get_collector(self, collector_id):
+        """
+        Collector details, including close_date.
+        """
+        resp = await self._request("GET", f"{self.base_url}/collectors/{collector_id}")
+        self._raise_for_status(resp)
+        return resp.json()
+
+    async def update_collector_close_date(self, collector_id, close_dt):
+        print(f"Moving collector {collector_id}'s close date to {close_dt}.")
+        resp = await self._request("PATCH", f"{self.base_url}/collectors/{collector_id}", json={"close_date": close_dt})
+        self._raise_for_status(resp)
+
+    async def get_collector_by_name(self, survey_id, collector_name):
+        """
+        Fetch collector ID (and URL) for a given survey by collector name.
+        Returns (collector_id, collector_url) or (None, None) if not found.
+        """
+        print(f"SM AAPI: trying to get collector by collector name: '{collector_name}'")
+        resp = await self._request(
+            "GET", f"{self.base_url}/surveys/{survey_id}/collectors", params={"name": collector_name}
+        )
+        if resp.status_code == 404:
+            self._raise_for_status(resp)
+        if resp.status_code != 200:
+            print(f"Warning: failed to fetch collectors (status {resp.status_code})")
+            return None, None
+        collectors = resp.json().get("data", [])
+        if not collectors:
+            return None, None
+        print(f"Found the collector by name (id {collectors[0]['id']}).")
+        col = collectors[0]
+        return col["id"], col.get("href")
+
+    async def list_collectors(self, survey_id):
+        """
+        Every collector on a survey, as dicts with 'id', 'name' and 'href'. Raises if any page fails.
+        """
+        return await self._get_all_pages(f"{self.base_url}/surveys/{survey_id}/collectors")
+
+    # ------------------------
+    # Recipients
+    # ------------------------
+    async def add_recipients(self, collector_id, message_id, emails, chunk_size=None, workers=None, contact_ids=None):
+        """
+        Add emails to a message in chunks of at most chunk_size contacts, with up to workers chunks in
+        flight (each request is still paced by the quota manager).
+        A chunk that fails with a 429/5xx or a dropped connection is resent on its own; one rejected for
+        its content (400/413/422) is split in half until the refused contact(s) are isolated as invalid.
+        Returns a BulkRecipientResult. Raises RecipientUploadError, after trying every chunk, if some
+        contacts could not be sent at all.
+        contact_ids: {email: contact_id} for emails to send as existing SurveyMonkey contacts.
+        """
+        url = f"{self.base_url}/collectors/{collector_id}/messages/{message_id}/recipients/bulk"
+        contact_ids = contact_ids or {}
+        limit = asyncio.Semaphore(workers or config.RECIPIENT_UPLOAD_WORKERS)
+
+        async def upload(chunk):
+            async with limit:
+                return await self._upload_chunk(url, chunk, contact_ids)
+
+        result = BulkRecipientResult()
+        for chunk_result in await asyncio.gather(*(upload(c) for c in self._bulk_chunks(emails, chunk_size))):
+            result.merge(chunk_result)
+        result.print_summary()
+        if result.failed:
+            raise RecipientUploadError(result)
+        return result
+
+    async def _upload_chunk(self, url, emails, contact_ids, attempt=0):
+        result = BulkRecipientResult()
+        result.requests += 1
+        try:
+            resp = await self._request("POST", url, json=self._recipients_payload(emails, contact_ids))
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            status_code, error = None, e.__class__.__name__
+        else:
+            if resp.status_code < 400:
+                result.add_response(resp.json())
+                return result
+            status_code, error = resp.status_code, f"HTTP {resp.status_code}"
+
+        action = self._bulk_failure_action(status_code)
+        if action == "raise":
+            self._raise_for_status(resp)
+        if action == "bisect":
+            if len(emails) == 1:
+                print(f"SurveyMonkey rejected recipient {emails[0]} ({error}).")
+                result.invalid += emails
+                return result
+            middle = len(emails) // 2
+            halves = await asyncio.gather(self._upload_chunk(url, emails[:middle], contact_ids),
+                                          self._upload_chunk(url, emails[middle:], contact_ids))
+            for half in halves:
+                result.merge(half)
+            return result
+        if attempt < config.RECIPIENT_CHUNK_RETRIES:
+            delay = self._backoff_delay(attempt)
+            print(f"Recipient chunk of {len(emails)} failed ({error}), resending in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            retried = await self._upload_chunk(url, emails, contact_ids, attempt + 1)
+            retried.requests += result.requests
+            return retried
+        result.failed.update({email: error for email in emails})
+        return result
+
+    async def delete_recipients_in_collector_but_not_in_file(self, collector_id, sheet_emails):
+        """
+        Sync collector recipients to match the current sheet.
+        Only remove recipients who are no longer in the sheet.
+        Adding new recipients can be done in bulk; duplicates are ignored by SM.
+        """
+        existing = await self.get_recipients(collector_id)
+        existing_emails = {r["email"]: r["id"] for r in existing}
+        to_remove = set(existing_emails.keys()) - set(sheet_emails)
+        if to_remove:
+            print("Collector has emails that are not present in latest file:")
+            print(to_remove)
+        else:
+            print("No recipients exist on the collector that are not present in the file.")
+        for email in to_remove:
+            if await self.delete_recipient(collector_id, existing_emails[email]):
+                print(f"Recipient {email} removed from file has been removed from the collector.")
+            else:
+                print(f"Warning: failed to remove recipient {email}")
+
+    async def delete_recipient(self, collector_id, recipient_id) -> bool:
+        resp = await self._request("DELETE", f"{self.base_url}/collectors/{collector_id}/recipients/{recipient_id}")
+        if resp.status_code not in (200, 204):
+            print(f"Warning: failed to remove recipient {recipient_id} (status {resp.status_code})")
+            return False
+        return True
+
+    async def get_recipients(self, collector_id, include=None):
+        """
+        Fetch existing recipients for a collector.
+        Returns a list of dicts with at least 'id' and 'email'.
+        include: optional extra fields, e.g. ["survey_response_status", "mail_status"].
+        """
+        return [recipient async for recipient in self.iter_recipients(collector_id, include)]
+
+    def iter_recipients(self, collector_id, include=None):
+        """
+        Streaming form of get_recipients: an async iterator over recipients, page by page as the pages arrive.
+        """
+        params = {"include": ",".join(include)} if include else None
+        return self._iter_pages(f"{self.base_url}/collectors/{collector_id}/recipients", params)
+
+    # ------------------------
+    # Contacts
+    # ------------------------
+    async def create_contacts(self, contacts, contact_list_id=None):
+        """
+        contacts: [{"email", "first_name", "last_name"}], created in chunks (inside contact_list_id, if given).
+        Returns {lowercased email: contact_id}, including contacts SurveyMonkey already had.
+        """
+        contact_ids = {}
+        for chunk in self._bulk_chunks(contacts):
+            resp = await self._request("POST", self._contacts_bulk_url(contact_list_id), json={"contacts": chunk})
+            self._raise_for_status(resp)
+            contact_ids.update(self._created_contact_ids(resp.json()))
+        return contact_ids
+
+    async def update_contact(self, contact_id, first_name, last_name):
+        resp = await self._request(
+            "PATCH", f"{self.base_url}/contacts/{contact_id}", json={"first_name": first_name, "last_name": last_name}
+        )
+        self._raise_for_status(resp)
+
+    # ------------------------
+    # Messages
+    # ------------------------
+    async def schedule_message(self, collector_id, message_id, schedule_dt):
+        dt_utc = self._parse_iso_z(schedule_dt).astimezone(timezone.utc)
+        resp = await self._request(
+            "POST",
+            f"{self.base_url}/collectors/{collector_id}/messages/{message_id}/send",
+            json={"scheduled_date": self._to_api_iso_z(dt_utc)},
+        )
+        self._raise_for_status(resp)
+        return resp.json()
+
+    async def create_invite_message(self, collector_id, survey_name):
+        payload = {"type": "invite", "subject": survey_name, "embed_first_question": True}
+        resp = await self._request("POST", f"{self.base_url}/collectors/{collector_id}/messages", json=payload)
+        self._raise_for_status(resp)
+        return resp.json()["id"]
+
+    async def create_reminder_message(self, collector_id, subject):
+        payload = {
+            "subject": subject,
+            "type": "reminder",
+            "embed_first_question": True,
+            "recipient_status": "has_not_responded"
+        }
+        resp = await self._request("POST", f"{self.base_url}/collectors/{collector_id}/messages", json=payload)
+        self._raise_for_status(resp)
+        return resp.json()["id"]
+
+    async def schedule_reminder_message_send(self, collector_id, message_id, invite_sent_dt, days_after=3):
+        """
+        Schedule a reminder for an email collector for 3 days after collector is sent.
+        Only goes to recipients who have not responded or partially responded.
+        """
+        resp = await self._request(
+            "POST",
+            f"{self.base_url}/collectors/{collector_id}/messages/{message_id}/send",
+            json={"scheduled_date": self.reminder_send_time(invite_sent_dt, days_after)},
+        )
+        self._raise_for_status(resp)
+        return resp.json()
+
+    async def get_messages_on_collector(self, collector_id):
+        resp = await self._request("GET", f"{self.base_url}/collectors/{collector_id}/messages")
+        self._raise_for_status(resp)
+        return resp.json()["data"]
+
+    async def get_message(self, collector_id, message_id):
+        """
+        Message details, including status and scheduled_date (not in the collector's message list).
+        """
+        resp = await self._request("GET", f"{self.base_url}/collectors/{collector_id}/messages/{message_id}")
+        self._raise_for_status(resp)
+        return resp.json()
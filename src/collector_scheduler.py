@@ -1,116 +1,693 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from functools import cached_property
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 from google_sheets_api_client import GoogleSheetsApiClient
-from surveymonkey_api_client import SurveyMonkeyApiClient
-from config import SURVEY_TEMPLATES, UNPROCESSED_FOLDER_ID, PROCESSED_FOLDER_ID
-from config_local import SURVEYMONKEY_API_TOKEN
+from programs import FairSheetQueue, load_programs
+from surveymonkey_api_client import SurveyMonkeyApiClient, SurveyMonkeyNotFoundError
+from surveymonkey_id_index import SurveyMonkeyIdIndex
+from surveymonkey_contact_mirror import SurveyMonkeyContactMirror
+from sheet_journal import SheetJournal, SheetSteps
+from survey_clone_pool import SurveyClonePool
+from surveymonkey_run_index import SurveyMonkeyRunIndex
+from recipient_sync_planner import RecipientSyncPlanner, bulk_add_calls
+from quota_manager import QuotaManager
+from run_planner import RunPlanner, diagnostics_to_stderr, print_plan
+from metrics import METRICS
+from sheet_output import captured_sheet_output
+from config import (
+    SHEET_WORKERS, SURVEYMONKEY_ID_INDEX_PATH, SURVEYMONKEY_MAX_PAGE_SIZE,
+    CONTACT_MIRROR_PATH, SURVEYMONKEY_CONTACT_LIST_ID, SHEET_JOURNAL_PATH,
+    DEADLINE_URGENT_HOURS, RUN_TIME_BUDGET_SECONDS, SURVEY_CLONE_POOL_SPARES, CONTACT_RENAMES_PER_SHEET,
+)
 
 
 class CollectorScheduler:
-    def __init__(self):
-        self.surveymonkey_client = SurveyMonkeyApiClient(SURVEYMONKEY_API_TOKEN)
+    """
+    The SurveyMonkey work is written once, as coroutines (the *_async methods), and runs on
+    surveymonkey_client's event loop; the synchronous methods of the same name are thin wrappers that
+    block until it is done. Sheets are processed as tasks, up to max_workers at a time.
+    """
+
+    def __init__(self, max_workers=None, time_budget=None):
+        self.quota = QuotaManager()
         self.google_sheets_client = GoogleSheetsApiClient()
+        self.id_index = SurveyMonkeyIdIndex(SURVEYMONKEY_ID_INDEX_PATH)
+        self.run_index = SurveyMonkeyRunIndex()
+        self.contact_mirror = SurveyMonkeyContactMirror(CONTACT_MIRROR_PATH, SURVEYMONKEY_CONTACT_LIST_ID)
+        self.journal = SheetJournal(SHEET_JOURNAL_PATH)
+        self.programs = load_programs()
+        self.clone_pool = SurveyClonePool(
+            SURVEY_CLONE_POOL_SPARES, [t for program in self.programs for t in program.templates.values()]
+        )
+        self.max_workers = max_workers or SHEET_WORKERS
+        self.time_budget = time_budget if time_budget is not None else RUN_TIME_BUDGET_SECONDS
+        # One lock per survey name, so sheets for the same program are processed one at a time.
+        # asyncio locks belong to one event loop, so every process_sheets_async() starts a fresh set.
+        self._survey_locks = defaultdict(asyncio.Lock)
+        # Sheets done in SurveyMonkey, moved to their processed folder together by flush_moves().
+        self._pending_moves = []  # (sheet_id, sheet_name, folder_id, steps)
+        self._pending_moves_lock = threading.Lock()
+        self._async_client = None  # set while AsyncCollectorScheduler runs on its own event loop
+        self.stop_event = None  # a threading.Event (DriveChangesWatcher's); once set, no new sheets are started
+
+    @cached_property
+    def surveymonkey_client(self):
+        # The API token (config_local) is only loaded once there is SurveyMonkey work to do.
+        from config_local import SURVEYMONKEY_API_TOKEN
+        return SurveyMonkeyApiClient(SURVEYMONKEY_API_TOKEN, quota=self.quota)
+
+    @property
+    def async_surveymonkey_client(self):
+        """
+        The client the coroutines call: the one for AsyncCollectorScheduler's own event loop while it
+        runs, otherwise the one behind surveymonkey_client (whose loop run_blocking() uses).
+        """
+        return self._async_client or self.surveymonkey_client.core
+
+    @property
+    def recipient_sync_planner(self):
+        return RecipientSyncPlanner(self.async_surveymonkey_client, contact_mirror=self.contact_mirror)
+
+    def run_blocking(self, coro):
+        """
+        Run one of the coroutines from synchronous code and return its result.
+        """
+        return self.surveymonkey_client.run(coro)
 
     def run(self):
         # Get all unprocessed sheets
-        sheets = self.google_sheets_client.list_sheets_in_folder(UNPROCESSED_FOLDER_ID)
-        for sheet_id, sheet_name in sheets:
-            # Pull data from sheet and validate it
-            event_title, conductor_name, event_date, recipient_emails_on_sheet = self.google_sheets_client.read_roster_sheet(sheet_id)
-            if not self.is_google_sheet_valid(event_title, conductor_name, event_date, recipient_emails_on_sheet):
-                print("Error(s) found with Google Sheet formatting. Skipping this Sheet.")
-                continue
+        sheets = self.list_unprocessed_sheets()
+        if not sheets:
+            # The common case on a frequent schedule: stop before any SurveyMonkey setup.
+            print("No unprocessed sheets. (: ")
+            return
+        self.process_sheets(sheets)
+        # Between runs, off the sheets' critical path: replace the spares this run claimed.
+        self.refill_clone_pool()
+        self.quota.save()
+        METRICS.export()
+        print("No sheets left to process. (: ")
+
+    def plan(self, as_json=False):
+        """
+        Dry run: print what run() would do for each unprocessed sheet, with predicted call counts and
+        wall time, without changing anything in SurveyMonkey or Drive.
+        """
+        with diagnostics_to_stderr(as_json):
+            sheets = self.list_unprocessed_sheets()
+            plans = RunPlanner(self).plan(sheets)
+        print_plan(plans, self.max_workers, as_json=as_json)
+        return plans
+
+    def list_unprocessed_sheets(self):
+        """
+        Returns (program, sheet_id, sheet_name) for every sheet in every program's unprocessed folder.
+        """
+        sheets = []
+        for program in self.programs:
+            program_sheets = self.google_sheets_client.list_sheets_in_folder(program.unprocessed_folder_id)
+            if program_sheets and len(self.programs) > 1:
+                print(f"{program.name}: {len(program_sheets)} unprocessed sheet(s).")
+            sheets += [(program, sheet_id, sheet_name) for sheet_id, sheet_name in program_sheets]
+        return sheets
+
+    def read_rosters(self, sheets):
+        """
+        Read every roster up front, a few at a time, with each program's extra recipients added.
+        Returns {sheet_id: Roster}; sheets that could not be read are missing from it.
+        """
+        rosters = self.google_sheets_client.read_rosters([sheet_id for _, sheet_id, _ in sheets])
+        for program, sheet_id, _ in sheets:
+            if sheet_id in rosters:
+                program.add_extra_recipients(rosters[sheet_id])
+        return rosters
+
+    def process_sheets(self, sheets):
+        """
+        Process (program, sheet_id, sheet_name) work, most urgent invite deadline first, round-robin
+        across programs otherwise, and concurrently when max_workers > 1.
+        Returns the IDs of the sheets completed and moved to their processed folder; the others were
+        skipped, left for a later run (quota, time budget) or could not be moved.
+        """
+        return self.run_blocking(self.process_sheets_async(sheets))
+
+    async def process_sheets_async(self, sheets):
+        # gspread and the Drive batch requests are blocking clients; keep them off the event loop.
+        rosters = await asyncio.to_thread(self.read_rosters, sheets)
+        # Unreadable sheets stay where they are, unprocessed.
+        sheets = [work for work in sheets if work[1] in rosters]
+        await self.prefetch_surveymonkey_async(rosters.values())
+        queue = self.prioritize(sheets, rosters)
+        self._survey_locks = defaultdict(asyncio.Lock)
+        try:
+            await self._process_queue(queue, rosters, len(sheets))
+        finally:
+            # Also when a sheet fails: the ones that finished before it still get moved.
+            moved = await asyncio.to_thread(self.flush_moves)
+            self.report_deadlines(sheets, rosters, moved)
+        return moved
+
+    def prioritize(self, sheets, rosters):
+        deadlines = {sheet_id: self.invite_deadline(rosters[sheet_id].event_date) for _, sheet_id, _ in sheets}
+        return FairSheetQueue(sheets, deadlines)
+
+    def _budget_spent(self, started):
+        """
+        True once the run's time budget is used up; from then on only urgent sheets are started.
+        """
+        if self.time_budget is None or time.monotonic() - started < self.time_budget:
+            return False
+        if not self._budget_reported:
+            print(f"Run time budget of {self.time_budget}s spent; leaving sheets with later invites for the next run.")
+            self._budget_reported = True
+        return True
+
+    async def _process_queue(self, queue, rosters, sheet_count):
+        started = time.monotonic()
+        self._budget_reported = False
+        process = self.process_sheet_async
+        if self.max_workers > 1:
+            print(f"Processing {sheet_count} sheet(s), up to {self.max_workers} at a time.")
+            process = self._process_sheet_with_captured_output
+        running = {}  # task -> program
+        try:
+            while queue or running:
+                # Start sheets while there are free workers and programs under their cap.
+                while len(running) < self.max_workers and not self._stopping():
+                    work = queue.next_ready(urgent_only=self._budget_spent(started))
+                    if work is None:
+                        break
+                    program, sheet_id, sheet_name = work
+                    running[asyncio.create_task(process(sheet_id, sheet_name, rosters[sheet_id], program))] = program
+                if not running:
+                    break  # the time budget left only non-urgent sheets, or we are stopping
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    queue.finished(running.pop(task))
+                    task.result()
+        finally:
+            # A failed sheet stops new ones from starting, but the ones in flight finish and queue their
+            # moves; the failure is raised after.
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    def _stopping(self):
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def prefetch_surveymonkey(self, rosters):
+        self.run_blocking(self.prefetch_surveymonkey_async(rosters))
 
-            # create Collector name and page title and Survey Name
-            collector_name = f"Email Invitation for {conductor_name} ({event_title})"  # e.g., Ludovic Morlot (SUB 9)
-            survey_name = f"Conductor Evaluation for {conductor_name} ({event_title})"
+    async def prefetch_surveymonkey_async(self, rosters):
+        """
+        Start a fresh run index from one listing of the survey folder plus the collectors and messages
+        of the surveys these rosters map to.
+        """
+        self.run_index = SurveyMonkeyRunIndex()
+        pending = self.pending_names(rosters)
+        if not pending:
+            return
+        with METRICS.phase("prefetch"):
+            client = self.async_surveymonkey_client
+            await self.run_index.prefetch(client, pending)
+            await self.clone_pool.load(client, self.run_index.survey_ids)
 
-            # Get appropriate template Survey ID
-            template_survey_id = self.get_required_template_survey_id(event_title)
-            print("template_survey_id", template_survey_id)
+    def refill_clone_pool(self, only_if_claimed=False):
+        # Checked here too, so a disabled pool never starts the SurveyMonkey client.
+        if self._refill_wanted(only_if_claimed):
+            self.run_blocking(self.refill_clone_pool_async(only_if_claimed))
 
+    async def refill_clone_pool_async(self, only_if_claimed=False):
+        """
+        Top up the spare template clones. only_if_claimed: skip (and its lookups) unless a spare was used.
+        """
+        if not self._refill_wanted(only_if_claimed):
+            return
+        with METRICS.phase("refill"):
+            await self.clone_pool.refill(self.async_surveymonkey_client, self.quota)
 
-            print("event_title, conductor_name, event_date, number of recipient emails:")
-            print(event_title, conductor_name, event_date, f"{len(recipient_emails_on_sheet)} valid emails on sheet")
-            print("^ thats from google drive ------------- \n")
+    def _refill_wanted(self, only_if_claimed):
+        return self.clone_pool.enabled and not (only_if_claimed and not self.clone_pool.claimed)
 
+    def pending_names(self, rosters):
+        return {
+            self.survey_and_collector_names(roster.event_title, roster.conductor_name)
+            for roster in rosters if roster.event_title and roster.conductor_name
+        }
 
+    def survey_and_collector_names(self, event_title, conductor_name):
+        survey_name = f"Conductor Evaluation for {conductor_name} ({event_title})"
+        collector_name = f"Email Invitation for {conductor_name} ({event_title})"  # e.g., Ludovic Morlot (SUB 9)
+        return survey_name, collector_name
+
+    def people_on_sheet(self, emails, names=None):
+        # Emails without a row on the sheet (the librarians) get blank names.
+        names = names or {}
+        return {email: names.get(email, ("", "")) for email in emails}
+
+    async def _process_sheet_with_captured_output(self, sheet_id, sheet_name, roster=None, program=None):
+        # Buffer this sheet's output so its log prints as one uninterrupted block.
+        with captured_sheet_output(sheet_name):
+            await self.process_sheet_async(sheet_id, sheet_name, roster, program)
+
+    def process_sheet(self, sheet_id, sheet_name, roster=None, program=None):
+        self.run_blocking(self.process_sheet_async(sheet_id, sheet_name, roster, program))
+
+    async def process_sheet_async(self, sheet_id, sheet_name, roster=None, program=None):
+        program = program or self.programs[0]
+        with METRICS.sheet(sheet_id, sheet_name):
+            if roster is None:
+                roster = program.add_extra_recipients(
+                    await asyncio.to_thread(self.google_sheets_client.read_roster, sheet_id)
+                )
+            await self._process_sheet(sheet_id, sheet_name, roster, program)
+
+    async def _process_sheet(self, sheet_id, sheet_name, roster, program):
+        # Validate the sheet's data
+        event_title, conductor_name, event_date = roster.event_title, roster.conductor_name, roster.event_date
+        recipient_emails_on_sheet = roster.emails
+        if not self.is_google_sheet_valid(event_title, conductor_name, event_date, recipient_emails_on_sheet):
+            print("Error(s) found with Google Sheet formatting. Skipping this Sheet.")
+            return
+
+        # create Collector name and page title and Survey Name
+        survey_name, collector_name = self.survey_and_collector_names(event_title, conductor_name)
+
+        # Get appropriate template Survey ID
+        template_survey_id = self.get_required_template_survey_id(event_title, program)
+        print("template_survey_id", template_survey_id)
+
+
+        print("event_title, conductor_name, event_date, number of recipient emails:")
+        print(event_title, conductor_name, event_date, f"{len(recipient_emails_on_sheet)} valid emails on sheet")
+        print("^ thats from google drive ------------- \n")
+
+        # Don't start a sheet that today's remaining SurveyMonkey quota can't finish.
+        reservation = self._reserve_daily_quota(sheet_name, roster)
+        if reservation is None:
+            return
+
+        steps = self.open_journal(sheet_id, sheet_name, roster)
+        try:
+            # The sheet's requests are paid out of its reservation; release_daily returns the rest.
+            with self.quota.charging(reservation):
+                # Two sheets for the same program must not both clone the survey or create the collector.
+                async with self._survey_locks[survey_name]:
+                    try:
+                        await self.sync_collector_async(
+                            survey_name, collector_name, template_survey_id, event_date, recipient_emails_on_sheet,
+                            recipient_names=roster.names, steps=steps,
+                        )
+                    except SurveyMonkeyNotFoundError as e:
+                        # An ID from the local index points at something that no longer exists. Forget it and rediscover.
+                        print(f"Cached SurveyMonkey IDs for '{survey_name}' are stale ({e}). Looking them up again.")
+                        self.id_index.evict_survey(survey_name)
+                        self.run_index.evict_survey(survey_name)
+                        steps.clear()
+                        await self.sync_collector_async(
+                            survey_name, collector_name, template_survey_id, event_date, recipient_emails_on_sheet,
+                            recipient_names=roster.names, use_id_index=False, steps=steps,
+                        )
+        finally:
+            self.quota.release_daily(reservation)
+
+        # Move sheet to processed folder (batched with the run's other sheets)
+        self.queue_move(sheet_id, sheet_name, program.processed_folder_id, steps)
+
+    def queue_move(self, sheet_id, sheet_name, folder_id, steps):
+        with self._pending_moves_lock:
+            self._pending_moves.append((sheet_id, sheet_name, folder_id, steps))
+
+    def known_parents(self, sheet_id):
+        # Parent folders seen when the sheet was listed (None: look them up at move time).
+        return self.google_sheets_client.sheet_parents.get(sheet_id)
+
+    def flush_moves(self):
+        """
+        Move every queued sheet to its processed folder in as few Drive batch requests as possible.
+        A sheet whose own move failed keeps its journal and stays in the unprocessed folder, so the next
+        run picks it up again and finds its SurveyMonkey steps already done.
+        Returns the IDs of the sheets moved.
+        """
+        with self._pending_moves_lock:
+            pending, self._pending_moves = self._pending_moves, []
+        if not pending:
+            return set()
+        moves = [(sheet_id, folder_id, self.known_parents(sheet_id)) for sheet_id, _, folder_id, _ in pending]
+        with METRICS.phase("move"):
+            errors = self.google_sheets_client.move_sheets_to_folders(moves)
+        moved = set()
+        for sheet_id, sheet_name, _, steps in pending:
+            error = errors.get(sheet_id)
+            if error is not None:
+                print(f"Could not move {sheet_name} to the PROCESSED folder ({error}); it will be retried next run.")
+                continue
+            steps.clear()
+            moved.add(sheet_id)
+            print(f"{sheet_name} moved to PROCESSED folder.")
+        return moved
+
+    def report_deadlines(self, sheets, rosters, moved):
+        """
+        Print the sheets left unprocessed whose invite send time has passed or falls within
+        DEADLINE_URGENT_HOURS. Returns (missed, at_risk) as lists of (deadline, sheet_name).
+        """
+        now = datetime.now(timezone.utc)
+        at_risk_before = now + timedelta(hours=DEADLINE_URGENT_HOURS)
+        missed, at_risk = [], []
+        for _, sheet_id, sheet_name in sheets:
+            deadline = self.invite_deadline(rosters[sheet_id].event_date)
+            if sheet_id in moved or deadline is None:
+                continue
+            if deadline <= now:
+                missed.append((deadline, sheet_name))
+            elif deadline <= at_risk_before:
+                at_risk.append((deadline, sheet_name))
+        for deadline, sheet_name in sorted(missed):
+            print(f"MISSED: invite for '{sheet_name}' was due {deadline:%Y-%m-%d %H:%M} UTC and was not scheduled.")
+        for deadline, sheet_name in sorted(at_risk):
+            print(f"AT RISK: invite for '{sheet_name}' is due {deadline:%Y-%m-%d %H:%M} UTC and is still unprocessed.")
+        return missed, at_risk
+
+    def open_journal(self, sheet_id, sheet_name, roster):
+        steps = self.journal.open(sheet_id, roster.revision)
+        if steps.done:
+            print(f"Resuming '{sheet_name}'; an earlier run already finished: {', '.join(steps.done)}.")
+        return steps
+
+    def sync_collector(self, survey_name, collector_name, template_survey_id, event_date, recipient_emails_on_sheet,
+                       recipient_names=None, use_id_index=True, steps=None):
+        self.run_blocking(self.sync_collector_async(
+            survey_name, collector_name, template_survey_id, event_date, recipient_emails_on_sheet,
+            recipient_names=recipient_names, use_id_index=use_id_index, steps=steps,
+        ))
+
+    async def sync_collector_async(self, survey_name, collector_name, template_survey_id, event_date,
+                                   recipient_emails_on_sheet, recipient_names=None, use_id_index=True, steps=None):
+        """
+        Make sure the survey, its email collector and the invite/reminder messages exist,
+        sync recipients with the sheet and schedule both messages.
+        IDs remembered by the local index are used instead of discovery calls when use_id_index is set.
+        recipient_names: {email: (first name, last name)} for the contact mirror.
+        steps: the sheet's SheetSteps; steps an interrupted run already finished are skipped.
+        """
+        client = self.async_surveymonkey_client
+        steps = steps or SheetSteps.untracked()
+        survey_step = steps.get("survey")
+        if survey_step:
+            survey_id = survey_step["survey_id"]
+            self.run_index.add_survey(survey_name, survey_id)
+        else:
             # Get Survey ID for this program, if it exists already. 
-            existing_survey_id, _ = self.surveymonkey_client.get_survey_id_by_name(survey_name)
+            existing_survey_id = await self.find_survey_id_async(survey_name, use_id_index)
 
-            # Create survey if needed. 
+            # Create survey if needed, from a pre-cloned spare when there is one.
             if not existing_survey_id:
                 print("Creating new survey for this program.")
-                survey_id = self.surveymonkey_client.clone_survey(template_survey_id, survey_name)
+                with METRICS.phase("create"):
+                    survey_id = await self.clone_pool.claim(client, template_survey_id, survey_name)
+                    if not survey_id:
+                        survey_id = await client.clone_survey(template_survey_id, survey_name)
                 print("New survey's id: ", survey_id)
             else:
                 print(f"Survey '{existing_survey_id}' already exists for this program.")
                 survey_id = existing_survey_id
+            self.id_index.set_survey_id(survey_name, survey_id)
+            self.run_index.add_survey(survey_name, survey_id, created=not existing_survey_id)
+            steps.record("survey", survey_id=survey_id)
 
-            invite_send_timestamp = self.calculate_distribution_time_for_event_date(event_date)
-            close_timestamp = self.calculate_closing_time_for_collector(event_date)
+        invite_send_timestamp = self.calculate_distribution_time_for_event_date(event_date)
+        close_timestamp = self.calculate_closing_time_for_collector(event_date)
 
+        collector_step = steps.get("collector")
+        if collector_step:
+            collector_id = collector_step["collector_id"]
+            self.run_index.add_collector(survey_id, collector_name, collector_id)
+        else:
             # Get the collector for this survey, if it exists.
-            does_collector_exist, collector_id = self.does_collector_with_this_name_already_exist(survey_id, collector_name)
+            collector_id = await self.find_collector_id_async(survey_id, collector_name, use_id_index)
 
             # If no collector exists, create it and set the closing time based on the Event Date.
-            if not does_collector_exist or not collector_id:
+            collector_created = not collector_id
+            if collector_created:
                 print(f"Creating new collector on survey. Collector name: '{collector_name}'")
-                collector_id, _ = self.surveymonkey_client.create_collector(
-                    survey_id, collector_name, close_timestamp
-                )
-
-            invite_message_id, reminder_message_id = "", ""
-
-            # if no messages exists, create invite message and reminder message
-            messages_on_collector = self.surveymonkey_client.get_messages_on_collector(collector_id)
-            print("messages_on_collector", messages_on_collector)
-
-            # if there are 1 or 2 messages, use the existing message id(s)
-            if len(messages_on_collector) > 0 and len(messages_on_collector) < 3:
-                print(f"{len(messages_on_collector)} message(s) already exist.")
-                for message in messages_on_collector:
-                    if message["type"] == "invite":
-                        invite_message_id = message["id"]
-                    if message["type"] == "reminder":
-                        reminder_message_id = message["id"]
-
-            # if invite_message_does not exist, create it
-            if not invite_message_id:
-                print("No invite message exists yet. Creating invite.")
-                invite_message_id = self.surveymonkey_client.create_invite_message(collector_id, survey_name)
-            # if reminder message does not exist, create reminder.
-            if not reminder_message_id:
-                print("No reminder message exists yet. Creating reminder.")
-                reminder_message_id = self.surveymonkey_client.create_reminder_message(
-                    collector_id,
-                    subject=f"Reminder: {survey_name}",
-                )
+                with METRICS.phase("create"):
+                    collector_id, _ = await client.create_collector(survey_id, collector_name, close_timestamp)
+            else:
+                # The event date may have moved since the collector was made.
+                with METRICS.phase("discover"):
+                    collector = await client.get_collector(collector_id)
+                if client.close_date_differs(collector, close_timestamp):
+                    await client.update_collector_close_date(collector_id, close_timestamp)
+            self.id_index.set_collector_id(survey_id, collector_name, collector_id)
+            self.run_index.add_collector(survey_id, collector_name, collector_id, created=collector_created)
+            steps.record("collector", collector_id=collector_id)
 
-            # throw if we dont have just one invite and one reminder at this point.
-            if not invite_message_id or not reminder_message_id or len(messages_on_collector) > 2:
-                raise Exception("Invalid message count for survey. Need one invite and one reminder.")
+        invite_message_id, reminder_message_id, messages_on_collector = await self.ensure_messages_async(
+            collector_id, survey_name, use_id_index, steps
+        )
 
-            print("Invite message ID: ", invite_message_id)
-            print("Reminder message ID: ", reminder_message_id)
+        recipients_step = steps.get("recipients")
+        if recipients_step:
+            collector_id = recipients_step["collector_id"]
+            invite_message_id = recipients_step["invite_message_id"]
+            reminder_message_id = recipients_step["reminder_message_id"]
+        else:
+            # Create/rename SurveyMonkey contacts for musicians the mirror hasn't seen or whose name changed
+            with METRICS.phase("contacts"):
+                contact_ids = await self.contact_mirror.sync(
+                    client, self.people_on_sheet(recipient_emails_on_sheet, recipient_names)
+                )
 
             # update/sync recipients on the INVITE message
             print("Syncing Surveymonkey recipients with Sheet...")
-            self.surveymonkey_client.delete_recipients_in_collector_but_not_in_file(collector_id, recipient_emails_on_sheet)
-            self.surveymonkey_client.add_recipients(collector_id, invite_message_id, recipient_emails_on_sheet)
+            with METRICS.phase("sync_recipients"):
+                sync_result = await self.recipient_sync_planner.sync(
+                    collector_id, invite_message_id, reminder_message_id, recipient_emails_on_sheet,
+                    survey_id, collector_name, survey_name, close_timestamp,
+                    # Messages we just created have not been sent, so an empty fetch is still a complete answer.
+                    messages=messages_on_collector,
+                    contact_ids=contact_ids,
+                )
+            if sync_result.collector_id != collector_id:
+                # The collector was torn down and recreated; remember the new IDs.
+                collector_id = sync_result.collector_id
+                invite_message_id = sync_result.invite_message_id
+                reminder_message_id = sync_result.reminder_message_id
+                self.id_index.set_collector_id(survey_id, collector_name, collector_id)
+                self.id_index.set_message_ids(collector_id, invite_message_id, reminder_message_id)
+                self.run_index.add_collector(survey_id, collector_name, collector_id, created=True)
+                self.run_index.update_message(collector_id, invite_message_id, "invite")
+                self.run_index.update_message(collector_id, reminder_message_id, "reminder")
+            steps.record("recipients", collector_id=collector_id, invite_message_id=invite_message_id,
+                         reminder_message_id=reminder_message_id)
             print("Recipients on collector synced with file.")
 
-            # schedule the invite message
-            self.surveymonkey_client.schedule_message(collector_id, invite_message_id, invite_send_timestamp)
-            # schedule the reminder message
-            self.surveymonkey_client.schedule_reminder_message_send(collector_id, reminder_message_id, invite_send_timestamp)
+        reminder_send_timestamp = client.reminder_send_time(invite_send_timestamp)
+        message_status = self.known_message_status(collector_id)
 
-            print(f"Invite, reminder, and recipients synced for survey, '{survey_name}'. Sheet processed.")
+        # schedule the invite message, unless it is already set for that time
+        async def schedule_invite():
+            if await self._needs_schedule(collector_id, invite_message_id, invite_send_timestamp, message_status):
+                await client.schedule_message(collector_id, invite_message_id, invite_send_timestamp)
+            steps.record("schedule_invite")
 
-            # Move sheet to processed folder
-            self.google_sheets_client.move_sheet_to_folder(sheet_id, PROCESSED_FOLDER_ID)
-            print(f"{sheet_name} moved to PROCESSED folder.")
-        print("No sheets left to process. (: ")
+        # schedule the reminder message
+        async def schedule_reminder():
+            if await self._needs_schedule(collector_id, reminder_message_id, reminder_send_timestamp, message_status):
+                await client.schedule_reminder_message_send(collector_id, reminder_message_id, invite_send_timestamp)
+            steps.record("schedule_reminder")
+
+        # The two schedules don't depend on each other.
+        with METRICS.phase("schedule"):
+            await asyncio.gather(*(
+                schedule() for step, schedule in (("schedule_invite", schedule_invite),
+                                                  ("schedule_reminder", schedule_reminder))
+                if not steps.finished(step)
+            ))
+        self.run_index.update_message(collector_id, invite_message_id, "invite", status="scheduled")
+        self.run_index.update_message(collector_id, reminder_message_id, "reminder", status="scheduled")
+
+        print(f"Invite, reminder, and recipients synced for survey, '{survey_name}'. Sheet processed.")
+
+    def known_message_status(self, collector_id):
+        """
+        {message_id: status} for the collector's messages, if this run has tracked them (prefetched or
+        created); empty otherwise.
+        """
+        known, messages = self.run_index.find_messages(collector_id)
+        return {m["id"]: m.get("status") for m in messages} if known else {}
+
+    async def _needs_schedule(self, collector_id, message_id, send_timestamp, message_status):
+        """
+        False when the message is already scheduled for send_timestamp, so re-runs skip the write.
+        A message known to be unsent needs no read; otherwise its details are fetched to compare.
+        """
+        if message_status.get(message_id) == "not_sent":
+            return True
+        client = self.async_surveymonkey_client
+        message = await client.get_message(collector_id, message_id)
+        return self._schedule_differs(client, message_id, message, send_timestamp)
+
+    def _schedule_differs(self, client, message_id, message, send_timestamp):
+        if client.is_scheduled_for(message, send_timestamp):
+            print(f"Message {message_id} is already scheduled for {send_timestamp}; leaving it.")
+            return False
+        return True
+
+    async def ensure_messages_async(self, collector_id, survey_name, use_id_index, steps):
+        """
+        Find or create the collector's invite and reminder messages (both at once when both are missing).
+        Returns (invite_message_id, reminder_message_id, messages); messages is None when the collector's
+        message list was never fetched.
+        """
+        client = self.async_surveymonkey_client
+        messages_step = steps.get("messages")
+        if messages_step:
+            return messages_step["invite_message_id"], messages_step["reminder_message_id"], None
+
+        invite_message_id, reminder_message_id, messages_on_collector = await self.find_messages_async(
+            collector_id, use_id_index
+        )
+        messages_fetched = messages_on_collector is not None
+        messages_on_collector = messages_on_collector or []
+
+        async def create_invite():
+            print("No invite message exists yet. Creating invite.")
+            return await client.create_invite_message(collector_id, survey_name)
+
+        async def create_reminder():
+            print("No reminder message exists yet. Creating reminder.")
+            return await client.create_reminder_message(collector_id, subject=f"Reminder: {survey_name}")
+
+        async def existing(message_id):
+            return message_id
+
+        # Create whichever messages are missing.
+        with METRICS.phase("create"):
+            invite_message_id, reminder_message_id = await asyncio.gather(
+                existing(invite_message_id) if invite_message_id else create_invite(),
+                existing(reminder_message_id) if reminder_message_id else create_reminder(),
+            )
+
+        # throw if we dont have just one invite and one reminder at this point.
+        if not invite_message_id or not reminder_message_id or len(messages_on_collector) > 2:
+            raise Exception("Invalid message count for survey. Need one invite and one reminder.")
+        self.id_index.set_message_ids(collector_id, invite_message_id, reminder_message_id)
+        self.run_index.update_message(collector_id, invite_message_id, "invite")
+        self.run_index.update_message(collector_id, reminder_message_id, "reminder")
+
+        print("Invite message ID: ", invite_message_id)
+        print("Reminder message ID: ", reminder_message_id)
+        steps.record("messages", invite_message_id=invite_message_id, reminder_message_id=reminder_message_id)
+        return invite_message_id, reminder_message_id, messages_on_collector if messages_fetched else None
+
+    def find_survey_id(self, survey_name, use_id_index=True):
+        return self.run_blocking(self.find_survey_id_async(survey_name, use_id_index))
+
+    async def find_survey_id_async(self, survey_name, use_id_index=True):
+        """
+        Survey ID from the run's prefetch, else the local ID index, else a filtered API lookup.
+        None when the survey does not exist.
+        The prefetch only lists SURVEYMONKEY_FOLDER_ID, so a title it doesn't have may still be a survey
+        elsewhere in the account; that miss goes on to the ID index and the title search before the
+        caller clones a duplicate.
+        """
+        if use_id_index:
+            _, survey_id = self.run_index.find_survey(survey_name)
+            if survey_id:
+                return survey_id
+            survey_id = self.id_index.get_survey_id(survey_name)
+            if survey_id:
+                return survey_id
+        with METRICS.phase("discover"):
+            survey_id, _ = await self.async_surveymonkey_client.get_survey_id_by_name(survey_name)
+        return survey_id
+
+    def find_collector_id(self, survey_id, collector_name, use_id_index=True):
+        return self.run_blocking(self.find_collector_id_async(survey_id, collector_name, use_id_index))
+
+    async def find_collector_id_async(self, survey_id, collector_name, use_id_index=True):
+        """
+        Collector ID, looked up in the same order as find_survey_id_async. None when it does not exist.
+        """
+        if use_id_index:
+            known, collector_id = self.run_index.find_collector(survey_id, collector_name)
+            if known:
+                return collector_id
+            collector_id = self.id_index.get_collector_id(survey_id, collector_name)
+            if collector_id:
+                return collector_id
+        with METRICS.phase("discover"):
+            does_collector_exist, collector_id = await self.does_collector_with_this_name_already_exist(
+                survey_id, collector_name
+            )
+        return collector_id if does_collector_exist else None
+
+    def find_messages(self, collector_id, use_id_index=True):
+        return self.run_blocking(self.find_messages_async(collector_id, use_id_index))
+
+    async def find_messages_async(self, collector_id, use_id_index=True):
+        """
+        Returns (invite_message_id, reminder_message_id, messages). Missing IDs are "".
+        messages is the collector's full message list, or None when both IDs came from the local
+        ID index and the list was never fetched.
+        """
+        messages = None
+        if use_id_index:
+            known, messages = self.run_index.find_messages(collector_id)
+            if not known:
+                invite_message_id, reminder_message_id = self.id_index.get_message_ids(collector_id)
+                if invite_message_id and reminder_message_id:
+                    return invite_message_id, reminder_message_id, None
+        if messages is None:
+            with METRICS.phase("discover"):
+                messages = await self.async_surveymonkey_client.get_messages_on_collector(collector_id)
+        return self._message_ids(messages) + (messages,)
+
+    def _message_ids(self, messages):
+        print("messages_on_collector", [(m["id"], m["type"]) for m in messages])
+        invite_message_id, reminder_message_id = "", ""
+        # if there are 1 or 2 messages, use the existing message id(s)
+        if len(messages) > 0 and len(messages) < 3:
+            print(f"{len(messages)} message(s) already exist.")
+            for message in messages:
+                if message["type"] == "invite":
+                    invite_message_id = message["id"]
+                if message["type"] == "reminder":
+                    reminder_message_id = message["id"]
+        return invite_message_id, reminder_message_id
+
+    def estimate_sheet_api_calls(self, roster):
+        """
+        Upper bound on SurveyMonkey calls for one sheet, not counting recipient deletes (unknown until the
+        diff): 3 lookups, clone, create collector, 2 messages, every recipients page,
+        each bulk add chunk, 2 schedules and the 2 message reads that check them, the collector read and
+        close-date update, plus the bulk contact creates and the (capped) renames the contact mirror needs.
+        """
+        recipient_pages = len(roster.emails) // SURVEYMONKEY_MAX_PAGE_SIZE + 1
+        estimate = 12 + recipient_pages + bulk_add_calls(len(roster.emails))
+        if self.contact_mirror.enabled:
+            to_create, to_update = self.contact_mirror.changes(self.people_on_sheet(roster.emails, roster.names))
+            estimate += bulk_add_calls(len(to_create)) if to_create else 0
+            estimate += min(len(to_update), CONTACT_RENAMES_PER_SHEET)
+        return estimate
+
+    def _reserve_daily_quota(self, sheet_name, roster):
+        """
+        Reserve the sheet's estimated cost from today's budget. Returns the DailyReservation,
+        or None (and says so) when the sheet has to wait for a later run.
+        """
+        estimated_calls = self.estimate_sheet_api_calls(roster)
+        reservation = self.quota.try_reserve_daily(estimated_calls)
+        if reservation is None:
+            print(f"Not enough SurveyMonkey daily quota left for '{sheet_name}' "
+                  f"(needs ~{estimated_calls} calls, {self.quota.daily_budget_left()} left). "
+                  "Leaving it in the unprocessed folder for the next run.")
+        return reservation
 
     def is_google_sheet_valid(self, event_title, conductor_name, event_date, recipient_emails_on_sheet):
         errors = []
@@ -137,8 +714,10 @@ class CollectorScheduler:
             return False
         return True
 
-    def does_collector_with_this_name_already_exist(self, survey_id: str, collector_name: str):
-        collector_id, collector_url = self.surveymonkey_client.get_collector_by_name(survey_id, collector_name)
+    async def does_collector_with_this_name_already_exist(self, survey_id: str, collector_name: str):
+        collector_id, collector_url = await self.async_surveymonkey_client.get_collector_by_name(
+            survey_id, collector_name
+        )
         print("does_collector_with_this_name_already_exist collector_id, collector_url in response:")
         print(collector_id, collector_url)
         if collector_id and collector_url:
@@ -160,6 +739,15 @@ class CollectorScheduler:
         distribution_dt = (event_dt + timedelta(minutes=100)).astimezone(timezone.utc)
         return distribution_dt.isoformat().replace("+00:00", "Z")
 
+    def invite_deadline(self, event_date_str):
+        # The invite's send time as a UTC datetime, or None if the sheet's date can't be parsed.
+        try:
+            return datetime.fromisoformat(
+                self.calculate_distribution_time_for_event_date(event_date_str).replace("Z", "+00:00")
+            )
+        except (TypeError, ValueError):
+            return None
+
     def calculate_closing_time_for_collector(self, event_date_str: str) -> str:
         # Parse event time in Pacific, compute distribution (+100min) then closing (+8 days), return UTC ISO Z
         event_dt = datetime.strptime(event_date_str, "%Y-%m-%d %H:%M")
@@ -172,11 +760,6 @@ class CollectorScheduler:
         closing_dt = distribution_dt + timedelta(days=8)
         return closing_dt.isoformat().replace("+00:00", "Z")
 
-    def get_required_template_survey_id(self, event_title: str):
-        # TODO polish this?
+    def get_required_template_survey_id(self, event_title: str, program=None):
         print(f"event title is: {event_title}")
-        event_title_lowercase = event_title.lower()
-        if "opera" in event_title_lowercase:
-            return SURVEY_TEMPLATES["Seattle Opera"]
-        else:
-            return SURVEY_TEMPLATES["SSO"]
+        return (program or self.programs[0]).template_for(event_title)
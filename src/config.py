@@ -14,3 +14,111 @@ SURVEY_TEMPLATES = {
     "Assistant Conductor": "TODO",
     "Misc.": "TODO"
 }
+
+# Roster sources. Every program's unprocessed folder is read in the same run, sharing connection pools
+# and the SurveyMonkey quota; sheets are interleaved round-robin across programs.
+#   templates: lowercase keyword in the event title -> template survey ID ("default" when none match)
+#   extra_recipients: added to every roster of the program
+#   max_concurrent_sheets: cap on this program's sheets in flight at once (None: only the run's own limit)
+PROGRAMS = [
+    {
+        "name": "SSO",
+        "unprocessed_folder_id": UNPROCESSED_FOLDER_ID,
+        "processed_folder_id": PROCESSED_FOLDER_ID,
+        "templates": {"opera": SURVEY_TEMPLATES["Seattle Opera"], "default": SURVEY_TEMPLATES["SSO"]},
+        # The librarians
+        "extra_recipients": ["Olivia.sangiovese@gmail.com", "carledwardwilder@gmail.com"],
+        "max_concurrent_sheets": None,
+    },
+    # e.g. once its template and folders exist:
+    # {
+    #     "name": "Music Director",
+    #     "unprocessed_folder_id": "...",
+    #     "processed_folder_id": "...",
+    #     "templates": {"default": SURVEY_TEMPLATES["Music Director"]},
+    #     "extra_recipients": [],
+    #     "max_concurrent_sheets": 2,
+    # },
+]
+
+# SurveyMonkey HTTP client tuning
+SURVEYMONKEY_POOL_SIZE = 10  # keep-alive connections to api.surveymonkey.com; keep >= SHEET_WORKERS
+SURVEYMONKEY_TIMEOUT = (5, 30)  # (connect, read) seconds
+SURVEYMONKEY_MAX_RETRIES = 5
+SURVEYMONKEY_BACKOFF_BASE = 1.0  # seconds, doubled on every retry
+SURVEYMONKEY_BACKOFF_MAX = 60.0  # seconds
+
+# SurveyMonkey folder that every cloned survey goes into; the run prefetches its surveys once
+SURVEYMONKEY_FOLDER_ID = "1373789"
+# Spare clones of each program template kept in that folder, claimed instead of cloning (0 disables)
+SURVEY_CLONE_POOL_SPARES = 0
+SURVEYMONKEY_MAX_PAGE_SIZE = 1000  # largest per_page SurveyMonkey accepts on list endpoints
+PREFETCH_WORKERS = 4  # concurrent collector/message listings during the prefetch
+PAGINATION_WORKERS = 4  # pages of one listing fetched at once, once the first page gives the total
+DRIVE_MAX_PAGE_SIZE = 1000  # largest pageSize Drive accepts on files.list / changes.list
+DRIVE_BATCH_SIZE = 100  # Drive calls per batch request (Drive's limit)
+
+# Number of sheets processed at once by CollectorScheduler.run (1 = one after another)
+SHEET_WORKERS = 1
+
+# Sheets are started in order of invite send time (event + 100 minutes).
+DEADLINE_URGENT_HOURS = 24  # invites due within this window jump the program rotation and are reported if left
+RUN_TIME_BUDGET_SECONDS = None  # after this long, only urgent sheets are started (None: no budget)
+
+# Local SQLite cache of survey/collector/message IDs (None disables it)
+SURVEYMONKEY_ID_INDEX_PATH = "surveymonkey_ids.sqlite3"
+
+# Steps finished per sheet, so an interrupted run resumes where it stopped (None disables it)
+SHEET_JOURNAL_PATH = "sheet_journal.sqlite3"
+
+# Local SQLite mirror of SurveyMonkey contacts for roster musicians (None: send every recipient by email)
+CONTACT_MIRROR_PATH = "surveymonkey_contacts.sqlite3"
+# Contact list new musicians are added to (None: plain contacts, outside any list)
+SURVEYMONKEY_CONTACT_LIST_ID = None
+CONTACT_UPDATE_WORKERS = 4  # contact renames (one PATCH each) in flight at once
+CONTACT_RENAMES_PER_SHEET = 25  # renames sent per sheet; the rest wait for later runs
+
+# Concurrent DELETEs used when removing recipients one by one
+RECIPIENT_DELETE_WORKERS = 4
+
+# Bulk recipient upload (POST .../recipients/bulk)
+RECIPIENT_BULK_CHUNK_SIZE = 1000  # contacts per request; SurveyMonkey's per-request limit
+RECIPIENT_UPLOAD_WORKERS = 4  # chunks in flight at once
+RECIPIENT_CHUNK_RETRIES = 3  # resends of a chunk that failed with a 429/5xx or a dropped connection
+
+# Override the API roots (e.g. "http://localhost:8080/") to run against local fakes (see bench/)
+SURVEYMONKEY_API_BASE_URL = "https://api.surveymonkey.com/v3"
+DRIVE_API_ENDPOINT = None
+SHEETS_API_ENDPOINT = None
+
+# Watcher daemon (runner.py --watch)
+WATCHER_STATE_PATH = "drive_watcher_state.json"  # persisted changes-feed token and pending sheets
+WATCHER_HEALTH_PATH = "drive_watcher_health.json"
+WATCHER_POLL_INTERVAL_SECONDS = 30
+WATCHER_DEBOUNCE_SECONDS = 120  # wait this long after a sheet's last edit before processing it
+
+# Roster sheets read in parallel before processing
+ROSTER_READ_WORKERS = 4
+
+# asyncio mode (runner.py --async)
+ASYNC_SHEET_CONCURRENCY = 20  # sheets in flight at once
+ASYNC_CONNECTION_LIMIT = 100  # connections in the shared aiohttp pool (SurveyMonkey + Drive)
+
+# SurveyMonkey request quotas for this app (see the app's settings page)
+SURVEYMONKEY_REQUESTS_PER_MINUTE = 120
+SURVEYMONKEY_REQUESTS_PER_DAY = 500
+SURVEYMONKEY_QUOTA_STATE_PATH = "surveymonkey_quota.json"  # remaining daily budget, carried between runs
+
+# Plan mode (runner.py --plan): rough seconds per call, used for wall-time estimates
+PLAN_SECONDS_PER_CALL = {
+    "default": 0.5,
+    "clone_survey": 4.0,
+    "add_recipients": 1.5,
+    "move_sheet": 0.4,
+}
+PLAN_CHURN_WARNING_THRESHOLD = 10  # flag sheets that would remove at least this many recipients
+
+# Run metrics (runner.py --metrics or METRICS_ENABLED = True)
+METRICS_ENABLED = False
+METRICS_PROMETHEUS_PATH = "metrics.prom"
+METRICS_JSON_PATH = "metrics.json"
@@ -0,0 +1,199 @@
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+import config
+
+SPREADSHEET_MIME_TYPE = "application/vnd.google-apps.spreadsheet"
+
+
+class DriveChangesWatcher:
+    """
+    Long-running alternative to CollectorScheduler.run(). Follows the Drive changes feed and only
+    processes sheets that were added to or edited in a program's unprocessed folder (one folder when
+    folder_id is given).
+
+    Edits are debounced: a sheet is processed once it has gone debounce_seconds without a change,
+    so a PM filling in a roster doesn't trigger a sync per keystroke.
+    The feed token and the not-yet-processed sheets are persisted to state_path after every poll,
+    so a restart picks up exactly where the last process stopped.
+    """
+
+    def __init__(self, scheduler, folder_id=None, state_path=None, health_path=None,
+                 poll_interval=None, debounce_seconds=None):
+        self.scheduler = scheduler
+        self.google_sheets_client = scheduler.google_sheets_client
+        # unprocessed folder ID -> program
+        self.folders = {
+            program.unprocessed_folder_id: program for program in scheduler.programs
+            if folder_id is None or program.unprocessed_folder_id == folder_id
+        }
+        self.state_path = state_path or config.WATCHER_STATE_PATH
+        self.health_path = health_path or config.WATCHER_HEALTH_PATH
+        self.poll_interval = poll_interval or config.WATCHER_POLL_INTERVAL_SECONDS
+        self.debounce_seconds = config.WATCHER_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+
+        self.page_token = None
+        self.pending = {}  # sheet_id -> {"name": ..., "folder_id": ..., "last_change": unix time}
+        self.stop_event = threading.Event()
+        # Stopping lets the sheets in progress finish but starts no new ones.
+        scheduler.stop_event = self.stop_event
+        self.started_at = time.time()
+        self.last_poll_at = None
+        self.sheets_processed = 0
+        self.errors = 0
+        self.last_error = None
+
+    # ------------------------
+    # Lifecycle
+    # ------------------------
+    def run(self):
+        self._install_signal_handlers()
+        self._load_state()
+        if not self.page_token:
+            # First start: take a token first so nothing edited during the sweep is missed,
+            # then queue whatever is already sitting in the folder.
+            self.page_token = self.google_sheets_client.get_changes_start_page_token()
+            for folder_id in self.folders:
+                for sheet_id, sheet_name in self.google_sheets_client.list_sheets_in_folder(folder_id):
+                    self.pending[sheet_id] = {"name": sheet_name, "folder_id": folder_id, "last_change": 0}
+            self._save_state()
+        print(f"Watching {len(self.folders)} Drive folder(s) for roster changes. {len(self.pending)} sheet(s) pending.")
+
+        while not self.stop_event.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                self._record_error(f"Polling the Drive changes feed failed: {e}")
+            self._write_health("running")
+            self.stop_event.wait(self.poll_interval)
+
+        self._save_state()
+        self._write_health("stopped")
+        print("Drive watcher stopped.")
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _install_signal_handlers(self):
+        # Signal handlers can only be installed from the main thread (e.g. not when driven from a test thread).
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        def handle_signal(signum, _frame):
+            print(f"Received signal {signum}; finishing the sheets in progress and shutting down.")
+            self.stop()
+
+        signal.signal(signal.SIGTERM, handle_signal)
+        signal.signal(signal.SIGINT, handle_signal)
+
+    # ------------------------
+    # Polling
+    # ------------------------
+    def poll_once(self):
+        changes, new_token = self.google_sheets_client.list_changes(self.page_token)
+        now = time.time()
+        for change in changes:
+            self._apply_change(change, now)
+        self.page_token = new_token
+        self.last_poll_at = now
+        self._save_state()
+        self._process_due_sheets()
+
+    def _apply_change(self, change, now):
+        sheet_id = change.get("fileId")
+        file = change.get("file") or {}
+        folder_id = next((parent for parent in file.get("parents", []) if parent in self.folders), None)
+        in_folder = (
+            not change.get("removed")
+            and not file.get("trashed")
+            and file.get("mimeType") == SPREADSHEET_MIME_TYPE
+            and folder_id is not None
+        )
+        if in_folder:
+            self.pending[sheet_id] = {"name": file.get("name", sheet_id), "folder_id": folder_id, "last_change": now}
+        else:
+            # Moved out (e.g. by us, to the processed folder), trashed or deleted.
+            self.pending.pop(sheet_id, None)
+
+    def _process_due_sheets(self):
+        now = time.time()
+        due = [
+            (self._program_for(entry), sheet_id, entry["name"]) for sheet_id, entry in self.pending.items()
+            if now - entry["last_change"] >= self.debounce_seconds
+        ]
+        if not due or self.stop_event.is_set():
+            return
+        print(f"{len(due)} roster(s) ready to process.")
+        # One batch, so the sheets share the roster reads, the prefetch and the Drive batch move.
+        moved = set()
+        try:
+            moved = self.scheduler.process_sheets(due)
+        except Exception as e:
+            # Sheets that finished before the failure were still moved; the changes feed reports them
+            # as gone from the folder on the next poll.
+            self._record_error(f"Failed to process {len(due)} roster(s): {e}")
+        for _, sheet_id, _ in due:
+            if sheet_id in moved:
+                self.sheets_processed += 1
+                self.pending.pop(sheet_id, None)
+            elif sheet_id in self.pending:
+                # Skipped, failed, left for later (daily quota, time budget) or not moved: still in the
+                # unprocessed folder, so try again after another debounce period.
+                self.pending[sheet_id]["last_change"] = time.time()
+        self._save_state()
+        try:
+            self.scheduler.refill_clone_pool(only_if_claimed=True)
+        except Exception as e:
+            self._record_error(f"Refilling the survey clone pool failed: {e}")
+
+    def _program_for(self, entry):
+        # State saved before programs existed has no folder_id: those sheets came from the first program.
+        return self.folders.get(entry.get("folder_id")) or next(iter(self.folders.values()))
+
+    def _record_error(self, message):
+        print(message)
+        self.errors += 1
+        self.last_error = message
+
+    # ------------------------
+    # State and health
+    # ------------------------
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path) as f:
+            state = json.load(f)
+        self.page_token = state.get("page_token")
+        self.pending = state.get("pending", {})
+
+    def _save_state(self):
+        self._write_json(self.state_path, {"page_token": self.page_token, "pending": self.pending})
+
+    def _write_health(self, status):
+        health = {
+            "status": status,
+            "folder_ids": list(self.folders),
+            "started_at": _iso(self.started_at),
+            "last_poll_at": _iso(self.last_poll_at),
+            "pending_sheets": len(self.pending),
+            "sheets_processed": self.sheets_processed,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+        self._write_json(self.health_path, health)
+
+    def _write_json(self, path, data):
+        # Write then rename, so a crash mid-write never leaves a truncated file behind.
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def _iso(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace("+00:00", "Z")
@@ -0,0 +1,43 @@
+import asyncio
+import threading
+
+
+class EventLoopThread:
+    """
+    An asyncio event loop running on a daemon thread, so synchronous code can call coroutines:
+    run(coro) blocks the calling thread until coro finishes on the loop.
+    The caller's contextvars (count_api_calls(), metrics spans, captured sheet output) carry over
+    to the coroutine.
+    """
+
+    def __init__(self, name="event-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def run(self, coro):
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("EventLoopThread.run() called from its own loop; await the coroutine instead.")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def close(self, coro=None):
+        """
+        Run coro (e.g. closing a session) if given, then stop the loop. Safe to call from any thread;
+        from the loop's own thread it only schedules the shutdown.
+        """
+        if not self._thread.is_alive():
+            return
+        if threading.current_thread() is self._thread:
+            self.loop.create_task(self._shutdown(coro))
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(coro), self.loop)
+        self._thread.join()
+        self.loop.close()
+
+    async def _shutdown(self, coro):
+        try:
+            if coro is not None:
+                await coro
+        finally:
+            self.loop.stop()
@@ -1,76 +1,218 @@
 import config
-import gspread
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from metrics import METRICS
+import hashlib
+import json
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 EMAIL_REGEX = re.compile(
     r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
 )
 
 
+class Roster:
+    """
+    What CollectorScheduler needs from one roster sheet.
+    """
+
+    def __init__(self, sheet_id, event_title, conductor_name, event_date, emails, names=None):
+        self.sheet_id = sheet_id
+        self.event_title = event_title
+        self.conductor_name = conductor_name
+        self.event_date = event_date  # "YYYY-MM-DD HH:MM", Pacific time
+        self.emails = emails
+        self.names = names or {}  # email -> (first name, last name), from columns D and E
+
+    @property
+    def revision(self):
+        """
+        Fingerprint of everything processing uses from the sheet; edits to other columns don't change it.
+        """
+        content = [self.event_title, self.conductor_name, self.event_date, self.emails, sorted(self.names.items())]
+        return hashlib.sha1(json.dumps(content).encode()).hexdigest()
+
+
 class GoogleSheetsApiClient:
-    def __init__(self):
-        self.creds_file = "google_credentials.json"
+    """
+    Credentials, the gspread client and the Drive service are created on first use, and the
+    service-account file is read once for both, so constructing the client costs nothing and
+    google-auth, gspread and googleapiclient are only imported when a call needs them.
+    """
+
+    def __init__(self, creds_file="google_credentials.json"):
+        self.creds_file = creds_file
         self.SCOPES = config.SCOPES
-        self.gsheet_client = self._authorize_gsheets()
-        self.drive_service = self._authorize_drive()
+        self.sheets_base_url = (config.SHEETS_API_ENDPOINT or "https://sheets.googleapis.com/").rstrip("/")
+        self._creds = None
+        self._gsheet_client = None
+        self._drive_service = None
+        self._init_lock = threading.Lock()
+        # The Drive service's httplib2 transport is not thread-safe; serialize calls through it.
+        self._drive_lock = threading.Lock()
+        self.sheet_parents = {}  # sheet_id -> parent folder IDs, as of the last listing or move
+
+    @property
+    def creds(self):
+        with self._init_lock:
+            if self._creds is None:
+                from google.oauth2.service_account import Credentials
+                self._creds = Credentials.from_service_account_file(self.creds_file, scopes=self.SCOPES)
+            return self._creds
+
+    @property
+    def gsheet_client(self):
+        if self._gsheet_client is None:
+            creds = self.creds
+            with self._init_lock:
+                if self._gsheet_client is None:
+                    self._gsheet_client = self._authorize_gsheets(creds)
+        return self._gsheet_client
 
-    def _authorize_gsheets(self):
-        creds = Credentials.from_service_account_file(self.creds_file, scopes=self.SCOPES)
+    @property
+    def drive_service(self):
+        if self._drive_service is None:
+            creds = self.creds
+            with self._init_lock:
+                if self._drive_service is None:
+                    self._drive_service = self._authorize_drive(creds)
+        return self._drive_service
+
+    def _authorize_gsheets(self, creds):
+        import gspread
         return gspread.authorize(creds)
 
-    def _authorize_drive(self):
-        creds = Credentials.from_service_account_file(self.creds_file, scopes=self.SCOPES)
-        return build('drive', 'v3', credentials=creds)
+    def _authorize_drive(self, creds):
+        from googleapiclient.discovery import build
+        client_options = None
+        if config.DRIVE_API_ENDPOINT:
+            # api_endpoint replaces the whole base URL, service path included
+            client_options = {"api_endpoint": config.DRIVE_API_ENDPOINT.rstrip("/") + "/drive/v3/"}
+        # Use the discovery document bundled with googleapiclient instead of fetching it at startup.
+        return build('drive', 'v3', credentials=creds, client_options=client_options,
+                     static_discovery=True, cache_discovery=False)
 
-    def read_roster_sheet(self, sheet_id, worksheet_name="MusicianInfo"):
+    def read_roster(self, sheet_id, worksheet_name="MusicianInfo"):
         """
-        Reads the first row for event metadata (title, date, conductor),
-        and subsequent rows for recipient emails.
+        Reads the event metadata (A2:C2) and the musicians' first name, last name and email (D3:F) in one
+        values batch-get, instead of downloading every column of every row.
+        Returns a Roster.
         """
-        sh = self.gsheet_client.open_by_key(sheet_id)
-        ws = sh.worksheet(worksheet_name)
-        rows = ws.get_all_values()
+        with METRICS.time_call("sheets", "values.batchGet"), METRICS.phase("read", sheet_id=sheet_id):
+            # Same request as gspread's values_batch_get, but against sheets_base_url
+            response = self.gsheet_client.http_client.request(
+                "get",
+                f"{self.sheets_base_url}/v4/spreadsheets/{sheet_id}/values:batchGet",
+                params={
+                    "ranges": [f"'{worksheet_name}'!A2:C2", f"'{worksheet_name}'!D3:F"],
+                    "majorDimension": "ROWS",
+                    "fields": "valueRanges(values)",
+                },
+            ).json()
+        metadata_range, musician_range = response.get("valueRanges", [{}, {}])
 
-        # second row has the event data (first row is headers)
-        event_title = rows[1][0].strip()  # e.g., SUB 9
-        conductor_name = rows[1][1].strip()  # e.g., "Ludovic Morlot"
-        last_concert_timestamp = rows[1][2].strip()  # e.g., "2025-09-16 20:00"
+        # second row has the event data (first row is headers). Blank trailing cells are omitted by the API.
+        metadata_rows = metadata_range.get("values", [])
+        metadata = (metadata_rows[0] if metadata_rows else []) + ["", "", ""]
+        event_title = metadata[0].strip()  # e.g., SUB 9
+        conductor_name = metadata[1].strip()  # e.g., "Ludovic Morlot"
+        last_concert_timestamp = metadata[2].strip()  # e.g., "2025-09-16 20:00"
 
-        # Recipients start from third row
+        # Recipients start from third row; trailing blank cells are omitted, so pad to first/last/email
         emails = []
-        for r in rows[2:]:
-            raw_email = r[5].strip()
+        names = {}
+        for r in musician_range.get("values", []):
+            first_name, last_name, raw_email = [cell.strip() for cell in (r + ["", "", ""])[:3]]
             if raw_email and self.is_valid_email(raw_email):
                 emails.append(raw_email)
+                names[raw_email] = (first_name, last_name)
             elif raw_email:
                 print(f"Skipping invalid email: {raw_email}")
 
-        # Add the librarians
-        emails.append("Olivia.sangiovese@gmail.com")
-        emails.append("carledwardwilder@gmail.com")
+        return Roster(sheet_id, event_title, conductor_name, last_concert_timestamp, emails, names)
+
+    def read_rosters(self, sheet_ids, max_workers=None):
+        """
+        Read many rosters with at most max_workers requests in flight.
+        Returns {sheet_id: Roster}. A sheet that can't be read is reported and left out, so the
+        others are still processed; it stays in its unprocessed folder for the next run.
+        """
+        max_workers = max_workers or config.ROSTER_READ_WORKERS
+        rosters = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {sheet_id: executor.submit(self.read_roster, sheet_id) for sheet_id in sheet_ids}
+            for sheet_id, future in futures.items():
+                try:
+                    rosters[sheet_id] = future.result()
+                except Exception as e:
+                    print(f"Could not read roster sheet {sheet_id} ({e.__class__.__name__}: {e}). Skipping it.")
+        return rosters
 
-        return event_title, conductor_name, last_concert_timestamp, emails
-    
     def is_valid_email(self, email: str) -> bool:
         return EMAIL_REGEX.match(email.strip()) is not None
         
-    def move_sheet_to_folder(self, sheet_id, folder_id):
+    def move_sheets_to_folders(self, moves):
         """
-        Moves a Google Sheet to a different Drive folder.
+        Moves many sheets with Drive batch requests, up to DRIVE_BATCH_SIZE updates per HTTP call.
+        moves: (sheet_id, folder_id, previous_parents) with previous_parents a list of folder IDs, or
+        None to use the listing's (fetched only if the sheet was never listed).
+        Returns {sheet_id: None if it moved, else the exception}; one failed update or parents lookup
+        doesn't affect the others.
         """
-        # Get current parents
-        file = self.drive_service.files().get(fileId=sheet_id, fields='parents').execute()
-        previous_parents = ",".join(file.get('parents', []))
+        results = {}
+
+        def record(request_id, _response, exception):
+            results[request_id] = exception
+
+        with self._drive_lock:
+            for start in range(0, len(moves), config.DRIVE_BATCH_SIZE):
+                chunk = moves[start:start + config.DRIVE_BATCH_SIZE]
+                batch = self._new_drive_batch(record)
+                batched = []
+                for sheet_id, folder_id, previous_parents in chunk:
+                    try:
+                        request = self._move_request(sheet_id, folder_id, previous_parents)
+                    except Exception as e:
+                        # Looking up its parents failed (e.g. the sheet was deleted): only this move is lost.
+                        results[sheet_id] = e
+                        continue
+                    batch.add(request, request_id=sheet_id)
+                    batched.append(sheet_id)
+                if not batched:
+                    continue
+                try:
+                    with METRICS.time_call("drive", "batch"):
+                        batch.execute()
+                except Exception as e:
+                    # The batch request itself failed: none of its moves can be trusted.
+                    results.update((sheet_id, e) for sheet_id in batched)
+        for sheet_id, folder_id, _ in moves:
+            if results.get(sheet_id) is None:
+                self.sheet_parents[sheet_id] = [folder_id]
+        return results
 
-        # Move file to new folder
-        self.drive_service.files().update(
+    def _move_request(self, sheet_id, folder_id, previous_parents=None):
+        # Caller holds _drive_lock.
+        if previous_parents is None:
+            previous_parents = self.sheet_parents.get(sheet_id)
+        if previous_parents is None:
+            with METRICS.time_call("drive", "files.get"):
+                file = self.drive_service.files().get(fileId=sheet_id, fields='parents').execute()
+            previous_parents = file.get('parents', [])
+        return self.drive_service.files().update(
             fileId=sheet_id,
             addParents=folder_id,
-            removeParents=previous_parents,
+            removeParents=",".join(previous_parents),
             fields='id, parents'
-        ).execute()
+        )
+
+    def _new_drive_batch(self, callback):
+        if config.DRIVE_API_ENDPOINT:
+            # The discovery document's batch path points at googleapis.com, not at api_endpoint.
+            from googleapiclient.http import BatchHttpRequest
+            return BatchHttpRequest(callback=callback,
+                                    batch_uri=config.DRIVE_API_ENDPOINT.rstrip("/") + "/batch/drive/v3")
+        return self.drive_service.new_batch_http_request(callback=callback)
 
     def list_sheets_in_folder(self, folder_id):
         """
@@ -82,15 +224,20 @@ class GoogleSheetsApiClient:
         page_token = None
 
         while True:
-            response = self.drive_service.files().list(
-                q=query,
-                spaces='drive',
-                fields='nextPageToken, files(id, name)',
-                pageToken=page_token
-            ).execute()
+            with self._drive_lock, METRICS.time_call("drive", "files.list"):
+                response = self.drive_service.files().list(
+                    q=query,
+                    spaces='drive',
+                    # Page tokens are opaque, so pages can only be walked in order; make them as large as allowed.
+                    pageSize=config.DRIVE_MAX_PAGE_SIZE,
+                    fields='nextPageToken, files(id, name, parents)',
+                    pageToken=page_token
+                ).execute()
 
             for file in response.get('files', []):
                 sheets.append((file['id'], file['name']))
+                # Kept so moving the sheet later doesn't need its own files.get
+                self.sheet_parents[file['id']] = file.get('parents', [folder_id])
 
             page_token = response.get('nextPageToken')
             if not page_token:
@@ -98,6 +245,35 @@ class GoogleSheetsApiClient:
 
         return sheets
 
+    def get_changes_start_page_token(self):
+        """
+        Token marking "now" in the Drive changes feed; list_changes(token) returns everything after it.
+        """
+        with self._drive_lock, METRICS.time_call("drive", "changes.getStartPageToken"):
+            response = self.drive_service.changes().getStartPageToken().execute()
+        return response['startPageToken']
+
+    def list_changes(self, page_token):
+        """
+        Read the Drive changes feed from page_token.
+        Returns (changes, new_start_page_token); pass the new token to the next call.
+        """
+        changes = []
+        while True:
+            with self._drive_lock, METRICS.time_call("drive", "changes.list"):
+                response = self.drive_service.changes().list(
+                    pageToken=page_token,
+                    spaces='drive',
+                    includeRemoved=True,
+                    pageSize=config.DRIVE_MAX_PAGE_SIZE,
+                    fields='nextPageToken, newStartPageToken, '
+                           'changes(fileId, removed, file(id, name, mimeType, parents, trashed))'
+                ).execute()
+            changes.extend(response.get('changes', []))
+            if 'newStartPageToken' in response:
+                return changes, response['newStartPageToken']
+            page_token = response['nextPageToken']
+
 # Sheet layout
 """
 | Row | Event Title / Conductor | Conductor Name | Event Date (YYYY-MM-DD HH:MM)  | First Name | Last Name | Email                                                     | Instrument |
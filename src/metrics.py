@@ -0,0 +1,306 @@
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from urllib.parse import urlparse
+import config
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_sheet = ContextVar("metrics_current_sheet", default=None)
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, on_exit):
+        self.on_exit = on_exit
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.on_exit(time.perf_counter() - self.start)
+        return False
+
+
+class _SheetSpan(_Span):
+    def __init__(self, sheet_id, on_exit):
+        super().__init__(on_exit)
+        self.sheet_id = sheet_id
+
+    def __enter__(self):
+        self.token = _current_sheet.set(self.sheet_id)
+        return super().__enter__()
+
+    def __exit__(self, *exc):
+        _current_sheet.reset(self.token)
+        return super().__exit__(*exc)
+
+
+class Metrics:
+    """
+    In-process counters for one run: per-endpoint latency histograms, call/retry/status/byte counts,
+    and per-sheet time broken down by phase. Exported at the end of a run as a Prometheus text file
+    and a JSON summary. When disabled every hook returns straight away.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.latency_buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))  # (service, endpoint) -> counts
+        self.latency_sum = defaultdict(float)
+        self.latency_count = defaultdict(int)
+        self.status_counts = defaultdict(int)  # (service, endpoint, status) -> count
+        self.retries = defaultdict(int)  # (service, endpoint) -> count
+        self.bytes = defaultdict(int)  # (service, endpoint, direction) -> bytes
+        self.sheet_names = {}
+        self.sheet_phases = defaultdict(lambda: defaultdict(float))  # sheet_id -> phase -> seconds
+        self.sheet_totals = {}
+        self.started_at = time.time()
+        self.process_started = None  # perf_counter() values, see record_startup()
+        self.imports_done = None
+        self.first_request_at = None
+
+    # ------------------------
+    # Startup
+    # ------------------------
+    def record_startup(self, process_started, imports_done):
+        self.process_started = process_started
+        self.imports_done = imports_done
+
+    def mark_request_start(self):
+        """
+        Note when the first API request of the process goes out. Recorded even when metrics are disabled.
+        """
+        if self.first_request_at is None:
+            self.first_request_at = time.perf_counter()
+
+    def startup_summary(self):
+        if self.process_started is None:
+            return {}
+        summary = {"import_seconds": round(self.imports_done - self.process_started, 4)}
+        if self.first_request_at is not None:
+            summary["time_to_first_request_seconds"] = round(self.first_request_at - self.process_started, 4)
+        return summary
+
+    # ------------------------
+    # Requests
+    # ------------------------
+    def observe_request(self, service, endpoint, status, seconds, bytes_sent=0, bytes_received=0):
+        if not self.enabled:
+            return
+        key = (service, endpoint)
+        with self._lock:
+            buckets = self.latency_buckets[key]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            self.latency_sum[key] += seconds
+            self.latency_count[key] += 1
+            self.status_counts[(service, endpoint, str(status))] += 1
+            self.bytes[(service, endpoint, "sent")] += bytes_sent
+            self.bytes[(service, endpoint, "received")] += bytes_received
+
+    def observe_retry(self, service, endpoint):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.retries[(service, endpoint)] += 1
+
+    def time_call(self, service, endpoint):
+        """
+        Context manager timing one call that has no response object to inspect (Drive/Sheets client calls).
+        Failures are recorded with status "error".
+        """
+        self.mark_request_start()
+        if not self.enabled:
+            return _NULL_SPAN
+        return _TimedCall(self, service, endpoint)
+
+    # ------------------------
+    # Sheets and phases
+    # ------------------------
+    def sheet(self, sheet_id, sheet_name):
+        """
+        Span covering all work on one sheet; phase() calls inside it are attributed to this sheet.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        self.sheet_names[sheet_id] = sheet_name
+
+        def record(seconds):
+            with self._lock:
+                self.sheet_totals[sheet_id] = self.sheet_totals.get(sheet_id, 0.0) + seconds
+
+        return _SheetSpan(sheet_id, record)
+
+    def phase(self, phase, sheet_id=None):
+        if not self.enabled:
+            return _NULL_SPAN
+        sheet_id = sheet_id or _current_sheet.get() or "(run)"
+
+        def record(seconds):
+            with self._lock:
+                self.sheet_phases[sheet_id][phase] += seconds
+
+        return _Span(record)
+
+    # ------------------------
+    # Export
+    # ------------------------
+    def summary(self):
+        with self._lock:
+            endpoints = []
+            for (service, endpoint), count in sorted(self.latency_count.items()):
+                statuses = {
+                    status: n for (s, e, status), n in self.status_counts.items() if (s, e) == (service, endpoint)
+                }
+                endpoints.append({
+                    "service": service,
+                    "endpoint": endpoint,
+                    "calls": count,
+                    "retries": self.retries.get((service, endpoint), 0),
+                    "statuses": statuses,
+                    "total_seconds": round(self.latency_sum[(service, endpoint)], 4),
+                    "mean_seconds": round(self.latency_sum[(service, endpoint)] / count, 4),
+                    "bytes_sent": self.bytes.get((service, endpoint, "sent"), 0),
+                    "bytes_received": self.bytes.get((service, endpoint, "received"), 0),
+                })
+            sheets = []
+            for sheet_id in sorted(set(self.sheet_phases) | set(self.sheet_totals)):
+                phases = {phase: round(seconds, 4) for phase, seconds in self.sheet_phases[sheet_id].items()}
+                sheets.append({
+                    "sheet_id": sheet_id,
+                    "sheet_name": self.sheet_names.get(sheet_id, sheet_id),
+                    "total_seconds": round(self.sheet_totals.get(sheet_id, 0.0), 4),
+                    "phases": phases,
+                    "slowest_phase": max(phases, key=phases.get) if phases else None,
+                })
+            phase_totals = defaultdict(float)
+            for phases in self.sheet_phases.values():
+                for phase, seconds in phases.items():
+                    phase_totals[phase] += seconds
+        return {
+            "run_seconds": round(time.time() - self.started_at, 4),
+            "api_calls": sum(e["calls"] for e in endpoints),
+            "retries": sum(e["retries"] for e in endpoints),
+            "startup": self.startup_summary(),
+            "phase_totals": {phase: round(seconds, 4) for phase, seconds in phase_totals.items()},
+            "endpoints": endpoints,
+            "sheets": sheets,
+        }
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP conductor_eval_api_request_seconds Latency of API requests.",
+            "# TYPE conductor_eval_api_request_seconds histogram",
+        ]
+        with self._lock:
+            for (service, endpoint), buckets in sorted(self.latency_buckets.items()):
+                labels = f'service="{service}",endpoint="{_escape(endpoint)}"'
+                for bound, count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f'conductor_eval_api_request_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                count = self.latency_count[(service, endpoint)]
+                lines.append(f'conductor_eval_api_request_seconds_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"conductor_eval_api_request_seconds_sum{{{labels}}} {self.latency_sum[(service, endpoint)]}")
+                lines.append(f"conductor_eval_api_request_seconds_count{{{labels}}} {count}")
+
+            lines += ["# HELP conductor_eval_api_requests_total API responses by status.",
+                      "# TYPE conductor_eval_api_requests_total counter"]
+            for (service, endpoint, status), count in sorted(self.status_counts.items()):
+                lines.append(f'conductor_eval_api_requests_total{{service="{service}",'
+                             f'endpoint="{_escape(endpoint)}",status="{status}"}} {count}')
+
+            lines += ["# HELP conductor_eval_api_retries_total Requests that were retried.",
+                      "# TYPE conductor_eval_api_retries_total counter"]
+            for (service, endpoint), count in sorted(self.retries.items()):
+                lines.append(f'conductor_eval_api_retries_total{{service="{service}",'
+                             f'endpoint="{_escape(endpoint)}"}} {count}')
+
+            lines += ["# HELP conductor_eval_api_bytes_total Request and response body bytes.",
+                      "# TYPE conductor_eval_api_bytes_total counter"]
+            for (service, endpoint, direction), count in sorted(self.bytes.items()):
+                lines.append(f'conductor_eval_api_bytes_total{{service="{service}",'
+                             f'endpoint="{_escape(endpoint)}",direction="{direction}"}} {count}')
+
+            lines += ["# HELP conductor_eval_sheet_phase_seconds Time spent per sheet in each phase.",
+                      "# TYPE conductor_eval_sheet_phase_seconds gauge"]
+            for sheet_id, phases in sorted(self.sheet_phases.items()):
+                for phase, seconds in sorted(phases.items()):
+                    lines.append(f'conductor_eval_sheet_phase_seconds{{sheet="{_escape(sheet_id)}",'
+                                 f'phase="{phase}"}} {seconds}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, prometheus_path=None, json_path=None):
+        """
+        Write the Prometheus text file and JSON summary (paths default to config) and print a
+        one-line breakdown of where the run's time went.
+        """
+        if not self.enabled:
+            return
+        prometheus_path = prometheus_path or config.METRICS_PROMETHEUS_PATH
+        json_path = json_path or config.METRICS_JSON_PATH
+        with open(prometheus_path, "w") as f:
+            f.write(self.prometheus_text())
+        summary = self.summary()
+        with open(json_path, "w") as f:
+            json.dump(summary, f, indent=2)
+        phases = ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in sorted(
+            summary["phase_totals"].items(), key=lambda item: -item[1]
+        ))
+        print(f"Metrics: {summary['api_calls']} API call(s), {summary['retries']} retried; time by phase: {phases}. "
+              f"Written to {prometheus_path} and {json_path}.")
+
+
+class _TimedCall:
+    def __init__(self, metrics, service, endpoint):
+        self.metrics = metrics
+        self.service = service
+        self.endpoint = endpoint
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, _tb):
+        # googleapiclient's HttpError carries exc.resp.status; aiohttp's ClientResponseError carries exc.status
+        status = getattr(exc, "status", None) or getattr(getattr(exc, "resp", None), "status", None)
+        if status is None:
+            status = "error" if exc_type else 200
+        self.metrics.observe_request(self.service, self.endpoint, status, time.perf_counter() - self.start)
+        return False
+
+
+def endpoint_name(method, url):
+    """
+    "GET https://api.surveymonkey.com/v3/collectors/123/messages" -> "GET /collectors/{id}/messages"
+    """
+    path = urlparse(url).path
+    if path.startswith("/v3"):
+        path = path[3:]
+    return f"{method} {_ID_SEGMENT.sub('/{id}', path)}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+METRICS = Metrics(enabled=config.METRICS_ENABLED)
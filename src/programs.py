@@ -0,0 +1,105 @@
+from collections import deque
+from datetime import datetime, timedelta, timezone
+import config
+
+
+class Program:
+    """
+    One source of roster sheets (config.PROGRAMS): the Drive folder it is read from, where processed
+    sheets go, which survey template each event uses, who is added to every roster, and how many of its
+    sheets may be in flight at once (None: no cap beyond the run's own).
+    """
+
+    def __init__(self, name, unprocessed_folder_id, processed_folder_id, templates, extra_recipients=(),
+                 max_concurrent_sheets=None):
+        self.name = name
+        self.unprocessed_folder_id = unprocessed_folder_id
+        self.processed_folder_id = processed_folder_id
+        self.templates = templates  # lowercase keyword in the event title -> template survey ID; "default" otherwise
+        self.extra_recipients = list(extra_recipients)
+        if max_concurrent_sheets is not None and max_concurrent_sheets < 1:
+            raise ValueError(f"Program '{name}': max_concurrent_sheets must be at least 1 (or None).")
+        self.max_concurrent_sheets = max_concurrent_sheets
+
+    def template_for(self, event_title):
+        """
+        Template survey ID for an event: the first keyword found in the title, else the default.
+        """
+        title = event_title.lower()
+        for keyword, template_id in self.templates.items():
+            if keyword != "default" and keyword in title:
+                return template_id
+        return self.templates["default"]
+
+    def add_extra_recipients(self, roster):
+        for email in self.extra_recipients:
+            if email not in roster.emails:
+                roster.emails.append(email)
+        return roster
+
+
+def load_programs():
+    return [Program(**program) for program in config.PROGRAMS]
+
+
+class FairSheetQueue:
+    """
+    Hands out (program, sheet_id, sheet_name) work round-robin across programs, so one program's big
+    batch can't starve the others, and never more than a program's max_concurrent_sheets at once.
+    With deadlines ({sheet_id: invite send time, UTC}), each program's sheets go earliest deadline
+    first, and a sheet whose invite goes out within DEADLINE_URGENT_HOURS skips the round-robin.
+    Not thread-safe: the dispatcher that owns it calls next_ready()/finished() from one thread.
+    """
+
+    def __init__(self, sheets, deadlines=None):
+        self.deadlines = deadlines or {}
+        self.queues = {}  # program name -> deque of work, in rotation order
+        self.programs = {}
+        for program, sheet_id, sheet_name in sheets:
+            self.programs[program.name] = program
+            self.queues.setdefault(program.name, deque()).append((program, sheet_id, sheet_name))
+        for name, work in self.queues.items():
+            # Stable, so sheets without a readable date keep their listing order, after the dated ones.
+            self.queues[name] = deque(sorted(work, key=lambda w: self._sort_key(w[1])))
+        self.rotation = deque(self.queues)
+        self.in_flight = {name: 0 for name in self.queues}
+
+    def __bool__(self):
+        return any(self.queues.values())
+
+    def _sort_key(self, sheet_id):
+        deadline = self.deadlines.get(sheet_id)
+        return (deadline is None, deadline or datetime.min.replace(tzinfo=timezone.utc))
+
+    def remaining(self):
+        return [work for queue in self.queues.values() for work in queue]
+
+    def next_ready(self, urgent_only=False):
+        """
+        The next sheet whose program is below its cap: the most urgent one if any invite goes out within
+        DEADLINE_URGENT_HOURS, else the next program in the rotation. None if every program with work is at
+        its cap, or (urgent_only, once the run's time budget is spent) if nothing left is urgent.
+        """
+        ready = [
+            name for name in self.rotation
+            if self.queues[name] and (self.programs[name].max_concurrent_sheets is None
+                                      or self.in_flight[name] < self.programs[name].max_concurrent_sheets)
+        ]
+        urgent_before = datetime.now(timezone.utc) + timedelta(hours=config.DEADLINE_URGENT_HOURS)
+        urgent = [name for name in ready if self._sort_key(self.queues[name][0][1]) <= (False, urgent_before)]
+        if urgent:
+            return self._take(min(urgent, key=lambda name: self._sort_key(self.queues[name][0][1])))
+        if urgent_only or not ready:
+            return None
+        while self.rotation[0] not in ready:
+            self.rotation.rotate(-1)
+        name = self.rotation[0]
+        self.rotation.rotate(-1)
+        return self._take(name)
+
+    def _take(self, name):
+        self.in_flight[name] += 1
+        return self.queues[name].popleft()
+
+    def finished(self, program):
+        self.in_flight[program.name] -= 1
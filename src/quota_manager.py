@@ -0,0 +1,196 @@
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+import config
+
+# The daily reservation requests made in the current context are charged to (see QuotaManager.charging).
+_current_reservation = contextvars.ContextVar("quota_reservation", default=None)
+
+
+class DailyReservation:
+    """
+    Part of today's budget set aside for one unit of work (a sheet, a clone-pool refill).
+    unused counts down as the work's requests are sent.
+    """
+
+    def __init__(self, cost):
+        self.cost = cost
+        self.unused = cost
+
+
+class QuotaManager:
+    """
+    Shared view of the SurveyMonkey request quotas.
+
+    Per-minute: a token bucket every request reserves a slot from before it is sent, so concurrent
+    workers are paced under the ceiling instead of running into 429s.
+    Per-day: a running count of requests left today, corrected from the X-Ratelimit-App-Global-Day-*
+    response headers. Whole sheets reserve their projected cost up front (try_reserve_daily) so a
+    sheet is either started with enough budget to finish or left for a later run. Requests sent while
+    charging(reservation) is active are paid out of that reservation rather than counted a second time,
+    and release_daily hands back only what the sheet did not use.
+
+    The daily numbers are saved to state_path so the next invocation starts from the right budget.
+    """
+
+    def __init__(self, per_minute=None, per_day=None, state_path=None):
+        self.per_minute = per_minute or config.SURVEYMONKEY_REQUESTS_PER_MINUTE
+        self.per_day = per_day or config.SURVEYMONKEY_REQUESTS_PER_DAY
+        self.state_path = config.SURVEYMONKEY_QUOTA_STATE_PATH if state_path is None else state_path
+        self._lock = threading.Lock()
+
+        self.minute_tokens = float(self.per_minute)
+        self._last_refill = time.monotonic()
+        self.day_remaining = self.per_day
+        self.day_reset_at = time.time() + 24 * 60 * 60
+        self.day_reserved = 0
+        self._load()
+
+    # ------------------------
+    # Per-minute pacing
+    # ------------------------
+    def reserve_request(self):
+        """
+        Take one request slot. Returns how many seconds the caller must wait before sending.
+        """
+        reservation = _current_reservation.get()
+        with self._lock:
+            self._refill()
+            self.minute_tokens -= 1
+            self.day_remaining -= 1
+            if reservation is not None and reservation.unused > 0:
+                # Already set aside for this request; don't hold it back from the budget twice.
+                reservation.unused -= 1
+                self.day_reserved = max(0, self.day_reserved - 1)
+            if self.minute_tokens >= 0:
+                return 0.0
+            # Slots are handed out in order, so the deficit says how far in the future ours is.
+            return -self.minute_tokens * 60.0 / self.per_minute
+
+    def _refill(self):
+        now = time.monotonic()
+        rate = self.per_minute / 60.0
+        self.minute_tokens = min(self.per_minute, self.minute_tokens + (now - self._last_refill) * rate)
+        self._last_refill = now
+
+    def update_from_headers(self, headers):
+        """
+        Correct the local estimates with what SurveyMonkey reports on a response.
+        """
+        minute_remaining = _int_header(headers, "X-Ratelimit-App-Global-Minute-Remaining")
+        day_remaining = _int_header(headers, "X-Ratelimit-App-Global-Day-Remaining")
+        day_reset = _int_header(headers, "X-Ratelimit-App-Global-Day-Reset")
+        with self._lock:
+            if minute_remaining is not None:
+                self._refill()
+                self.minute_tokens = min(self.minute_tokens, float(minute_remaining))
+            if day_remaining is not None:
+                self.day_remaining = day_remaining
+            if day_reset is not None:
+                self.day_reset_at = time.time() + day_reset
+
+    # ------------------------
+    # Per-day budget
+    # ------------------------
+    def try_reserve_daily(self, cost):
+        """
+        Set aside cost requests from today's remaining budget. Returns the DailyReservation,
+        or None (reserving nothing) if that would overdraw it.
+        """
+        with self._lock:
+            self._roll_day()
+            if self.day_remaining - self.day_reserved < cost:
+                return None
+            self.day_reserved += cost
+            return DailyReservation(cost)
+
+    @contextmanager
+    def charging(self, reservation):
+        """
+        Pay the requests sent inside the block (including from tasks it starts) out of reservation.
+        """
+        token = _current_reservation.set(reservation)
+        try:
+            yield reservation
+        finally:
+            _current_reservation.reset(token)
+
+    def release_daily(self, reservation):
+        """
+        Return what is left of a reservation once the sheet is done; the requests it did send were
+        already taken off day_remaining by reserve_request/update_from_headers.
+        """
+        with self._lock:
+            self.day_reserved = max(0, self.day_reserved - reservation.unused)
+            reservation.unused = 0
+        try:
+            self.save()
+        except OSError as e:
+            # Called from the sheet workers' cleanup: a failed save must not stop the run.
+            # The next save (at the latest, the one at the end of the run) writes the same numbers.
+            print(f"Could not save SurveyMonkey quota state to {self.state_path}: {e}")
+
+    def daily_budget_left(self):
+        with self._lock:
+            self._roll_day()
+            return self.day_remaining - self.day_reserved
+
+    def _roll_day(self):
+        if time.time() >= self.day_reset_at:
+            self.day_remaining = self.per_day
+            self.day_reset_at = time.time() + 24 * 60 * 60
+
+    # ------------------------
+    # Persistence
+    # ------------------------
+    def _load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            day_remaining = int(state.get("day_remaining", self.per_day))
+            day_reset_at = float(state.get("day_reset_at", self.day_reset_at))
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            # A truncated or hand-edited file: start a fresh window; the response headers correct it soon enough.
+            print(f"Ignoring unreadable SurveyMonkey quota state in {self.state_path} ({e}); starting a fresh day.")
+            return
+        self.day_remaining = day_remaining
+        self.day_reset_at = day_reset_at
+        self._roll_day()
+
+    def save(self):
+        if not self.state_path:
+            return
+        # Held across the write so concurrent saves (one per finishing sheet) land one after another.
+        with self._lock:
+            state = {
+                "day_remaining": self.day_remaining,
+                "day_reset_at": self.day_reset_at,
+                "saved_at": time.time(),
+            }
+            # A temp file of our own, so another process saving the same state can't replace it under us.
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=os.path.basename(self.state_path) + ".", suffix=".tmp",
+                dir=os.path.dirname(os.path.abspath(self.state_path)),
+            )
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(state, f, indent=2)
+                os.replace(tmp_path, self.state_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+
+def _int_header(headers, name):
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,196 @@
+import asyncio
+import math
+from surveymonkey_api_client import count_api_calls
+import config
+
+DELETE_RECIPIENTS = "delete_recipients"
+RECREATE_COLLECTOR = "recreate_collector"
+
+# delete collector + create collector + create invite + create reminder
+RECREATE_COLLECTOR_CALLS = 4
+# Message statuses that mean nothing has gone out yet. A scheduled message is dropped with the old
+# collector and scheduled again on the new one later in the same run.
+UNSENT_MESSAGE_STATUSES = {"not_sent", "scheduled"}
+
+
+def bulk_add_calls(email_count):
+    """
+    Requests add_recipients makes for email_count contacts when no chunk has to be resent.
+    """
+    return max(1, math.ceil(email_count / config.RECIPIENT_BULK_CHUNK_SIZE))
+
+
+class RecipientSyncPlan:
+    def __init__(self, strategy, to_add, to_remove, predicted_calls, delete_cost, recreate_cost, reason):
+        self.strategy = strategy
+        self.to_add = to_add  # emails to upload: the whole sheet when the collector is recreated
+        self.to_remove = to_remove  # {email: recipient_id}
+        self.predicted_calls = predicted_calls
+        self.delete_cost = delete_cost
+        self.recreate_cost = recreate_cost
+        self.reason = reason
+
+
+class RecipientSyncResult:
+    def __init__(self, collector_id, invite_message_id, reminder_message_id, plan, actual_calls):
+        self.collector_id = collector_id
+        self.invite_message_id = invite_message_id
+        self.reminder_message_id = reminder_message_id
+        self.plan = plan
+        self.actual_calls = actual_calls
+
+
+class RecipientSyncPlanner:
+    """
+    Brings a collector's recipients in line with a sheet using whichever strategy costs fewer API calls:
+      - delete_recipients: one DELETE per removed recipient (sent concurrently), then a bulk add of
+        only the emails the collector doesn't have yet (nothing at all if it has them all)
+      - recreate_collector: delete the collector, create it again with fresh invite/reminder messages,
+        then a bulk add of the whole sheet
+    Emails are compared case-insensitively. Recreating is only considered when nothing would be lost:
+    no message sent (scheduled is fine) and no recipient mailed or responded yet. Scheduling calls are
+    the same for both strategies and are not counted.
+    surveymonkey_client is an AsyncSurveyMonkeyApiClient; plan() and sync() are coroutines.
+    """
+
+    def __init__(self, surveymonkey_client, delete_workers=None, contact_mirror=None):
+        self.surveymonkey_client = surveymonkey_client
+        self.delete_workers = delete_workers or config.RECIPIENT_DELETE_WORKERS
+        self.contact_mirror = contact_mirror
+
+    async def plan(self, collector_id, sheet_emails, messages=None):
+        """
+        messages: the collector's messages if the caller already fetched them; otherwise they are
+        fetched only when recreating could be cheaper, to check that it is safe.
+        """
+        existing = await self.surveymonkey_client.get_recipients(
+            collector_id, include=["survey_response_status", "mail_status"]
+        )
+        plan = self.plan_from_state(existing, sheet_emails, messages)
+        if plan is None:
+            messages = await self.surveymonkey_client.get_messages_on_collector(collector_id)
+            plan = self.plan_from_state(existing, sheet_emails, messages)
+        return plan
+
+    def plan_from_state(self, existing, sheet_emails, messages=None):
+        """
+        Decide on a strategy from already-fetched recipients (and messages, if known).
+        Returns None when recreating looks cheaper but the messages are needed to know it is safe.
+        """
+        existing_emails = {r["email"].lower(): r["id"] for r in existing}
+        sheet_email_set = {email.lower() for email in sheet_emails}
+        to_remove = {email: rid for email, rid in existing_emails.items() if email not in sheet_email_set}
+        to_add = [email for email in sheet_emails if email.lower() not in existing_emails]
+
+        # Keeping the collector only uploads what is missing; a recreated one needs the full sheet list.
+        delete_cost = len(to_remove) + (bulk_add_calls(len(to_add)) if to_add else 0)
+        recreate_cost = RECREATE_COLLECTOR_CALLS + bulk_add_calls(len(sheet_emails))
+        # Checking that recreating is safe needs the messages, which may cost one more read.
+        safety_check_cost = 0 if messages is not None else 1
+
+        if recreate_cost + safety_check_cost >= delete_cost:
+            return RecipientSyncPlan(DELETE_RECIPIENTS, to_add, to_remove, delete_cost, delete_cost, recreate_cost,
+                                     "per-recipient deletes are cheapest")
+        if messages is None:
+            return None
+
+        unsafe_reason = self._recreate_unsafe_reason(existing, messages)
+        if unsafe_reason:
+            return RecipientSyncPlan(DELETE_RECIPIENTS, to_add, to_remove, delete_cost, delete_cost, recreate_cost,
+                                     f"recreating would lose data ({unsafe_reason})")
+        return RecipientSyncPlan(RECREATE_COLLECTOR, list(sheet_emails), to_remove, recreate_cost, delete_cost,
+                                 recreate_cost, "recreating the collector is cheaper and nothing has been sent")
+
+    def _recreate_unsafe_reason(self, recipients, messages):
+        if any(m.get("status", "not_sent") not in UNSENT_MESSAGE_STATUSES for m in messages):
+            return "a message has already been sent"
+        if any(r.get("mail_status", "not_sent") != "not_sent" for r in recipients):
+            return "a recipient has already been emailed"
+        if any(r.get("survey_response_status", "not_responded") != "not_responded" for r in recipients):
+            return "a recipient has already responded"
+        return None
+
+    async def sync(self, collector_id, invite_message_id, reminder_message_id, sheet_emails,
+                   survey_id, collector_name, survey_name, close_timestamp, messages=None, contact_ids=None):
+        """
+        Plan and run the recipient sync. Returns a RecipientSyncResult with the (possibly new)
+        collector and message IDs, plus predicted vs actual call counts.
+        contact_ids: {email: contact_id} from the contact mirror, for recipients to add by contact ID.
+        """
+        with count_api_calls() as counter:
+            plan = await self.plan(collector_id, sheet_emails, messages)
+            planning_calls = counter.calls
+            _print_plan(plan)
+
+            if plan.strategy == RECREATE_COLLECTOR:
+                collector_id, invite_message_id, reminder_message_id = await self._recreate_collector(
+                    collector_id, survey_id, collector_name, survey_name, close_timestamp
+                )
+            else:
+                await self._delete_recipients(collector_id, plan.to_remove)
+            await self._add_recipients(collector_id, invite_message_id, plan.to_add, contact_ids)
+            # Planning reads (recipient pages, message lookup) are not part of either strategy's cost
+            actual_calls = counter.calls - planning_calls
+
+        print(f"Recipient sync used {actual_calls} call(s) (predicted {plan.predicted_calls}).")
+        return RecipientSyncResult(collector_id, invite_message_id, reminder_message_id, plan, actual_calls)
+
+    async def _delete_recipients(self, collector_id, to_remove):
+        if not to_remove:
+            return
+        print("Collector has emails that are not present in latest file:")
+        print(set(to_remove))
+        # At most delete_workers DELETEs in flight.
+        limit = asyncio.Semaphore(self.delete_workers)
+
+        async def delete(email, rid):
+            async with limit:
+                if await self.surveymonkey_client.delete_recipient(collector_id, rid):
+                    print(f"Recipient {email} removed from file has been removed from the collector.")
+
+        await asyncio.gather(*(delete(email, rid) for email, rid in to_remove.items()))
+
+    async def _add_recipients(self, collector_id, invite_message_id, emails, contact_ids):
+        if not emails:
+            print("Every recipient on the sheet is already on the collector; nothing to add.")
+            return
+        result = await self.surveymonkey_client.add_recipients(
+            collector_id, invite_message_id, emails, contact_ids=contact_ids
+        )
+        stale = self._stale_contacts(result, contact_ids)
+        if stale:
+            await self.surveymonkey_client.add_recipients(collector_id, invite_message_id, stale)
+
+    def _stale_contacts(self, result, contact_ids):
+        """
+        Emails sent by a contact ID that SurveyMonkey refused (e.g. the contact was deleted there).
+        They are dropped from the mirror and sent again by email.
+        """
+        invalid = {email.lower() for email in result.invalid}
+        refused_ids = set(result.invalid_contact_ids)
+        stale = [
+            email for email, contact_id in (contact_ids or {}).items()
+            if email.lower() in invalid or contact_id in refused_ids
+        ]
+        if stale:
+            print(f"{len(stale)} mirrored contact(s) were refused; resending them by email.")
+            self.contact_mirror.forget(stale)
+        return stale
+
+    async def _recreate_collector(self, collector_id, survey_id, collector_name, survey_name, close_timestamp):
+        print(f"Recreating collector '{collector_name}' instead of deleting recipients one by one.")
+        client = self.surveymonkey_client
+        await client.delete_collector(collector_id)
+        new_collector_id, _ = await client.create_collector(survey_id, collector_name, close_timestamp)
+        # The two messages don't depend on each other.
+        invite_message_id, reminder_message_id = await asyncio.gather(
+            client.create_invite_message(new_collector_id, survey_name),
+            client.create_reminder_message(new_collector_id, subject=f"Reminder: {survey_name}"),
+        )
+        return new_collector_id, invite_message_id, reminder_message_id
+
+
+def _print_plan(plan):
+    print(f"Recipient sync: {len(plan.to_add)} to add, {len(plan.to_remove)} to remove. "
+          f"Strategy '{plan.strategy}' ({plan.reason}); "
+          f"predicted calls: delete={plan.delete_cost}, recreate={plan.recreate_cost}.")
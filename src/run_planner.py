@@ -0,0 +1,261 @@
+import contextlib
+import json
+import math
+import sys
+from collections import Counter
+from recipient_sync_planner import RECREATE_COLLECTOR, bulk_add_calls
+from surveymonkey_api_client import count_api_calls
+import config
+
+
+class SheetPlan:
+    def __init__(self, sheet_id, sheet_name, survey_name=None, collector_name=None):
+        self.sheet_id = sheet_id
+        self.sheet_name = sheet_name
+        self.survey_name = survey_name
+        self.collector_name = collector_name
+        self.valid = True
+        self.errors = []
+        self.warnings = []
+        self.steps = []  # {"action", "calls", "seconds", "detail"}
+        self.discovery_calls = 0
+
+    def add_step(self, action, calls=1, detail="", parallelism=1):
+        seconds_per_call = config.PLAN_SECONDS_PER_CALL.get(action, config.PLAN_SECONDS_PER_CALL["default"])
+        seconds = math.ceil(calls / parallelism) * seconds_per_call
+        self.steps.append({"action": action, "calls": calls, "seconds": round(seconds, 2), "detail": detail})
+
+    @property
+    def predicted_calls(self):
+        return sum(step["calls"] for step in self.steps)
+
+    @property
+    def estimated_seconds(self):
+        return round(sum(step["seconds"] for step in self.steps), 2)
+
+    def to_dict(self):
+        return {
+            "sheet_id": self.sheet_id,
+            "sheet_name": self.sheet_name,
+            "survey_name": self.survey_name,
+            "collector_name": self.collector_name,
+            "valid": self.valid,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "discovery_calls": self.discovery_calls,
+            "steps": self.steps,
+            "predicted_calls": self.predicted_calls,
+            "estimated_seconds": self.estimated_seconds,
+        }
+
+
+class RunPlanner:
+    """
+    Dry run of CollectorScheduler: performs only the read-only calls (sheet reads, survey/collector/message
+    lookups, recipient fetch) and reports the writes each sheet would need, with predicted call counts
+    and wall time. Nothing is created, deleted, scheduled or moved.
+    """
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self._spares_planned = Counter()  # template_id -> spares earlier sheets in the plan would claim
+
+    def plan(self, sheets):
+        """
+        sheets: (program, sheet_id, sheet_name) work. Returns a list of SheetPlan.
+        """
+        rosters = self.scheduler.read_rosters(sheets)
+        self.scheduler.prefetch_surveymonkey(rosters.values())
+        return [
+            self.plan_sheet(sheet_id, sheet_name, rosters[sheet_id], program) if sheet_id in rosters
+            else self.unreadable_sheet_plan(sheet_id, sheet_name)
+            for program, sheet_id, sheet_name in sheets
+        ]
+
+    def unreadable_sheet_plan(self, sheet_id, sheet_name):
+        plan = SheetPlan(sheet_id, sheet_name)
+        plan.valid = False
+        plan.errors.append("Sheet could not be read; it would be left unprocessed.")
+        return plan
+
+    def plan_sheet(self, sheet_id, sheet_name, roster, program=None):
+        scheduler = self.scheduler
+        if not scheduler.is_google_sheet_valid(roster.event_title, roster.conductor_name, roster.event_date,
+                                               roster.emails):
+            plan = SheetPlan(sheet_id, sheet_name)
+            plan.valid = False
+            plan.errors.append("Sheet formatting is invalid; it would be skipped.")
+            return plan
+
+        survey_name, collector_name = scheduler.survey_and_collector_names(roster.event_title, roster.conductor_name)
+        plan = SheetPlan(sheet_id, sheet_name, survey_name=survey_name, collector_name=collector_name)
+        with count_api_calls() as counter:
+            self._plan_surveymonkey_steps(plan, roster, program)
+        plan.discovery_calls = counter.calls
+        # One update in the run's Drive batch request (parents come from the listing)
+        plan.add_step("move_sheet", detail="move to the processed folder (Drive, batched)")
+        return plan
+
+    def _plan_surveymonkey_steps(self, plan, roster, program):
+        survey_id = self.scheduler.find_survey_id(plan.survey_name)
+
+        collector_id = None
+        if not survey_id:
+            template_survey_id = self.scheduler.get_required_template_survey_id(roster.event_title, program)
+            if self.scheduler.clone_pool.available(template_survey_id) > self._spares_planned[template_survey_id]:
+                self._spares_planned[template_survey_id] += 1
+                plan.add_step("claim_spare_survey", calls=2,
+                              detail=f"check and rename a pre-cloned spare of template {template_survey_id}")
+            else:
+                plan.add_step("clone_survey", detail=f"clone template {template_survey_id}")
+        else:
+            collector_id = self.scheduler.find_collector_id(survey_id, plan.collector_name)
+
+        invite_send_timestamp = self.scheduler.calculate_distribution_time_for_event_date(roster.event_date)
+        messages = None  # (invite_message_id, reminder_message_id) of existing messages the run keeps
+        if not collector_id:
+            plan.add_step("create_collector", detail=plan.collector_name)
+            plan.add_step("create_invite_message")
+            plan.add_step("create_reminder_message")
+            plan.add_step("add_recipients", calls=bulk_add_calls(len(roster.emails)),
+                          detail=f"{len(roster.emails)} recipients", parallelism=config.RECIPIENT_UPLOAD_WORKERS)
+        else:
+            self._plan_close_date(plan, roster, collector_id)
+            messages = self._plan_existing_collector(plan, roster, collector_id)
+
+        self._plan_contacts(plan, roster)
+        self._plan_schedule(plan, collector_id, messages, invite_send_timestamp)
+
+    def _plan_close_date(self, plan, roster, collector_id):
+        # Same check as sync_collector: one read, and an update only if the event date moved.
+        client = self.scheduler.surveymonkey_client
+        close_timestamp = self.scheduler.calculate_closing_time_for_collector(roster.event_date)
+        plan.add_step("read_collector", detail="compare close date")
+        if client.close_date_differs(client.get_collector(collector_id), close_timestamp):
+            plan.add_step("update_close_date", detail=close_timestamp)
+
+    def _plan_schedule(self, plan, collector_id, messages, invite_send_timestamp):
+        """
+        Mirrors CollectorScheduler._needs_schedule: new or known-unsent messages are scheduled without a
+        read; any other message is read, and scheduled only if its send time differs.
+        """
+        client = self.scheduler.surveymonkey_client
+        reminder_send_timestamp = client.reminder_send_time(invite_send_timestamp)
+        invite_message_id, reminder_message_id = messages or (None, None)
+        message_status = self.scheduler.known_message_status(collector_id) if messages else {}
+        for action, message_id, send_timestamp in (("schedule_invite", invite_message_id, invite_send_timestamp),
+                                                   ("schedule_reminder", reminder_message_id, reminder_send_timestamp)):
+            if message_id and message_status.get(message_id) != "not_sent":
+                plan.add_step("read_message", detail=f"compare {action.split('_')[1]} send time")
+                if client.is_scheduled_for(client.get_message(collector_id, message_id), send_timestamp):
+                    continue
+            plan.add_step(action, detail=send_timestamp)
+
+    def _plan_contacts(self, plan, roster):
+        mirror = self.scheduler.contact_mirror
+        if not mirror.enabled:
+            return
+        to_create, to_update = mirror.changes(self.scheduler.people_on_sheet(roster.emails, roster.names))
+        if to_create:
+            plan.add_step("create_contacts", calls=bulk_add_calls(len(to_create)),
+                          detail=f"{len(to_create)} musician(s) not in the contact mirror")
+        if to_update:
+            renames = min(len(to_update), config.CONTACT_RENAMES_PER_SHEET)
+            plan.add_step("update_contact", calls=renames, detail=f"{renames} of {len(to_update)} renamed on the sheet",
+                          parallelism=config.CONTACT_UPDATE_WORKERS)
+
+    def _plan_existing_collector(self, plan, roster, collector_id):
+        """
+        Returns (invite_message_id, reminder_message_id) for the messages the run would keep ("" for one
+        it would create), or None if the collector would be recreated with fresh messages.
+        """
+        invite_message_id, reminder_message_id, messages = self.scheduler.find_messages(collector_id)
+        if messages is not None:
+            types = [m["type"] for m in messages]
+            if len(messages) > 2:
+                plan.errors.append(f"Collector has {len(messages)} messages; the run would stop on this sheet.")
+            if "invite" not in types:
+                plan.add_step("create_invite_message")
+            if "reminder" not in types:
+                plan.add_step("create_reminder_message")
+
+        sync_plan = self.scheduler.run_blocking(
+            self.scheduler.recipient_sync_planner.plan(collector_id, roster.emails, messages)
+        )
+        recreated = sync_plan.strategy == RECREATE_COLLECTOR
+        if recreated:
+            plan.add_step("delete_collector", detail="cheaper than per-recipient deletes")
+            plan.add_step("create_collector", detail=plan.collector_name)
+            plan.add_step("create_invite_message")
+            plan.add_step("create_reminder_message")
+        elif sync_plan.to_remove:
+            plan.add_step("delete_recipient", calls=len(sync_plan.to_remove),
+                          detail=", ".join(sorted(sync_plan.to_remove)),
+                          parallelism=config.RECIPIENT_DELETE_WORKERS)
+        if len(sync_plan.to_remove) >= config.PLAN_CHURN_WARNING_THRESHOLD:
+            plan.warnings.append(f"Heavy recipient churn: {len(sync_plan.to_remove)} removal(s) ({sync_plan.reason}).")
+        if sync_plan.to_add:
+            plan.add_step("add_recipients", calls=bulk_add_calls(len(sync_plan.to_add)),
+                          detail=f"{len(sync_plan.to_add)} of {len(roster.emails)} recipients",
+                          parallelism=config.RECIPIENT_UPLOAD_WORKERS)
+        if recreated:
+            return None
+        return invite_message_id, reminder_message_id
+
+
+def summarize(plans, workers):
+    valid = [p for p in plans if p.valid]
+    total_calls = sum(p.predicted_calls for p in valid)
+    sequential_seconds = sum(p.estimated_seconds for p in valid)
+    slowest = max((p.estimated_seconds for p in valid), default=0)
+    # With N workers the run takes at least the slowest sheet and at least 1/N of the total.
+    concurrent_seconds = max(slowest, sequential_seconds / max(workers, 1))
+    return {
+        "sheets": len(plans),
+        "valid_sheets": len(valid),
+        "discovery_calls": sum(p.discovery_calls for p in plans),
+        "predicted_calls": total_calls,
+        "estimated_seconds_sequential": round(sequential_seconds, 2),
+        "estimated_seconds_with_workers": round(concurrent_seconds, 2),
+        "workers": workers,
+    }
+
+
+def print_plan(plans, workers, as_json=False, stream=None):
+    stream = stream or sys.stdout
+    summary = summarize(plans, workers)
+    if as_json:
+        json.dump({"sheets": [p.to_dict() for p in plans], "summary": summary}, stream, indent=2)
+        stream.write("\n")
+        return
+
+    for plan in plans:
+        print(f"\n=== {plan.sheet_name} ({plan.sheet_id})", file=stream)
+        for error in plan.errors:
+            print(f"  ERROR: {error}", file=stream)
+        if not plan.valid:
+            continue
+        print(f"  survey: {plan.survey_name}", file=stream)
+        for step in plan.steps:
+            detail = f" - {step['detail']}" if step["detail"] else ""
+            print(f"  {step['action']:<24} x{step['calls']:<3} ~{step['seconds']:>6.1f}s{detail}", file=stream)
+        for warning in plan.warnings:
+            print(f"  WARNING: {warning}", file=stream)
+        print(f"  => {plan.predicted_calls} call(s), ~{plan.estimated_seconds:.1f}s "
+              f"({plan.discovery_calls} read-only call(s) spent planning)", file=stream)
+
+    print(f"\nTotal: {summary['valid_sheets']}/{summary['sheets']} sheet(s) to process, "
+          f"{summary['predicted_calls']} call(s), ~{summary['estimated_seconds_sequential']:.0f}s sequentially, "
+          f"~{summary['estimated_seconds_with_workers']:.0f}s with {workers} worker(s).", file=stream)
+
+
+@contextlib.contextmanager
+def diagnostics_to_stderr(enabled):
+    """
+    Send the clients' progress prints to stderr so JSON output on stdout stays parseable.
+    """
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(sys.stderr):
+        yield
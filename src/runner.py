@@ -1,9 +1,67 @@
-from collector_scheduler import CollectorScheduler
+import time
+
+_process_started = time.perf_counter()
+
+import argparse  # noqa: E402
+from metrics import METRICS  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create and schedule SurveyMonkey evaluations from roster sheets.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of sheets to process concurrently (default: config.SHEET_WORKERS)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and process sheets as they are added or edited (Drive changes feed)")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="process sheets on one asyncio event loop with a shared connection pool")
+    parser.add_argument("--plan", action="store_true",
+                        help="dry run: print the writes each sheet needs, with predicted call counts and time")
+    parser.add_argument("--json", action="store_true", help="with --plan, print the plan as JSON")
+    parser.add_argument("--time-budget", type=float, default=None, metavar="SECONDS",
+                        help="after this long, only start sheets whose invite goes out within "
+                             "config.DEADLINE_URGENT_HOURS (default: config.RUN_TIME_BUDGET_SECONDS)")
+    parser.add_argument("--refill-pool", action="store_true",
+                        help="only top up the spare template clones (config.SURVEY_CLONE_POOL_SPARES) and exit")
+    parser.add_argument("--metrics", action="store_true",
+                        help="record per-endpoint and per-sheet timings and export them at the end of the run")
+    return parser.parse_args()
+
+
+def make_scheduler(args):
+    # Only import the stack this invocation uses; aiohttp and the watcher stay unloaded otherwise.
+    if args.use_async:
+        from async_collector_scheduler import AsyncCollectorScheduler
+        return AsyncCollectorScheduler(max_workers=args.workers, time_budget=args.time_budget)
+    from collector_scheduler import CollectorScheduler
+    return CollectorScheduler(max_workers=args.workers, time_budget=args.time_budget)
+
+
+def print_startup_timing():
+    startup = METRICS.startup_summary()
+    line = f"Startup: imports {startup['import_seconds']:.2f}s"
+    if "time_to_first_request_seconds" in startup:
+        line += f", first API request after {startup['time_to_first_request_seconds']:.2f}s"
+    print(line)
 
 
 def main():
-    scheduler = CollectorScheduler()
-    scheduler.run()
+    args = parse_args()
+    if args.metrics:
+        METRICS.enabled = True
+    scheduler = make_scheduler(args)
+    METRICS.record_startup(_process_started, time.perf_counter())
+    if args.plan:
+        scheduler.plan(as_json=args.json)
+    elif args.refill_pool:
+        scheduler.refill_clone_pool()
+        scheduler.quota.save()
+    elif args.watch:
+        from drive_watcher import DriveChangesWatcher
+        DriveChangesWatcher(scheduler).run()
+    else:
+        scheduler.run()
+    if not args.json:
+        print_startup_timing()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+import json
+import sqlite3
+import threading
+
+
+class SheetJournal:
+    """
+    Durable record of the steps finished for each sheet, with the IDs each step produced:
+      (sheet_id, step) -> {"survey_id": ...} etc.
+
+    Steps are recorded as soon as they finish, so a run that crashes or stops on a sheet resumes it
+    at the first unfinished step instead of redoing every lookup. Entries belong to one revision of
+    the sheet; if the roster has changed since, they are dropped and the sheet starts over.
+    The journal for a sheet is cleared once it is moved to the processed folder.
+    Pass path=None to get a journal that never remembers anything.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            # Shared across worker threads; every access goes through self._lock.
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS steps (
+                    sheet_id TEXT NOT NULL,
+                    revision TEXT NOT NULL,
+                    step TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (sheet_id, step)
+                );
+                """
+            )
+            self._conn.commit()
+
+    def open(self, sheet_id, revision):
+        """
+        Returns the SheetSteps for this revision of the sheet, with whatever an earlier run finished.
+        """
+        if not self._conn:
+            return SheetSteps(self, sheet_id, revision, {})
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT revision, step, data FROM steps WHERE sheet_id = ? ORDER BY rowid", (sheet_id,)
+            ).fetchall()
+            stale = [step for row_revision, step, _ in rows if row_revision != revision]
+            if stale:
+                print(f"Sheet {sheet_id} changed since an interrupted run finished {', '.join(stale)}; starting over.")
+                self._conn.execute("DELETE FROM steps WHERE sheet_id = ?", (sheet_id,))
+                self._conn.commit()
+                rows = []
+        return SheetSteps(self, sheet_id, revision, {step: json.loads(data) for _, step, data in rows})
+
+    def _record(self, sheet_id, revision, step, data):
+        if not self._conn:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO steps (sheet_id, revision, step, data) VALUES (?, ?, ?, ?)",
+                (sheet_id, revision, step, json.dumps(data)),
+            )
+            self._conn.commit()
+
+    def _clear(self, sheet_id):
+        if not self._conn:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM steps WHERE sheet_id = ?", (sheet_id,))
+            self._conn.commit()
+
+
+class SheetSteps:
+    """
+    One sheet's view of the journal, handed through the processing steps.
+    """
+
+    def __init__(self, journal, sheet_id, revision, done):
+        self.journal = journal
+        self.sheet_id = sheet_id
+        self.revision = revision
+        self.done = done  # step -> data, in the order the steps finished
+
+    @classmethod
+    def untracked(cls):
+        # For callers that process a sheet without a journal (nothing is skipped or recorded).
+        return cls(SheetJournal(None), None, None, {})
+
+    def get(self, step):
+        """
+        The IDs recorded for step, or None if it has not finished.
+        """
+        return self.done.get(step)
+
+    def finished(self, step):
+        return step in self.done
+
+    def record(self, step, **data):
+        self.done[step] = data
+        self.journal._record(self.sheet_id, self.revision, step, data)
+
+    def clear(self):
+        self.done = {}
+        self.journal._clear(self.sheet_id)
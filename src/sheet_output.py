@@ -0,0 +1,57 @@
+import io
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_print_lock = threading.Lock()
+# Set per worker thread or asyncio task while it is processing a sheet.
+_active_buffer = ContextVar("sheet_output_buffer", default=None)
+
+
+class _ContextRoutedStdout:
+    """
+    Stand-in for sys.stdout that sends writes made while a sheet's output is being captured to that
+    sheet's buffer, and everything else to the real stdout.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, s):
+        buffer = _active_buffer.get()
+        target = buffer if buffer is not None else self.stream
+        return target.write(s)
+
+    def flush(self):
+        if _active_buffer.get() is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def _routed_stdout():
+    with _print_lock:
+        if not isinstance(sys.stdout, _ContextRoutedStdout):
+            sys.stdout = _ContextRoutedStdout(sys.stdout)
+        return sys.stdout
+
+
+@contextmanager
+def captured_sheet_output(label):
+    """
+    Collect everything printed by the current thread or asyncio task and write it out as one block,
+    headed by label, when the block exits (even if it raised).
+    Keeps logs from concurrently processed sheets from interleaving.
+    """
+    stdout = _routed_stdout()
+    buffer = io.StringIO()
+    token = _active_buffer.set(buffer)
+    try:
+        yield
+    finally:
+        _active_buffer.reset(token)
+        with _print_lock:
+            stdout.stream.write(f"===== {label} =====\n{buffer.getvalue()}\n")
+            stdout.stream.flush()
@@ -0,0 +1,178 @@
+import re
+import threading
+import uuid
+from contextlib import nullcontext
+import config
+from surveymonkey_api_client import SurveyMonkeyNotFoundError
+
+SPARE_TITLE = re.compile(r"^Spare clone of template (?P<template_id>\S+) \(rev (?P<revision>[^)]*)\) #[0-9a-f]+$")
+
+
+def spare_title(template_id, revision):
+    return f"Spare clone of template {template_id} (rev {revision}) #{uuid.uuid4().hex[:8]}"
+
+
+class SurveyClonePool:
+    """
+    Spare copies of each template survey, cloned ahead of time into SURVEYMONKEY_FOLDER_ID so a sheet
+    for a new program claims one (one rename) instead of waiting on clone_survey.
+
+    Spares live only in SurveyMonkey: the title records which template, and which revision of it
+    (the template's date_modified), each one was cloned from, e.g.
+      "Spare clone of template 524870670 (rev 2025-08-30T17:12:00) #1f3a9c2e"
+    so any run can find them in the folder listing. A spare whose template has been edited since, or is
+    no longer used by any program, is never claimed and is deleted at the next refill.
+    spares_per_template=0 disables the pool.
+    """
+
+    def __init__(self, spares_per_template, template_ids):
+        self.spares_per_template = spares_per_template
+        self.template_ids = sorted(set(template_ids))
+        self._lock = threading.Lock()
+        self.spares = {}  # template_id -> claimable spare survey IDs, loaded by load()
+        self.revisions = {}  # template_id -> the revision those spares were cloned from
+        self.claimed = 0
+
+    @property
+    def enabled(self):
+        return self.spares_per_template > 0
+
+    def available(self, template_id):
+        with self._lock:
+            return len(self.spares.get(template_id, []))
+
+    # ------------------------
+    # Load
+    # ------------------------
+    async def load(self, client, survey_ids):
+        """
+        survey_ids: {title: survey_id} for the survey folder (the run index's listing).
+        """
+        if not self.enabled:
+            return
+        revisions = await self._template_revisions(client)
+        fresh, _ = self._sort_spares([{"id": sid, "title": title} for title, sid in survey_ids.items()], revisions)
+        with self._lock:
+            self.spares = fresh
+            self.revisions = revisions
+        print(f"Clone pool: {sum(map(len, fresh.values()))} spare survey(s) ready.")
+
+    async def _template_revisions(self, client):
+        revisions = {}
+        for template_id in self.template_ids:
+            try:
+                revisions[template_id] = (await client.get_survey(template_id)).get("date_modified", "")
+            except SurveyMonkeyNotFoundError:
+                print(f"Clone pool: template survey {template_id} not found; no spares for it.")
+        return revisions
+
+    def _sort_spares(self, surveys, revisions):
+        """
+        Returns ({template_id: [claimable spare IDs]}, [stale spare IDs]).
+        """
+        fresh, stale = {}, []
+        for survey in surveys:
+            match = SPARE_TITLE.match(survey["title"])
+            if not match:
+                continue
+            template_id = match.group("template_id")
+            if template_id in revisions and match.group("revision") == revisions[template_id]:
+                fresh.setdefault(template_id, []).append(survey["id"])
+            elif template_id not in self.template_ids or template_id in revisions:
+                # Edited since, or no longer any program's template. (A template we could not look up
+                # this time keeps its spares.)
+                stale.append(survey["id"])
+        return fresh, stale
+
+    # ------------------------
+    # Claim
+    # ------------------------
+    async def claim(self, client, template_id, title):
+        """
+        Rename a spare of template_id to title and return its ID, or None if there is no spare left.
+        The spare's current title is checked first: another run (or the watcher) may have claimed it
+        since the listing.
+        """
+        while True:
+            survey_id = self._take(template_id)
+            if survey_id is None:
+                return None
+            try:
+                if not self._still_spare(await client.get_survey(survey_id), template_id):
+                    print(f"Spare survey {survey_id} was claimed elsewhere; trying the next one.")
+                    continue
+                await client.rename_survey(survey_id, title)
+            except SurveyMonkeyNotFoundError:
+                continue  # deleted since the listing; try the next one
+            return self._claimed(survey_id, template_id, title)
+
+    def _still_spare(self, survey, template_id):
+        match = SPARE_TITLE.match(survey.get("title", ""))
+        with self._lock:
+            revision = self.revisions.get(template_id)
+        return bool(match) and match.group("template_id") == template_id and match.group("revision") == revision
+
+    def _take(self, template_id):
+        with self._lock:
+            spares = self.spares.get(template_id)
+            return spares.pop() if spares else None
+
+    def _claimed(self, survey_id, template_id, title):
+        with self._lock:
+            self.claimed += 1
+        print(f"Claimed spare survey {survey_id} (template {template_id}) as '{title}'.")
+        return survey_id
+
+    # ------------------------
+    # Refill
+    # ------------------------
+    async def refill(self, client, quota=None):
+        """
+        Delete stale spares and clone new ones until every template has spares_per_template fresh spares.
+        Clones are only made while today's SurveyMonkey quota allows.
+        """
+        if not self.enabled:
+            return
+        revisions = await self._template_revisions(client)
+        fresh, stale = self._sort_spares(await client.list_surveys(config.SURVEYMONKEY_FOLDER_ID), revisions)
+        for survey_id in stale:
+            await client.delete_survey(survey_id)
+        missing, reservation = self._missing(fresh, revisions, quota)
+        cloned = 0
+        try:
+            with quota.charging(reservation) if reservation is not None else nullcontext():
+                for template_id, count in missing.items():
+                    for _ in range(count):
+                        spare_id = await client.clone_survey(template_id, spare_title(template_id, revisions[template_id]))
+                        fresh.setdefault(template_id, []).append(spare_id)
+                        cloned += 1
+        finally:
+            if reservation is not None:
+                quota.release_daily(reservation)
+        self._refilled(fresh, revisions, cloned, len(stale))
+
+    def _missing(self, fresh, revisions, quota):
+        """
+        ({template_id: spares to clone}, their DailyReservation), reserved from today's quota
+        (nothing to clone if it can't pay for them; no reservation without a quota).
+        """
+        missing = {
+            template_id: self.spares_per_template - len(fresh.get(template_id, []))
+            for template_id in revisions if len(fresh.get(template_id, [])) < self.spares_per_template
+        }
+        wanted = sum(missing.values())
+        if quota is None or not wanted:
+            return missing, None
+        reservation = quota.try_reserve_daily(wanted)
+        if reservation is None:
+            print(f"Clone pool: not enough daily quota left to clone {wanted} spare(s); refilling next run.")
+            return {}, None
+        return missing, reservation
+
+    def _refilled(self, fresh, revisions, cloned, recycled):
+        with self._lock:
+            self.spares = fresh
+            self.revisions = revisions
+            self.claimed = 0
+        print(f"Clone pool: {sum(map(len, fresh.values()))} spare survey(s) ready "
+              f"({cloned} cloned, {recycled} stale spare(s) deleted).")
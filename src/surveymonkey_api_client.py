@@ -1,220 +1,244 @@
 # surveymonkey_client.py
+import functools
+import inspect
+import math
+import random
+import threading
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
 import requests
 from datetime import datetime, timezone, timedelta
+import config
+from event_loop_thread import EventLoopThread
 
+# Methods that are safe to resend after a 5xx or a dropped connection.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# A recipients/bulk chunk rejected with one of these was refused for its content: split it to isolate the bad contact(s).
+BULK_BISECT_STATUS_CODES = {400, 413, 422}
 
-class SurveyMonkeyApiClient:
-    def __init__(self, api_token):
+
+class ApiCallCounter:
+    """
+    Counts HTTP requests (including retries) sent while it is active; see count_api_calls().
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, n=1):
+        with self._lock:
+            self.calls += n
+
+
+_active_call_counter = ContextVar("surveymonkey_active_call_counter", default=None)
+
+
+@contextmanager
+def count_api_calls():
+    """
+    Count every SurveyMonkey request made in this context, including requests made by asyncio tasks
+    started within it and by SurveyMonkeyApiClient calls (their coroutines run in a copy of the caller's
+    context).
+    """
+    counter = ApiCallCounter()
+    token = _active_call_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _active_call_counter.reset(token)
+
+
+class SurveyMonkeyNotFoundError(requests.HTTPError):
+    """
+    Raised when SurveyMonkey answers 404 for a survey, collector or message we addressed by ID,
+    e.g. because it was deleted in the web UI after we cached its ID.
+    """
+
+
+class BulkRecipientResult:
+    """
+    Per-contact outcome of add_recipients, merged across chunks.
+    """
+
+    def __init__(self):
+        self.succeeded = []
+        self.existing = []
+        self.invalid = []  # reported invalid by SurveyMonkey, or isolated from a rejected chunk
+        self.invalid_contact_ids = []  # contact IDs SurveyMonkey refused
+        self.skipped = {}  # email -> reason (bounced, opted out)
+        self.failed = {}  # email -> error, for chunks that still failed after retries
+        self.requests = 0
+
+    def add_response(self, data):
+        self.succeeded += [c.get("email") for c in data.get("succeeded", [])]
+        self.existing += [c.get("email") for c in data.get("existing", [])]
+        for contact in data.get("invalids", []):
+            if contact.get("email"):
+                self.invalid.append(contact["email"])
+            else:
+                self.invalid_contact_ids.append(contact.get("id"))
+        for reason in ("bounced", "opted_out"):
+            for contact in data.get(reason, []):
+                self.skipped[contact.get("email")] = reason
+
+    def merge(self, other):
+        self.succeeded += other.succeeded
+        self.existing += other.existing
+        self.invalid += other.invalid
+        self.invalid_contact_ids += other.invalid_contact_ids
+        self.skipped.update(other.skipped)
+        self.failed.update(other.failed)
+        self.requests += other.requests
+
+    def print_summary(self):
+        print(f"Recipients: {len(self.succeeded)} added, {len(self.existing)} already present, "
+              f"{len(self.invalid) + len(self.invalid_contact_ids)} invalid, {len(self.skipped)} skipped, {len(self.failed)} failed "
+              f"({self.requests} request(s)).")
+        if self.invalid:
+            print(f"Invalid recipient(s) not added: {', '.join(sorted(map(str, self.invalid)))}")
+        for email, reason in sorted(self.skipped.items()):
+            print(f"Recipient {email} skipped by SurveyMonkey ({reason}).")
+
+
+class RecipientUploadError(Exception):
+    """
+    Raised by add_recipients after every chunk has been tried, when some contacts could not be sent
+    (retries exhausted). result has the per-contact outcome, including what did get added.
+    """
+
+    def __init__(self, result):
+        super().__init__(f"{len(result.failed)} recipient(s) could not be added: "
+                         f"{', '.join(sorted(set(result.failed.values())))}")
+        self.result = result
+
+
+class SurveyMonkeyClientBase:
+    """
+    Transport-independent pieces of AsyncSurveyMonkeyApiClient: retry policy, payload shapes and the date
+    helpers callers use to compare schedules.
+    """
+
+    def __init__(self, api_token, timeout=None, max_retries=None, quota=None):
         self.api_token = api_token
-        self.base_url = "https://api.surveymonkey.com/v3"
+        self.quota = quota  # optional QuotaManager shared by every client in the process
+        self.base_url = config.SURVEYMONKEY_API_BASE_URL.rstrip("/")
         self.headers = {
             "Authorization": f"Bearer {api_token}",
             "Content-Type": "application/json"
         }
+        self.timeout = timeout or config.SURVEYMONKEY_TIMEOUT
+        self.max_retries = config.SURVEYMONKEY_MAX_RETRIES if max_retries is None else max_retries
 
-    # ------------------------
-    # Survey
-    # ------------------------
-    def get_survey_id_by_name(self, survey_name):
-        params = {"title": survey_name}
-        resp = requests.get(f"{self.base_url}/surveys", headers=self.headers, params=params)
-        if resp.status_code != 200:
-            print(f"Warning: failed to fetch surveys (status {resp.status_code})")
-            return None, None
-
-        data = resp.json().get("data", [])
-        if not data:
-            return None, None
-
-        survey = data[0]
-        return survey["id"], survey["title"]
-    
-    def clone_survey(self, survey_id, new_title):
-        """
-        Clone a template survey by ID and name the new copy new_title.
-        Returns the new survey_id.
-        """
-        url = f"{self.base_url}/surveys"
-        payload = {"title": new_title, "folder_id": "1373789", "from_survey_id": survey_id}
-        resp = requests.post(url, headers=self.headers, json=payload)
-        resp.raise_for_status()
-        return resp.json()["id"]
+    def _is_retryable(self, method, status_code):
+        # 429s are rejected before any work is done, so they are safe to resend for every method.
+        return status_code == 429 or (status_code in RETRYABLE_STATUS_CODES and method in IDEMPOTENT_METHODS)
 
-    # ------------------------
-    # Collector
-    # ------------------------
-    def create_collector(self, survey_id, collector_name, close_dt):
-        payload = {"type": "email", "name": collector_name, "close_date": close_dt, "anonymous_type": "fully_anonymous"}
-        print("create collextor payload: ")
-        print(payload)
-        resp = requests.post(f"{self.base_url}/surveys/{survey_id}/collectors", headers=self.headers, json=payload)
-        resp.raise_for_status()
-        collector = resp.json()
-        collector_id = collector["id"]
-        url = collector.get("url")
+    def _count_call(self):
+        counter = _active_call_counter.get()
+        if counter is not None:
+            counter.add()
 
-        return collector_id, url
+    def _quota_wait(self):
+        # Seconds to hold this request back to stay under the per-minute quota.
+        return self.quota.reserve_request() if self.quota else 0.0
 
-    def get_collector_by_name(self, survey_id, collector_name) -> tuple[str, str]:
+    def _record_quota_headers(self, headers):
+        if self.quota:
+            self.quota.update_from_headers(headers)
+
+    def _retry_delay(self, resp, attempt):
         """
-        Fetch collector ID (and URL) for a given survey by collector name.
-        Returns (collector_id, collector_url) or (None, None) if not found.
+        Pick how long to wait before retrying resp. Honors Retry-After first, then the
+        X-Ratelimit-App-Global-* headers, then falls back to jittered exponential backoff.
+        Returns None when the daily allowance is exhausted.
         """
-        url = f"{self.base_url}/surveys/{survey_id}/collectors"
-        params = {"name": collector_name}
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), config.SURVEYMONKEY_BACKOFF_MAX)
+            except ValueError:
+                pass
+        if resp.status_code == 429:
+            if resp.headers.get("X-Ratelimit-App-Global-Day-Remaining") == "0":
+                return None
+            if resp.headers.get("X-Ratelimit-App-Global-Minute-Remaining") == "0":
+                reset = resp.headers.get("X-Ratelimit-App-Global-Minute-Reset")
+                try:
+                    return min(float(reset) + random.uniform(0, 1), config.SURVEYMONKEY_BACKOFF_MAX)
+                except (TypeError, ValueError):
+                    pass
+        return self._backoff_delay(attempt)
 
-        print(f"SM AAPI: trying to get collector by collector name: '{collector_name}'")
-        
-        response = requests.get(url, headers=self.headers, params=params)
-        if response.status_code != 200:
-            print(f"Warning: failed to fetch collectors (status {response.status_code})")
-            return None, None
-        data = response.json()
+    def _bulk_chunks(self, items, chunk_size=None):
+        """
+        Yield lists of at most chunk_size items (emails, contacts) without building the whole payload up front.
+        """
+        items = iter(items)
+        chunk_size = chunk_size or config.RECIPIENT_BULK_CHUNK_SIZE
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                return
+            yield chunk
 
-        print("--------- get_collector_by_name response")
-        print(data)
-        print("---------")
+    def _page_params(self, params, page, per_page):
+        return dict(params or {}, page=page, per_page=per_page)
 
-        collectors = data.get("data", [])
-        if not collectors:
-            return None, None
+    def _remaining_pages(self, first_page):
+        """
+        Page numbers after the first, when the first page reports the total; None when it doesn't
+        (then links.next has to be followed one page at a time).
+        """
+        total, per_page = first_page.get("total"), first_page.get("per_page")
+        if total is None or not per_page:
+            return None
+        return range(2, math.ceil(total / per_page) + 1)
 
-        print("Found the collector by name.", collectors)
+    def _recipients_payload(self, emails, contact_ids):
+        """
+        recipients/bulk body: mirrored musicians by contact ID, everyone else by email.
+        """
+        payload = {"contacts": [{"email": email} for email in emails if email not in contact_ids]}
+        ids = [contact_ids[email] for email in emails if email in contact_ids]
+        if ids:
+            payload["contact_ids"] = ids
+        return payload
 
-        col = collectors[0]
-        return col["id"], col.get("href")
+    def _created_contact_ids(self, data):
+        """
+        {lowercased email: contact_id} from a contacts/bulk response, including contacts that already existed.
+        """
+        return {
+            contact["email"].lower(): contact["id"]
+            for contact in data.get("succeeded", []) + data.get("existing", [])
+            if contact.get("email") and contact.get("id")
+        }
 
-    # ------------------------
-    # Recipients
-    # ------------------------
-    def add_recipients(self, collector_id, message_id, emails):
-        formatted_recipients = {"contacts": []}
-        for email in emails:
-            formatted_recipients["contacts"].append({"email": email})
-        if formatted_recipients["contacts"]:
-            print("Logging first formatted recipient to add: ", formatted_recipients["contacts"][0])
-        resp = requests.post(
-            f"{self.base_url}/collectors/{collector_id}/messages/{message_id}/recipients/bulk",
-            headers=self.headers,
-            json=formatted_recipients
-        )
-        resp.raise_for_status()
-        return resp.json()
-
-    def delete_recipients_in_collector_but_not_in_file(self, collector_id, sheet_emails):
-        """
-        Sync collector recipients to match the current sheet.
-        Only remove recipients who are no longer in the sheet.
-        Adding new recipients can be done in bulk; duplicates are ignored by SM.
-        """
-        # Fetch current recipients
-        existing = self.get_recipients(collector_id)
-        existing_emails = {r["email"]: r["id"] for r in existing}
-
-        # Identify emails to remove
-        to_remove = set(existing_emails.keys()) - set(sheet_emails)
-
-        if to_remove:
-            print("Collector has emails that are not present in latest file:")
-            print(to_remove)
-        else:
-            print("No recipients exist on the collector that are not present in the file.")
-
-        # Remove recipients no longer in sheet
-        for email in to_remove:
-            rid = existing_emails[email]
-            url = f"{self.base_url}/collectors/{collector_id}/recipients/{rid}"
-            response = requests.delete(url, headers=self.headers)
-            if response.status_code not in (200, 204):
-                print(f"Warning: failed to remove recipient {email} (status {response.status_code})")
-            print(f"Recipient {email} removed from file has been removed from the collector.")
-
-    def get_recipients(self, collector_id):
-        """
-        Fetch existing recipients for a collector.
-        Returns a list of dicts with at least 'id' and 'email'.
-        """
-        recipients = []
-        url = f"https://api.surveymonkey.com/v3/collectors/{collector_id}/recipients"
-        while url:
-            response = requests.get(url, headers=self.headers)
-            if response.status_code != 200:
-                print(f"Warning: failed to fetch recipients (status {response.status_code})")
-                break
-            data = response.json()
-            recipients.extend(data.get("data", []))
-            url = data.get("links", {}).get("next")
-        return recipients
+    def _contacts_bulk_url(self, contact_list_id):
+        if contact_list_id:
+            return f"{self.base_url}/contact_lists/{contact_list_id}/contacts/bulk"
+        return f"{self.base_url}/contacts/bulk"
+
+    def _bulk_failure_action(self, status_code):
+        """
+        What to do with a recipients/bulk chunk that failed with status_code (None: connection error).
+        Resending is safe: contacts already added come back as "existing".
+        """
+        if status_code in BULK_BISECT_STATUS_CODES:
+            return "bisect"
+        if status_code is None or status_code in RETRYABLE_STATUS_CODES:
+            return "retry"
+        return "raise"
+
+    def _backoff_delay(self, attempt):
+        # "Full jitter": uniform between 0 and the exponential cap, so parallel callers spread out.
+        cap = min(config.SURVEYMONKEY_BACKOFF_MAX, config.SURVEYMONKEY_BACKOFF_BASE * (2 ** attempt))
+        return random.uniform(0, cap)
 
-    # ------------------------
-    # Messages
-    # ------------------------
-    def schedule_message(self, collector_id, message_id, schedule_dt):
-        # Schedule message
-        send_payload = {}
-        dt_utc = self._parse_iso_z(schedule_dt).astimezone(timezone.utc)
-        send_payload["scheduled_date"] = self._to_api_iso_z(dt_utc)
-        send_resp = requests.post(
-            f"{self.base_url}/collectors/{collector_id}/messages/{message_id}/send",
-            headers=self.headers,
-            json=send_payload,
-        )
-        send_resp.raise_for_status()
-        return send_resp.json()
-    
-    def create_invite_message(self, collector_id, survey_name):
-        # Create message and return ID
-        payload = {
-            "type": "invite",
-            "subject": survey_name,
-            "embed_first_question": True
-        }
-        resp = requests.post(f"{self.base_url}/collectors/{collector_id}/messages", headers=self.headers, json=payload)
-        resp.raise_for_status()
-        message_id = resp.json()["id"]
-        return message_id
-    
-    def create_reminder_message(self, collector_id, subject):
-        create_payload = {
-            "subject": subject,
-            "type": "reminder",
-            "embed_first_question": True,
-            "recipient_status": "has_not_responded"
-        }
-        # Create reminder message
-        resp = requests.post(
-            f"{self.base_url}/collectors/{collector_id}/messages",
-            headers=self.headers,
-            json=create_payload,
-        )
-        resp.raise_for_status()
-        message_id = resp.json()["id"]
-        return message_id
-    
-    def schedule_reminder_message_send(self, collector_id, message_id, invite_sent_dt, days_after=3):
-        """
-        Schedule a reminder for an email collector for 3 days after collector is sent.
-        Only goes to recipients who have not responded or partially responded.
-        """
-        # Calculate reminder time
-        invite_dt = self._parse_iso_z(invite_sent_dt)
-        reminder_dt = (invite_dt + timedelta(days=days_after)).astimezone(timezone.utc)
-        schedule_payload = {"scheduled_date": self._to_api_iso_z(reminder_dt)}
-
-        # Schedule the reminder
-        send_resp = requests.post(
-            f"{self.base_url}/collectors/{collector_id}/messages/{message_id}/send",
-            headers=self.headers,
-            json=schedule_payload
-        )
-        send_resp.raise_for_status()
-        return send_resp.json()
-    
-    def get_messages_on_collector(self, collector_id):
-        resp = requests.get(f"{self.base_url}/collectors/{collector_id}/messages", headers=self.headers)
-        messages_array = resp.json()["data"]
-        return messages_array
-    
     # ------------------------
     # Helpers
     # ------------------------
@@ -235,3 +259,83 @@ class SurveyMonkeyApiClient:
             dt = dt.replace(tzinfo=timezone.utc)
         dt_utc = dt.astimezone(timezone.utc)
         return dt_utc.isoformat().replace("+00:00", "Z")
+
+    def reminder_send_time(self, invite_sent_dt, days_after=3):
+        # When schedule_reminder_message_send schedules the reminder, as an API timestamp.
+        invite_dt = self._parse_iso_z(invite_sent_dt)
+        return self._to_api_iso_z((invite_dt + timedelta(days=days_after)).astimezone(timezone.utc))
+
+    def is_scheduled_for(self, message, schedule_dt):
+        """
+        True if message (details from get_message) is already scheduled to go out at schedule_dt.
+        """
+        if message.get("status") != "scheduled" or not message.get("scheduled_date"):
+            return False
+        return self._same_instant(message["scheduled_date"], schedule_dt)
+
+    def close_date_differs(self, collector, close_dt):
+        """
+        True unless collector (details from get_collector) already closes at close_dt.
+        """
+        return not collector.get("close_date") or not self._same_instant(collector["close_date"], close_dt)
+
+    def _same_instant(self, a, b):
+        # SurveyMonkey may answer without an offset; its timestamps are UTC.
+        a, b = self._parse_iso_z(a), self._parse_iso_z(b)
+        return a.replace(tzinfo=a.tzinfo or timezone.utc) == b.replace(tzinfo=b.tzinfo or timezone.utc)
+
+
+class SurveyMonkeyApiClient:
+    """
+    Synchronous SurveyMonkey client: a thin wrapper that runs AsyncSurveyMonkeyApiClient's coroutines on
+    its own event loop thread, so each method blocks until the call (retries included) is done and
+    returns what the coroutine returns. Every call shares one keep-alive session of up to pool_size
+    connections, so a run pays for the TLS handshake once instead of once per request.
+    Coroutines running on that loop (run()) use core, the wrapped client, directly.
+    """
+
+    def __init__(self, api_token, pool_size=None, timeout=None, max_retries=None, quota=None):
+        # Imported here: the async client is built on this module's base class and result types.
+        from async_surveymonkey_api_client import AsyncSurveyMonkeyApiClient, new_session
+        pool_size = pool_size or config.SURVEYMONKEY_POOL_SIZE
+        self._loop_thread = EventLoopThread(name="surveymonkey-client")
+
+        async def open_client():
+            # The session belongs to the loop it is created on.
+            return AsyncSurveyMonkeyApiClient(api_token, new_session(pool_size), timeout, max_retries, quota)
+
+        self.core = self._loop_thread.run(open_client())
+        # Close the session and stop the loop when the client goes away (or at exit).
+        self._finalizer = weakref.finalize(self, _shut_down, self._loop_thread, self.core.session)
+
+    def run(self, coro):
+        """
+        Run a coroutine on the client's event loop and return its result.
+        """
+        return self._loop_thread.run(coro)
+
+    def close(self):
+        self._finalizer()
+
+    def __getattr__(self, name):
+        # API methods (coroutines) run on the loop; helpers and attributes are the core's own.
+        if name == "core":
+            raise AttributeError(name)
+        attr = getattr(self.core, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            return self.run(attr(*args, **kwargs))
+        return call
+
+    def iter_recipients(self, collector_id, include=None):
+        """
+        Yields the collector's recipients; the pages are fetched (concurrently) before the first one.
+        """
+        yield from self.get_recipients(collector_id, include)
+
+
+def _shut_down(loop_thread, session):
+    loop_thread.close(session.close())
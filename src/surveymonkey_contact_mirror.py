@@ -0,0 +1,166 @@
+import asyncio
+import sqlite3
+import threading
+import config
+
+
+class SurveyMonkeyContactMirror:
+    """
+    Local copy of the SurveyMonkey contacts made for roster musicians:
+      email (lowercased) -> (contact_id, first name, last name)
+
+    sync() only creates contacts the mirror has never seen and updates those whose name changed on a
+    sheet, so a musician who is on every roster is one contact for the whole season and is attached to
+    invite messages by contact ID. New contacts go into contact_list_id when one is configured.
+    Renames are sent CONTACT_UPDATE_WORKERS at a time and at most CONTACT_RENAMES_PER_SHEET per sync;
+    the rest keep their old name in the mirror and are picked up by later syncs.
+    Pass path=None to disable the mirror; every recipient is then sent by email.
+    """
+
+    def __init__(self, path, contact_list_id=None):
+        self.path = path
+        self.contact_list_id = contact_list_id
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            # Shared across worker threads; every access goes through self._lock.
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS contacts (
+                    email TEXT PRIMARY KEY,
+                    contact_id TEXT NOT NULL,
+                    first_name TEXT NOT NULL DEFAULT '',
+                    last_name TEXT NOT NULL DEFAULT ''
+                );
+                """
+            )
+            self._conn.commit()
+
+    @property
+    def enabled(self):
+        return self._conn is not None
+
+    # ------------------------
+    # Sync
+    # ------------------------
+    async def sync(self, client, people):
+        """
+        people: {email: (first_name, last_name)} from a roster.
+        Returns {email: contact_id} for every email in people that has a contact.
+        """
+        if not self.enabled:
+            return {}
+        to_create, to_update = self.changes(people)
+        to_update = self.renames_this_sync(to_update)
+        if to_create:
+            self._record_created(to_create, await client.create_contacts(to_create, self.contact_list_id))
+        limit = asyncio.Semaphore(config.CONTACT_UPDATE_WORKERS)
+
+        async def rename(contact_id, contact):
+            async with limit:
+                await client.update_contact(contact_id, contact["first_name"], contact["last_name"])
+            self._record_names(contact)
+
+        await asyncio.gather(*(rename(contact_id, contact) for contact_id, contact in to_update))
+        return self._report(people, to_create, to_update)
+
+    def renames_this_sync(self, to_update):
+        """
+        The renames one sync sends: the first CONTACT_RENAMES_PER_SHEET of to_update.
+        """
+        cap = config.CONTACT_RENAMES_PER_SHEET
+        if len(to_update) > cap:
+            print(f"Contacts: {len(to_update)} renamed on the sheet; updating {cap} now, the rest on later runs.")
+            return to_update[:cap]
+        return to_update
+
+    def changes(self, people):
+        """
+        Returns (contacts to create, [(contact_id, contact) to update]). A blank name on the sheet never
+        overwrites a name SurveyMonkey already has.
+        """
+        known = self._rows([email.lower() for email in people])
+        to_create, to_update = [], []
+        for email, (first_name, last_name) in people.items():
+            contact = {"email": email, "first_name": first_name or "", "last_name": last_name or ""}
+            row = known.get(email.lower())
+            if row is None:
+                to_create.append(contact)
+                continue
+            contact_id, known_first, known_last = row
+            contact["first_name"] = contact["first_name"] or known_first
+            contact["last_name"] = contact["last_name"] or known_last
+            if (contact["first_name"], contact["last_name"]) != (known_first, known_last):
+                to_update.append((contact_id, contact))
+        return to_create, to_update
+
+    def _report(self, people, to_create, to_update):
+        contact_ids = self.contact_ids(people)
+        print(f"Contacts: {len(to_create)} new, {len(to_update)} renamed, "
+              f"{len(contact_ids)} of {len(people)} recipient(s) sent by contact ID.")
+        return contact_ids
+
+    # ------------------------
+    # Lookups
+    # ------------------------
+    def contact_ids(self, emails):
+        """
+        Returns {email: contact_id} for the emails the mirror knows.
+        """
+        known = self._rows([email.lower() for email in emails])
+        return {email: known[email.lower()][0] for email in emails if email.lower() in known}
+
+    def _rows(self, emails):
+        if not self._conn or not emails:
+            return {}
+        rows = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit.
+            for start in range(0, len(emails), 500):
+                batch = emails[start:start + 500]
+                rows.update(
+                    (email, (contact_id, first_name, last_name))
+                    for email, contact_id, first_name, last_name in self._conn.execute(
+                        "SELECT email, contact_id, first_name, last_name FROM contacts "
+                        f"WHERE email IN ({','.join('?' * len(batch))})",
+                        batch,
+                    )
+                )
+        return rows
+
+    # ------------------------
+    # Updates
+    # ------------------------
+    def _record_created(self, contacts, contact_ids):
+        """
+        contact_ids: {lowercased email: contact_id} as returned by create_contacts, which also covers
+        contacts SurveyMonkey already had.
+        """
+        rows = [
+            (contact["email"].lower(), contact_ids[contact["email"].lower()], contact["first_name"], contact["last_name"])
+            for contact in contacts if contact["email"].lower() in contact_ids
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO contacts (email, contact_id, first_name, last_name) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def _record_names(self, contact):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE contacts SET first_name = ?, last_name = ? WHERE email = ?",
+                (contact["first_name"], contact["last_name"], contact["email"].lower()),
+            )
+            self._conn.commit()
+
+    def forget(self, emails):
+        """
+        Drop contacts whose IDs SurveyMonkey no longer accepts; they are recreated on the next sync.
+        """
+        if not self._conn or not emails:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM contacts WHERE email = ?", [(email.lower(),) for email in emails])
+            self._conn.commit()
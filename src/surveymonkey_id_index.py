@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+
+
+class SurveyMonkeyIdIndex:
+    """
+    Durable cache of SurveyMonkey IDs discovered by earlier runs:
+      survey name -> survey_id
+      (survey_id, collector name) -> collector_id
+      collector_id -> (invite message id, reminder message id)
+
+    Entries are trusted until a call using them 404s, at which point the caller evicts them
+    and falls back to the API. Pass path=None to get an index that never remembers anything.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            # Shared across worker threads; every access goes through self._lock.
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS surveys (
+                    name TEXT PRIMARY KEY,
+                    survey_id TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS collectors (
+                    survey_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    collector_id TEXT NOT NULL,
+                    PRIMARY KEY (survey_id, name)
+                );
+                CREATE TABLE IF NOT EXISTS messages (
+                    collector_id TEXT PRIMARY KEY,
+                    invite_message_id TEXT NOT NULL,
+                    reminder_message_id TEXT NOT NULL
+                );
+                """
+            )
+            self._conn.commit()
+
+    def _fetchone(self, sql, params):
+        if not self._conn:
+            return None
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _write(self, sql, params):
+        if not self._conn:
+            return
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+    # ------------------------
+    # Lookups
+    # ------------------------
+    def get_survey_id(self, survey_name):
+        row = self._fetchone("SELECT survey_id FROM surveys WHERE name = ?", (survey_name,))
+        return row[0] if row else None
+
+    def get_collector_id(self, survey_id, collector_name):
+        row = self._fetchone(
+            "SELECT collector_id FROM collectors WHERE survey_id = ? AND name = ?", (survey_id, collector_name)
+        )
+        return row[0] if row else None
+
+    def get_message_ids(self, collector_id):
+        """
+        Returns (invite_message_id, reminder_message_id) or (None, None).
+        """
+        row = self._fetchone(
+            "SELECT invite_message_id, reminder_message_id FROM messages WHERE collector_id = ?", (collector_id,)
+        )
+        return (row[0], row[1]) if row else (None, None)
+
+    # ------------------------
+    # Updates
+    # ------------------------
+    def set_survey_id(self, survey_name, survey_id):
+        self._write("INSERT OR REPLACE INTO surveys (name, survey_id) VALUES (?, ?)", (survey_name, survey_id))
+
+    def set_collector_id(self, survey_id, collector_name, collector_id):
+        self._write(
+            "INSERT OR REPLACE INTO collectors (survey_id, name, collector_id) VALUES (?, ?, ?)",
+            (survey_id, collector_name, collector_id),
+        )
+
+    def set_message_ids(self, collector_id, invite_message_id, reminder_message_id):
+        self._write(
+            "INSERT OR REPLACE INTO messages (collector_id, invite_message_id, reminder_message_id) VALUES (?, ?, ?)",
+            (collector_id, invite_message_id, reminder_message_id),
+        )
+
+    def evict_survey(self, survey_name):
+        """
+        Forget a survey and everything cached underneath it (its collectors and their messages).
+        """
+        if not self._conn:
+            return
+        with self._lock:
+            row = self._conn.execute("SELECT survey_id FROM surveys WHERE name = ?", (survey_name,)).fetchone()
+            if row:
+                survey_id = row[0]
+                self._conn.execute(
+                    "DELETE FROM messages WHERE collector_id IN (SELECT collector_id FROM collectors WHERE survey_id = ?)",
+                    (survey_id,),
+                )
+                self._conn.execute("DELETE FROM collectors WHERE survey_id = ?", (survey_id,))
+            self._conn.execute("DELETE FROM surveys WHERE name = ?", (survey_name,))
+            self._conn.commit()
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import config
+
+
+class SurveyMonkeyRunIndex:
+    """
+    Snapshot of what SurveyMonkey already holds for this run's sheets, fetched once before any sheet is
+    processed instead of with three filtered lookups per sheet:
+      - every survey in SURVEYMONKEY_FOLDER_ID (one listing, largest page size)
+      - the collectors of the surveys pending sheets map to
+      - the messages of the collectors pending sheets map to
+
+    Lookups return (known, value). known=False means the index has no authoritative answer and the
+    caller should ask the API; known=True with value None means "does not exist". The scheduler records
+    what it creates here so later sheets in the same run see it.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._lock = threading.Lock()
+        self.survey_ids = {}  # title -> survey_id, for the whole folder
+        self.collector_ids = {}  # survey_id -> {collector name -> collector_id}
+        self.listed_surveys = set()  # surveys whose collector_ids entry is complete (prefetched or created)
+        self.messages = {}  # collector_id -> messages, prefetched or created collectors only
+        self.evicted_surveys = set()  # titles whose folder listing entry can no longer be trusted
+
+    # ------------------------
+    # Prefetch
+    # ------------------------
+    async def prefetch(self, client, pending):
+        """
+        pending: (survey_name, collector_name) pairs for the sheets about to be processed.
+        Collector and message listings go out PREFETCH_WORKERS at a time.
+        """
+        surveys = await client.list_surveys(config.SURVEYMONKEY_FOLDER_ID)
+        survey_ids = self._load_surveys(surveys, pending)
+        limit = asyncio.Semaphore(config.PREFETCH_WORKERS)
+
+        async def fetch(call, arg):
+            async with limit:
+                return await call(arg)
+
+        collector_lists = await asyncio.gather(*(fetch(client.list_collectors, sid) for sid in survey_ids))
+        collector_ids = self._load_collectors(survey_ids, collector_lists, pending)
+        message_lists = await asyncio.gather(*(
+            fetch(client.get_messages_on_collector, cid) for cid in collector_ids
+        ))
+        self._load_messages(collector_ids, message_lists)
+        self._report(len(surveys), survey_ids, collector_ids)
+
+    def _load_surveys(self, surveys, pending):
+        """
+        Index the folder listing; returns the IDs of surveys that pending sheets map to.
+        """
+        with self._lock:
+            for survey in surveys:
+                # Same as the filtered lookup: the first survey with the title wins.
+                self.survey_ids.setdefault(survey["title"], survey["id"])
+            self.loaded = True
+            wanted = {survey_name for survey_name, _ in pending}
+            return [self.survey_ids[name] for name in sorted(wanted) if name in self.survey_ids]
+
+    def _load_collectors(self, survey_ids, collector_lists, pending):
+        """
+        Returns the IDs of collectors that pending sheets map to.
+        """
+        wanted = {collector_name for _, collector_name in pending}
+        matched = []
+        with self._lock:
+            for survey_id, collectors in zip(survey_ids, collector_lists):
+                by_name = {}
+                for collector in collectors:
+                    by_name.setdefault(collector["name"], collector["id"])
+                self.collector_ids[survey_id] = by_name
+                self.listed_surveys.add(survey_id)
+                matched += [collector_id for name, collector_id in by_name.items() if name in wanted]
+        return matched
+
+    def _load_messages(self, collector_ids, message_lists):
+        with self._lock:
+            for collector_id, messages in zip(collector_ids, message_lists):
+                self.messages[collector_id] = messages
+
+    def _report(self, survey_count, survey_ids, collector_ids):
+        print(f"Prefetched {survey_count} survey(s) in folder {config.SURVEYMONKEY_FOLDER_ID}; "
+              f"{len(survey_ids)} match pending sheets, with {len(collector_ids)} matching collector(s).")
+
+    # ------------------------
+    # Lookups
+    # ------------------------
+    def find_survey(self, survey_name):
+        """
+        known=True with None only means the title is not in SURVEYMONKEY_FOLDER_ID; the survey may still
+        exist outside the folder, so callers look further before creating one.
+        """
+        with self._lock:
+            if not self.loaded or survey_name in self.evicted_surveys:
+                return False, None
+            return True, self.survey_ids.get(survey_name)
+
+    def find_collector(self, survey_id, collector_name):
+        with self._lock:
+            if survey_id not in self.listed_surveys:
+                return False, None
+            return True, self.collector_ids[survey_id].get(collector_name)
+
+    def find_messages(self, collector_id):
+        with self._lock:
+            if collector_id not in self.messages:
+                return False, None
+            return True, list(self.messages[collector_id])
+
+    # ------------------------
+    # Updates
+    # ------------------------
+    def add_survey(self, survey_name, survey_id, created=False):
+        with self._lock:
+            self.survey_ids[survey_name] = survey_id
+            self.evicted_surveys.discard(survey_name)
+            if created:
+                # A survey we just cloned has no collectors yet.
+                self.collector_ids[survey_id] = {}
+                self.listed_surveys.add(survey_id)
+
+    def add_collector(self, survey_id, collector_name, collector_id, created=False):
+        with self._lock:
+            collectors = self.collector_ids.setdefault(survey_id, {})
+            previous = collectors.get(collector_name)
+            if previous and previous != collector_id:
+                self.messages.pop(previous, None)
+            collectors[collector_name] = collector_id
+            if created:
+                self.messages[collector_id] = []
+
+    def update_message(self, collector_id, message_id, message_type, status="not_sent"):
+        """
+        Record a message we created or scheduled, if we are tracking the collector's messages.
+        """
+        with self._lock:
+            messages = self.messages.get(collector_id)
+            if messages is None:
+                return
+            for message in messages:
+                if message["id"] == message_id:
+                    message["status"] = status
+                    return
+            messages.append({"id": message_id, "type": message_type, "status": status})
+
+    def evict_survey(self, survey_name):
+        """
+        Forget a survey and everything under it, e.g. after one of its IDs 404ed.
+        """
+        with self._lock:
+            survey_id = self.survey_ids.pop(survey_name, None)
+            self.evicted_surveys.add(survey_name)
+            self.listed_surveys.discard(survey_id)
+            for collector_id in self.collector_ids.pop(survey_id, {}).values():
+                self.messages.pop(collector_id, None)
@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+import threading
+import types
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The modules under src/ import each other by bare name, as when run from src/.
+sys.path.insert(0, os.path.join(ROOT, "src"))
+# The fake SurveyMonkey/Drive/Sheets server the benchmarks run against.
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+import config  # noqa: E402
+from fake_services import make_server  # noqa: E402
+
+
+@pytest.fixture
+def fake_services(monkeypatch):
+    """
+    fake_services.py serving on a free port, with the SurveyMonkey, Drive and Sheets clients pointed at it
+    and quotas out of the way. Yields the server's FakeState, to seed and inspect directly; its options
+    dict can be changed between calls.
+    """
+    server = make_server(port=0)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(config, "SURVEYMONKEY_API_BASE_URL", f"{url}/v3")
+    monkeypatch.setattr(config, "DRIVE_API_ENDPOINT", f"{url}/")
+    monkeypatch.setattr(config, "SHEETS_API_ENDPOINT", f"{url}/")
+    monkeypatch.setattr(config, "SURVEYMONKEY_REQUESTS_PER_MINUTE", 10 ** 9)
+    monkeypatch.setattr(config, "SURVEYMONKEY_REQUESTS_PER_DAY", 10 ** 9)
+    monkeypatch.setattr(config, "SURVEYMONKEY_BACKOFF_BASE", 0.01)
+    config_local = types.ModuleType("config_local")
+    config_local.SURVEYMONKEY_API_TOKEN = "test-token"
+    monkeypatch.setitem(sys.modules, "config_local", config_local)
+    state = server.RequestHandlerClass.state
+    state.url = url
+    try:
+        yield state
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def google_credentials(fake_services, tmp_path):
+    """
+    Path to a service-account file whose token endpoint is the fake's.
+    """
+    from run_benchmarks import generate_private_key_pem
+    path = tmp_path / "google_credentials.json"
+    path.write_text(json.dumps({
+        "type": "service_account",
+        "project_id": "test",
+        "private_key_id": "test",
+        "private_key": generate_private_key_pem(),
+        "client_email": "test@test.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": f"{fake_services.url}/token",
+    }))
+    return str(path)
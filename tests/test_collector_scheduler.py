@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from collections import defaultdict
+import pytest
+from collector_scheduler import CollectorScheduler
+from google_sheets_api_client import Roster
+
+
+class StubScheduler(CollectorScheduler):
+    """
+    Processing and Drive replaced by in-memory stand-ins: a sheet named "fails" raises, the others
+    take a moment and queue their move.
+    """
+
+    def read_rosters(self, sheets):
+        return {sheet_id: Roster(sheet_id, "", "", "2099-01-01 20:00", []) for _, sheet_id, _ in sheets}
+
+    async def process_sheet_async(self, sheet_id, sheet_name, roster, program):
+        if sheet_name == "fails":
+            raise RuntimeError("boom")
+        await asyncio.sleep(0.05)
+        self.queue_move(sheet_id, sheet_name, program.processed_folder_id, None)
+
+    def flush_moves(self):
+        moved, self._pending_moves = {sheet_id for sheet_id, _, _, _ in self._pending_moves}, []
+        self.flushed = moved
+        return moved
+
+
+def test_failed_sheet_waits_for_sheets_in_flight(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scheduler = StubScheduler(max_workers=3)
+    program = scheduler.programs[0]
+    sheets = [(program, "s1", "slow 1"), (program, "s2", "fails"), (program, "s3", "slow 2")]
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scheduler.process_sheets_async(sheets))
+    assert scheduler.flushed == {"s1", "s3"}
+
+
+def test_stop_event_lets_the_sheet_in_progress_finish(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scheduler = StubScheduler(max_workers=1)
+    scheduler.stop_event = threading.Event()
+    program = scheduler.programs[0]
+    sheets = [(program, "s1", "slow 1"), (program, "s2", "slow 2")]
+    process = scheduler.process_sheet_async
+
+    async def stop_during_first(sheet_id, *args):
+        scheduler.stop_event.set()
+        await process(sheet_id, *args)
+
+    scheduler.process_sheet_async = stop_during_first
+    assert asyncio.run(scheduler.process_sheets_async(sheets)) == {"s1"}
+
+
+class LockProbeScheduler(CollectorScheduler):
+    """
+    Real sheet processing down to sync_collector_async (no prefetch), which only records how many sheets are
+    inside it per survey and prints around a pause.
+    """
+
+    titles = {"a1": "SUB 1", "a2": "SUB 1", "b1": "SUB 2"}
+
+    def read_rosters(self, sheets):
+        return {
+            sheet_id: Roster(sheet_id, self.titles[sheet_id], "Ludovic Morlot", "2099-01-01 20:00", [f"{sheet_id}@example.com"])
+            for _, sheet_id, _ in sheets
+        }
+
+    async def prefetch_surveymonkey_async(self, rosters):
+        pass
+
+    async def sync_collector_async(self, survey_name, collector_name, *args, **kwargs):
+        self.inside[survey_name] += 1
+        self.most_inside[survey_name] = max(self.most_inside[survey_name], self.inside[survey_name])
+        print(f"{collector_name}: start")
+        await asyncio.sleep(0.05)
+        print(f"{collector_name}: done")
+        self.inside[survey_name] -= 1
+
+    def flush_moves(self):
+        moved, self._pending_moves = {sheet_id for sheet_id, _, _, _ in self._pending_moves}, []
+        return moved
+
+
+def test_sheets_for_one_survey_run_one_at_a_time_with_whole_logs(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    scheduler = LockProbeScheduler(max_workers=3)
+    scheduler.inside, scheduler.most_inside = defaultdict(int), defaultdict(int)
+    program = scheduler.programs[0]
+    sheets = [(program, sheet_id, f"sheet {sheet_id}") for sheet_id in ("a1", "a2", "b1")]
+
+    moved = asyncio.run(scheduler.process_sheets_async(sheets))
+
+    assert moved == {"a1", "a2", "b1"}
+    assert max(scheduler.most_inside.values()) == 1
+    assert len(scheduler.most_inside) == 2
+    # Each sheet's output is one block under its own header, not interleaved with the others.
+    blocks = capsys.readouterr().out.split("===== ")[1:]
+    assert sorted(block.split(" =====")[0] for block in blocks) == ["sheet a1", "sheet a2", "sheet b1"]
+    for block in blocks:
+        title = LockProbeScheduler.titles[block.split(" =====")[0][len("sheet "):]]
+        assert [line for line in block.splitlines() if line.endswith(("start", "done"))] == [
+            f"Email Invitation for Ludovic Morlot ({title}): start",
+            f"Email Invitation for Ludovic Morlot ({title}): done",
+        ]
+
+
+def test_unreadable_sheet_is_left_for_the_next_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scheduler = StubScheduler(max_workers=2)
+    read_rosters = scheduler.read_rosters
+    monkeypatch.setattr(scheduler, "read_rosters", lambda sheets: {
+        sheet_id: roster for sheet_id, roster in read_rosters(sheets).items() if sheet_id != "s2"
+    })
+    program = scheduler.programs[0]
+    sheets = [(program, "s1", "slow 1"), (program, "s2", "unreadable"), (program, "s3", "slow 2")]
+
+    assert asyncio.run(scheduler.process_sheets_async(sheets)) == {"s1", "s3"}
@@ -0,0 +1,40 @@
+from drive_watcher import DriveChangesWatcher
+from programs import load_programs
+
+
+class StubScheduler:
+    """
+    Records process_sheets batches and reports the sheets in `moves` as moved.
+    """
+
+    def __init__(self, moves):
+        self.google_sheets_client = None
+        self.programs = load_programs()
+        self.moves = moves
+        self.batches = []
+
+    def process_sheets(self, sheets):
+        self.batches.append([sheet_id for _, sheet_id, _ in sheets])
+        return self.moves & {sheet_id for _, sheet_id, _ in sheets}
+
+    def refill_clone_pool(self, only_if_claimed=False):
+        pass
+
+
+def test_due_sheets_are_processed_in_one_batch(tmp_path):
+    scheduler = StubScheduler(moves={"s1", "s3"})
+    watcher = DriveChangesWatcher(scheduler, state_path=str(tmp_path / "state.json"),
+                                  health_path=str(tmp_path / "health.json"), debounce_seconds=60)
+    folder_id = next(iter(watcher.folders))
+    watcher.pending = {
+        sheet_id: {"name": sheet_id, "folder_id": folder_id, "last_change": last_change}
+        for sheet_id, last_change in (("s1", 0), ("s2", 0), ("s3", 0), ("edited", 10 ** 12))
+    }
+
+    watcher._process_due_sheets()
+    assert scheduler.batches == [["s1", "s2", "s3"]]
+    assert watcher.sheets_processed == 2
+    # Not moved: waits another debounce period. Still being edited: untouched.
+    assert set(watcher.pending) == {"s2", "edited"}
+    assert watcher.pending["s2"]["last_change"] > 0
+    assert watcher.pending["edited"]["last_change"] == 10 ** 12
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+from programs import FairSheetQueue, Program
+
+
+def program(name, max_concurrent_sheets=None):
+    return Program(name, f"{name}-in", f"{name}-out", {"default": "1"}, max_concurrent_sheets=max_concurrent_sheets)
+
+
+def drain(queue, urgent_only=False):
+    taken = []
+    while True:
+        work = queue.next_ready(urgent_only)
+        if work is None:
+            return taken
+        taken.append(work[1])
+        queue.finished(work[0])
+
+
+def test_round_robin_across_programs():
+    a, b = program("a"), program("b")
+    queue = FairSheetQueue([(a, "a1", ""), (a, "a2", ""), (a, "a3", ""), (b, "b1", "")])
+    assert drain(queue) == ["a1", "b1", "a2", "a3"]
+    assert not queue
+
+
+def test_earliest_deadline_first_within_a_program():
+    a = program("a")
+    now = datetime.now(timezone.utc)
+    deadlines = {"late": now + timedelta(days=30), "soon": now + timedelta(days=10)}
+    queue = FairSheetQueue([(a, "undated", ""), (a, "late", ""), (a, "soon", "")], deadlines)
+    assert drain(queue) == ["soon", "late", "undated"]
+
+
+def test_urgent_sheet_skips_the_rotation():
+    a, b = program("a"), program("b")
+    deadlines = {"b2": datetime.now(timezone.utc) + timedelta(hours=1)}
+    queue = FairSheetQueue([(a, "a1", ""), (b, "b1", ""), (b, "b2", "")], deadlines)
+    assert queue.next_ready()[1] == "b2"
+
+
+def test_urgent_only_leaves_the_rest():
+    a = program("a")
+    deadlines = {"due": datetime.now(timezone.utc) + timedelta(hours=1)}
+    queue = FairSheetQueue([(a, "later", ""), (a, "due", "")], deadlines)
+    assert drain(queue, urgent_only=True) == ["due"]
+    assert [work[1] for work in queue.remaining()] == ["later"]
+
+
+def test_program_cap_holds_back_its_sheets():
+    a, b = program("a", max_concurrent_sheets=1), program("b")
+    queue = FairSheetQueue([(a, "a1", ""), (a, "a2", ""), (b, "b1", ""), (b, "b2", "")])
+    taken = [queue.next_ready()[1] for _ in range(3)]
+    assert taken == ["a1", "b1", "b2"]
+    assert queue.next_ready() is None
+    queue.finished(a)
+    assert queue.next_ready()[1] == "a2"
@@ -0,0 +1,61 @@
+import pytest
+import config
+from fake_services import FakeServicesClient
+from google_sheets_api_client import GoogleSheetsApiClient
+
+BATCH_CALLS = ("drive", "POST /batch/drive/v3")
+
+
+@pytest.fixture
+def client(google_credentials):
+    return GoogleSheetsApiClient(google_credentials)
+
+
+def put_sheets(fake_services, *sheet_ids):
+    FakeServicesClient(fake_services.url).put_sheets(
+        config.UNPROCESSED_FOLDER_ID, [{"id": sheet_id, "name": sheet_id, "rows": []} for sheet_id in sheet_ids]
+    )
+
+
+def test_one_failed_move_leaves_the_rest_of_the_batch_moved(fake_services, client, monkeypatch):
+    monkeypatch.setattr(config, "DRIVE_BATCH_SIZE", 2)
+    put_sheets(fake_services, "s1", "s2", "s3")
+    client.list_sheets_in_folder(config.UNPROCESSED_FOLDER_ID)
+    del fake_services.files["s2"]  # deleted in Drive after the listing
+    fake_services.reset_stats()
+
+    results = client.move_sheets_to_folders([
+        (sheet_id, config.PROCESSED_FOLDER_ID, None) for sheet_id in ("s1", "s2", "s3")
+    ])
+    assert results["s1"] is None and results["s3"] is None
+    assert "404" in str(results["s2"])
+    assert fake_services.snapshot()["files"] == {"s1": [config.PROCESSED_FOLDER_ID], "s3": [config.PROCESSED_FOLDER_ID]}
+    assert client.sheet_parents["s2"] == [config.UNPROCESSED_FOLDER_ID]
+    # Parents came from the listing: two batches (of two and one), no files.get.
+    assert dict(fake_services.calls) == {BATCH_CALLS: 2}
+
+
+def test_unreadable_roster_is_skipped(fake_services, client, capsys):
+    FakeServicesClient(fake_services.url).put_sheets(config.UNPROCESSED_FOLDER_ID, [{"id": "s1", "name": "s1", "rows": [
+        ["Event", "Conductor", "Last concert", "First", "Last", "Email"],
+        ["SUB 1", "Ludovic Morlot", "2099-01-01 20:00"],
+        ["", "", "", "Ann", "Alto", "ann@example.com"],
+    ]}])
+
+    rosters = client.read_rosters(["s1", "missing"])
+    assert list(rosters) == ["s1"]
+    assert rosters["s1"].emails == ["ann@example.com"]
+    assert "Could not read roster sheet missing" in capsys.readouterr().out
+
+
+def test_failed_parents_lookup_only_loses_that_move(fake_services, client):
+    put_sheets(fake_services, "s1", "s2")
+    # Never listed, so their parents are looked up while the batch is built; s2 is gone by then.
+    del fake_services.files["s2"]
+
+    results = client.move_sheets_to_folders([
+        (sheet_id, config.PROCESSED_FOLDER_ID, None) for sheet_id in ("s1", "s2")
+    ])
+    assert results["s1"] is None
+    assert "404" in str(results["s2"])
+    assert fake_services.snapshot()["files"] == {"s1": [config.PROCESSED_FOLDER_ID]}
@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+from quota_manager import QuotaManager
+
+
+def test_daily_reservations(tmp_path):
+    quota = QuotaManager(per_minute=120, per_day=100, state_path=str(tmp_path / "quota.json"))
+    reservation = quota.try_reserve_daily(60)
+    assert reservation
+    assert quota.try_reserve_daily(50) is None
+    assert quota.daily_budget_left() == 40
+    quota.release_daily(reservation)
+    assert quota.daily_budget_left() == 100
+    assert quota.try_reserve_daily(100)
+
+
+def test_requests_spend_the_day_and_pace_the_minute(tmp_path):
+    quota = QuotaManager(per_minute=2, per_day=100, state_path=str(tmp_path / "quota.json"))
+    assert quota.reserve_request() == 0.0
+    assert quota.reserve_request() == 0.0
+    assert quota.reserve_request() > 0
+    assert quota.daily_budget_left() == 97
+
+
+def test_overlapping_reservations_are_charged_once(tmp_path):
+    quota = QuotaManager(per_minute=1000, per_day=100, state_path=str(tmp_path / "quota.json"))
+    first = quota.try_reserve_daily(30)
+    second = quota.try_reserve_daily(20)
+    with quota.charging(first):
+        for _ in range(10):
+            quota.reserve_request()
+    with quota.charging(second):
+        for _ in range(25):  # 5 more than estimated
+            quota.reserve_request()
+    # 35 spent, 20 of the first reservation still held.
+    assert quota.daily_budget_left() == 45
+    quota.release_daily(first)
+    assert quota.daily_budget_left() == 65
+    quota.release_daily(second)
+    assert quota.daily_budget_left() == 65
+    assert quota.try_reserve_daily(65)
+
+
+def test_headers_correct_the_estimate(tmp_path):
+    quota = QuotaManager(per_minute=120, per_day=100, state_path=str(tmp_path / "quota.json"))
+    quota.update_from_headers({"X-Ratelimit-App-Global-Day-Remaining": "42", "X-Ratelimit-App-Global-Day-Reset": "bad"})
+    assert quota.daily_budget_left() == 42
+
+
+def test_state_carries_over_between_runs(tmp_path):
+    path = str(tmp_path / "quota.json")
+    quota = QuotaManager(per_minute=120, per_day=100, state_path=path)
+    quota.update_from_headers({"X-Ratelimit-App-Global-Day-Remaining": "30"})
+    quota.save()
+    assert QuotaManager(per_minute=120, per_day=100, state_path=path).daily_budget_left() == 30
+
+
+def test_expired_day_starts_fresh(tmp_path):
+    path = str(tmp_path / "quota.json")
+    with open(path, "w") as f:
+        json.dump({"day_remaining": 5, "day_reset_at": 0}, f)
+    assert QuotaManager(per_minute=120, per_day=100, state_path=path).daily_budget_left() == 100
+
+
+def test_concurrent_saves_leave_one_state_file(tmp_path):
+    path = str(tmp_path / "quota.json")
+    quota = QuotaManager(per_minute=120, per_day=1000, state_path=path)
+    errors = []
+
+    def finish_sheets():
+        try:
+            for _ in range(50):
+                quota.release_daily(quota.try_reserve_daily(1))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=finish_sheets) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == ["quota.json"]
+    with open(path) as f:
+        assert json.load(f)["day_remaining"] == 1000
+
+
+def test_failed_save_does_not_raise_from_release(tmp_path):
+    quota = QuotaManager(per_minute=120, per_day=100, state_path=str(tmp_path / "missing" / "quota.json"))
+    reservation = quota.try_reserve_daily(10)
+    assert reservation
+    quota.release_daily(reservation)
+    assert quota.daily_budget_left() == 100
+
+
+def test_corrupt_state_file_starts_a_fresh_day(tmp_path, capsys):
+    path = tmp_path / "quota.json"
+    path.write_text('{"day_remaining": 4')
+    assert QuotaManager(per_minute=120, per_day=100, state_path=str(path)).daily_budget_left() == 100
+    assert "Ignoring unreadable SurveyMonkey quota state" in capsys.readouterr().out
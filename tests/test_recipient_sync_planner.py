@@ -0,0 +1,67 @@
+from recipient_sync_planner import DELETE_RECIPIENTS, RECREATE_COLLECTOR, RecipientSyncPlanner
+
+
+def recipient(rid, email, mail_status="not_sent", survey_response_status="not_responded"):
+    return {"id": rid, "email": email, "mail_status": mail_status, "survey_response_status": survey_response_status}
+
+
+def plan(existing, sheet_emails, messages=None):
+    return RecipientSyncPlanner(surveymonkey_client=None).plan_from_state(existing, sheet_emails, messages)
+
+
+def test_adds_only_missing_emails_case_insensitively():
+    result = plan([recipient("1", "A@example.com")], ["a@example.com", "b@example.com"])
+    assert result.strategy == DELETE_RECIPIENTS
+    assert result.to_add == ["b@example.com"]
+    assert result.to_remove == {}
+    assert result.predicted_calls == 1
+
+
+def test_nothing_to_do_costs_nothing():
+    result = plan([recipient("1", "a@example.com")], ["A@example.com"])
+    assert (result.to_add, result.to_remove, result.predicted_calls) == ([], {}, 0)
+
+
+def test_few_removals_are_deleted():
+    existing = [recipient("1", "a@example.com"), recipient("2", "gone@example.com")]
+    result = plan(existing, ["a@example.com"])
+    assert result.strategy == DELETE_RECIPIENTS
+    assert result.to_remove == {"gone@example.com": "2"}
+    assert result.predicted_calls == 1
+
+
+def test_many_removals_need_the_messages_first():
+    existing = [recipient(str(i), f"old{i}@example.com") for i in range(20)]
+    assert plan(existing, ["new@example.com"]) is None
+
+
+def test_many_removals_recreate_when_nothing_was_sent():
+    existing = [recipient(str(i), f"old{i}@example.com") for i in range(20)]
+    result = plan(existing, ["new@example.com"], messages=[{"id": "m1", "status": "not_sent"}])
+    assert result.strategy == RECREATE_COLLECTOR
+    assert result.to_add == ["new@example.com"]
+    assert result.predicted_calls == result.recreate_cost < result.delete_cost
+
+
+def test_heavy_churn_recreates_when_messages_are_only_scheduled():
+    # Every re-sync finds its invite and reminder scheduled by the previous run.
+    existing = [recipient(str(i), f"old{i}@example.com") for i in range(180)]
+    existing += [recipient(str(i), f"kept{i}@example.com") for i in range(180, 200)]
+    sheet = [f"kept{i}@example.com" for i in range(180, 200)] + [f"new{i}@example.com" for i in range(180)]
+    messages = [{"id": "m1", "type": "invite", "status": "scheduled"},
+                {"id": "m2", "type": "reminder", "status": "scheduled"}]
+    result = plan(existing, sheet, messages)
+    assert result.strategy == RECREATE_COLLECTOR
+    assert result.to_add == sheet
+
+
+def test_never_recreates_once_mail_went_out():
+    existing = [recipient(str(i), f"old{i}@example.com") for i in range(20)]
+    result = plan(existing, ["new@example.com"], messages=[{"id": "m1", "status": "sent"}])
+    assert result.strategy == DELETE_RECIPIENTS
+    assert len(result.to_remove) == 20
+
+    existing[0] = recipient("0", "old0@example.com", survey_response_status="completely_responded")
+    result = plan(existing, ["new@example.com"], messages=[{"id": "m1", "status": "not_sent"}])
+    assert result.strategy == DELETE_RECIPIENTS
+    assert "responded" in result.reason
@@ -0,0 +1,38 @@
+from sheet_journal import SheetJournal
+
+
+def test_resumes_finished_steps(tmp_path):
+    path = str(tmp_path / "journal.sqlite3")
+    steps = SheetJournal(path).open("sheet", "rev1")
+    steps.record("survey", survey_id="s1")
+    steps.record("collector", collector_id="c1")
+
+    resumed = SheetJournal(path).open("sheet", "rev1")
+    assert list(resumed.done) == ["survey", "collector"]
+    assert resumed.get("collector") == {"collector_id": "c1"}
+    assert not resumed.finished("messages")
+
+
+def test_changed_revision_starts_over(tmp_path):
+    path = str(tmp_path / "journal.sqlite3")
+    SheetJournal(path).open("sheet", "rev1").record("survey", survey_id="s1")
+
+    journal = SheetJournal(path)
+    assert journal.open("sheet", "rev2").done == {}
+    assert journal.open("sheet", "rev1").done == {}
+
+
+def test_clear_forgets_the_sheet_only(tmp_path):
+    journal = SheetJournal(str(tmp_path / "journal.sqlite3"))
+    steps = journal.open("sheet", "rev1")
+    steps.record("survey", survey_id="s1")
+    journal.open("other", "rev1").record("survey", survey_id="s2")
+    steps.clear()
+    assert journal.open("sheet", "rev1").done == {}
+    assert journal.open("other", "rev1").get("survey") == {"survey_id": "s2"}
+
+
+def test_no_path_remembers_nothing():
+    journal = SheetJournal(None)
+    journal.open("sheet", "rev1").record("survey", survey_id="s1")
+    assert journal.open("sheet", "rev1").done == {}
@@ -0,0 +1,83 @@
+import pytest
+from survey_clone_pool import SPARE_TITLE, SurveyClonePool
+from surveymonkey_api_client import SurveyMonkeyApiClient
+
+
+@pytest.fixture
+def client(fake_services):
+    client = SurveyMonkeyApiClient("test-token")
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def templates(client):
+    return [client.clone_survey("1", "Template A"), client.clone_survey("1", "Template B")]
+
+
+def spares(fake_services):
+    """
+    {template_id: sorted spare survey IDs} in the fake.
+    """
+    found = {}
+    for survey in fake_services.surveys.values():
+        match = SPARE_TITLE.match(survey["title"])
+        if match:
+            found.setdefault(match.group("template_id"), []).append(survey["id"])
+    return {template_id: sorted(ids) for template_id, ids in found.items()}
+
+
+def test_claim_renames_a_spare_and_refill_replaces_it(fake_services, client, templates):
+    template_a, template_b = templates
+    pool = SurveyClonePool(2, templates)
+    client.run(pool.refill(client.core))
+    assert {template_id: len(ids) for template_id, ids in spares(fake_services).items()} == {template_a: 2, template_b: 2}
+
+    survey_id = client.run(pool.claim(client.core, template_a, "Conductor Evaluation"))
+    assert fake_services.surveys[survey_id]["title"] == "Conductor Evaluation"
+    assert pool.available(template_a) == 1 and pool.claimed == 1
+
+    fake_services.reset_stats()
+    client.run(pool.refill(client.core))
+    assert fake_services.calls[("surveymonkey", "POST /v3/surveys")] == 1
+    assert pool.available(template_a) == 2 and pool.claimed == 0
+
+
+def test_spares_of_an_edited_template_are_recycled(fake_services, client, templates):
+    template_a, template_b = templates
+    pool = SurveyClonePool(1, templates)
+    client.run(pool.refill(client.core))
+    old_spares = spares(fake_services)
+    fake_services.surveys[template_a]["date_modified"] = "2099-01-01T00:00:00"
+
+    client.run(pool.refill(client.core))
+    new_spares = spares(fake_services)
+    assert new_spares[template_b] == old_spares[template_b]
+    assert len(new_spares[template_a]) == 1 and new_spares[template_a] != old_spares[template_a]
+    assert "rev 2099-01-01T00:00:00" in fake_services.surveys[new_spares[template_a][0]]["title"]
+
+
+def test_spare_deleted_since_the_listing_is_skipped(fake_services, client, templates):
+    template_a, _ = templates
+    pool = SurveyClonePool(2, templates)
+    client.run(pool.refill(client.core))
+    next_spare = pool.spares[template_a][-1]
+    client.delete_survey(next_spare)  # e.g. by hand in the web UI
+
+    survey_id = client.run(pool.claim(client.core, template_a, "Conductor Evaluation"))
+    assert survey_id != next_spare
+    assert fake_services.surveys[survey_id]["title"] == "Conductor Evaluation"
+    assert client.run(pool.claim(client.core, template_a, "Another Evaluation")) is None
+
+
+def test_spare_claimed_by_another_run_is_skipped(fake_services, client, templates):
+    template_a, _ = templates
+    pool = SurveyClonePool(2, templates)
+    client.run(pool.refill(client.core))
+    next_spare = pool.spares[template_a][-1]
+    client.rename_survey(next_spare, "Claimed by the watcher")
+
+    survey_id = client.run(pool.claim(client.core, template_a, "Conductor Evaluation"))
+    assert survey_id != next_spare
+    assert fake_services.surveys[next_spare]["title"] == "Claimed by the watcher"
+    assert fake_services.surveys[survey_id]["title"] == "Conductor Evaluation"
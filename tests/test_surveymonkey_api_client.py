@@ -0,0 +1,77 @@
+import time
+import pytest
+import requests
+import config
+from surveymonkey_api_client import RecipientUploadError, SurveyMonkeyApiClient
+
+
+@pytest.fixture
+def client(fake_services):
+    client = SurveyMonkeyApiClient("test-token", max_retries=3)
+    yield client
+    client.close()
+
+
+def test_rate_limited_request_waits_for_retry_after(fake_services, client):
+    survey_id = client.clone_survey("1", "Conductor Evaluation")
+    # Every other request is refused, starting with the next one.
+    fake_services.options.update(rate_limit_every=2, retry_after_seconds=0.3)
+    fake_services.surveymonkey_requests = 1
+
+    started = time.perf_counter()
+    assert client.get_survey(survey_id)["title"] == "Conductor Evaluation"
+    assert fake_services.rate_limited == 1
+    assert time.perf_counter() - started >= 0.3
+
+
+def test_rate_limited_post_is_resent_once_accepted(fake_services, client):
+    survey_id = client.clone_survey("1", "Conductor Evaluation")
+    # Every other request is refused with a 429, which SurveyMonkey sends before doing any work.
+    fake_services.options.update(rate_limit_every=2, retry_after_seconds=0)
+    fake_services.surveymonkey_requests = 1
+
+    collector_id, _ = client.create_collector(survey_id, "Email Invitation", "2099-01-02T00:00:00Z")
+    assert fake_services.rate_limited == 1
+    assert list(fake_services.collectors) == [collector_id]
+
+
+def test_gives_up_after_max_retries(fake_services, client):
+    # No Retry-After: falls back to (jittered, here tiny) exponential backoff.
+    fake_services.options.update(rate_limit_every=1, retry_after_seconds="")
+
+    with pytest.raises(requests.HTTPError, match="429"):
+        client.get_survey("1")
+    assert fake_services.rate_limited == 4  # the first attempt and 3 retries
+
+
+@pytest.fixture
+def invite(client):
+    survey_id = client.clone_survey("1", "Conductor Evaluation")
+    collector_id, _ = client.create_collector(survey_id, "Email Invitation", "2099-01-02T00:00:00Z")
+    return collector_id, client.create_invite_message(collector_id, "Conductor Evaluation")
+
+
+def test_rejected_chunk_is_split_down_to_the_bad_contact(fake_services, client, invite):
+    emails = [f"musician{i}@example.com" for i in range(10)]
+    fake_services.options["bulk_reject_emails"] = ["musician6@example.com"]
+
+    result = client.add_recipients(*invite, emails, chunk_size=4)
+    assert result.invalid == ["musician6@example.com"]
+    assert sorted(result.succeeded) == sorted(set(emails) - {"musician6@example.com"})
+    # 3 chunks; the one rejected (4-7) is split into 4-5 and 6-7, then 6-7 into 6 and 7.
+    assert result.requests == 7
+    assert fake_services.calls[("surveymonkey", "POST /v3/collectors/{collector_id}/messages/{message_id}/recipients/bulk")] == 7
+
+
+def test_chunk_failing_every_retry_is_reported_after_the_others(fake_services, client, invite, monkeypatch):
+    monkeypatch.setattr(config, "RECIPIENT_CHUNK_RETRIES", 2)
+    emails = [f"musician{i}@example.com" for i in range(10)]
+    fake_services.options.update(bulk_reject_emails=["musician9@example.com"], bulk_reject_status=503)
+
+    with pytest.raises(RecipientUploadError) as raised:
+        client.add_recipients(*invite, emails, chunk_size=4)
+    result = raised.value.result
+    assert sorted(result.failed) == emails[8:]
+    assert sorted(result.succeeded) == sorted(emails[:8])
+    collector, = fake_services.snapshot()["collectors"]
+    assert collector["recipients"] == sorted(emails[:8])
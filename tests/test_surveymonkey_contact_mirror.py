@@ -0,0 +1,50 @@
+import pytest
+import config
+from surveymonkey_api_client import SurveyMonkeyApiClient
+from surveymonkey_contact_mirror import SurveyMonkeyContactMirror
+
+CREATE_CALLS = ("surveymonkey", "POST /v3/contacts/bulk")
+RENAME_CALLS = ("surveymonkey", "PATCH /v3/contacts/{contact_id}")
+
+
+@pytest.fixture
+def client(fake_services):
+    client = SurveyMonkeyApiClient("test-token")
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    return SurveyMonkeyContactMirror(str(tmp_path / "contacts.sqlite3"))
+
+
+def names_in_surveymonkey(fake_services):
+    return {c["email"]: (c["first_name"], c["last_name"]) for c in fake_services.contacts.values()}
+
+
+def test_contacts_are_created_once(fake_services, client, mirror):
+    people = {"a@example.com": ("Ann", "Alto"), "b@example.com": ("Bo", "Bass")}
+    first = client.run(mirror.sync(client.core, people))
+    assert set(first) == set(people)
+    assert names_in_surveymonkey(fake_services) == people
+    fake_services.reset_stats()
+
+    # Same musicians on the next sheet, one without a name: nothing to send.
+    again = client.run(mirror.sync(client.core, {"a@example.com": ("Ann", "Alto"), "B@example.com": ("", "")}))
+    assert again == {"a@example.com": first["a@example.com"], "B@example.com": first["b@example.com"]}
+    assert fake_services.calls == {}
+
+
+def test_renames_are_capped_per_sync(fake_services, client, mirror, monkeypatch):
+    monkeypatch.setattr(config, "CONTACT_RENAMES_PER_SHEET", 2)
+    emails = [f"m{i}@example.com" for i in range(5)]
+    client.run(mirror.sync(client.core, {email: ("Old", "Name") for email in emails}))
+    renamed = {email: ("New", "Name") for email in emails}
+
+    for expected_renames in (2, 2, 1, 0):
+        fake_services.reset_stats()
+        client.run(mirror.sync(client.core, renamed))
+        assert fake_services.calls.get(RENAME_CALLS, 0) == expected_renames
+        assert CREATE_CALLS not in fake_services.calls
+    assert names_in_surveymonkey(fake_services) == renamed
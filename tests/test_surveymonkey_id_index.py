@@ -0,0 +1,61 @@
+import pytest
+from collector_scheduler import CollectorScheduler
+from google_sheets_api_client import Roster
+from surveymonkey_id_index import SurveyMonkeyIdIndex
+
+DISCOVERY_CALLS = {
+    "GET /v3/surveys",
+    "GET /v3/surveys/{survey_id}/collectors",
+    "GET /v3/collectors/{collector_id}/messages",
+}
+SURVEY_NAME = "Conductor Evaluation for Ludovic Morlot (SUB 1)"
+
+
+def roster(*emails):
+    return Roster("sheet-1", "SUB 1", "Ludovic Morlot", "2099-01-01 20:00", list(emails))
+
+
+def process(roster):
+    # A fresh scheduler per run, like a fresh invocation; only the files in the working directory carry over.
+    scheduler = CollectorScheduler(max_workers=1)
+    try:
+        scheduler.process_sheet(roster.sheet_id, "Roster", roster)
+    finally:
+        scheduler.surveymonkey_client.close()
+
+
+def discovery_calls(fake_services):
+    return {endpoint: n for (_, endpoint), n in fake_services.calls.items() if endpoint in DISCOVERY_CALLS}
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_remembered_ids_skip_discovery(fake_services, workdir):
+    process(roster("a@example.com"))
+    fake_services.reset_stats()
+
+    process(roster("a@example.com", "b@example.com"))
+    assert discovery_calls(fake_services) == {}
+    collector, = fake_services.snapshot()["collectors"]
+    assert collector["recipients"] == ["a@example.com", "b@example.com"]
+
+
+def test_ids_deleted_in_surveymonkey_are_rediscovered(fake_services, workdir):
+    process(roster("a@example.com"))
+    old_survey_id = SurveyMonkeyIdIndex("surveymonkey_ids.sqlite3").get_survey_id(SURVEY_NAME)
+    # Someone deletes the survey in the web UI.
+    for collector_id in list(fake_services.collectors):
+        fake_services.recipients.pop(collector_id, None)
+    fake_services.surveys.clear()
+    fake_services.collectors.clear()
+    fake_services.messages.clear()
+
+    process(roster("a@example.com", "b@example.com"))
+    new_survey_id = SurveyMonkeyIdIndex("surveymonkey_ids.sqlite3").get_survey_id(SURVEY_NAME)
+    assert new_survey_id in fake_services.surveys and new_survey_id != old_survey_id
+    collector, = fake_services.snapshot()["collectors"]
+    assert collector["recipients"] == ["a@example.com", "b@example.com"]